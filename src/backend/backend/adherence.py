@@ -0,0 +1,177 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from django.utils.timezone import localdate, make_aware, now
+from .analytics import week_start
+from .models import PersonalTrainerScheduledWorkout, RecurringScheduledWorkout, ScheduledWorkout, WorkoutSession
+from .recurrence import expand, rules_in_range
+
+# A scheduled workout is completed by a workout session of the same workout within the tolerance before or after the scheduled date
+DEFAULT_ADHERENCE_TOLERANCE = timedelta(hours=24)
+MAX_ADHERENCE_TOLERANCE = timedelta(days=3)
+
+# Weeks are only cached once they are over, so the cache is only cleared by writes and never expires by itself
+ADHERENCE_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def adherence_cache_key(user_id, week):
+    return f"adherence:{user_id}:{week.isoformat()}"
+
+# The start of the week as a datetime, weeks start on monday at midnight
+def week_start_time(week):
+    return make_aware(datetime.combine(week, time.min))
+
+# Clears the cached adherence of the weeks that a workout session or scheduled workout at the given time can be matched in.
+# Called with (user id, time) pairs by the signals, and by the import that creates workout sessions in the past with bulk_create.
+# Workout sessions created at the current time cannot be matched with scheduled workouts in weeks that are cached
+def invalidate_adherence(entries):
+    keys = {
+        adherence_cache_key(user_id, week_start(localdate(moment + offset)))
+        for user_id, moment in entries
+        for offset in (-MAX_ADHERENCE_TOLERANCE, MAX_ADHERENCE_TOLERANCE)
+    }
+    if keys:
+        cache.delete_many(keys)
+
+# A recurring workout can have occurrences in every week from its start, so every week from the start until now is cleared
+def invalidate_recurring_adherence(recurring_workout):
+    end = min(now(), recurring_workout.until) if recurring_workout.until is not None else now()
+    weeks = (end - recurring_workout.start).days // 7 + 1
+    invalidate_adherence((recurring_workout.user_id, recurring_workout.start + timedelta(weeks=week)) for week in range(weeks))
+
+
+# Matches the scheduled workouts of a client against their workout sessions in one pass, both sorted on time.
+# The workout sessions are split per workout, and every scheduled workout takes the first unused workout session of its workout
+# that is within the tolerance. Since the windows of the scheduled workouts are the same size, this matches as many as possible.
+# schedules are (scheduled date, workout id, entry) and sessions are (start time, workout id), returns the indexes of the matched schedules
+def match_schedules(schedules, sessions, tolerance):
+    sessions_per_workout = defaultdict(list)
+    for start_time, workout_id in sessions:
+        sessions_per_workout[workout_id].append(start_time)
+
+    positions = defaultdict(int)
+    matched = set()
+
+    for index, (scheduled_date, workout_id, entry) in enumerate(schedules):
+        start_times = sessions_per_workout[workout_id]
+        position = positions[workout_id]
+
+        # Workout sessions that are too early for this scheduled workout are too early for the later ones as well
+        while position < len(start_times) and start_times[position] < scheduled_date - tolerance:
+            position += 1
+
+        if position < len(start_times) and start_times[position] <= scheduled_date + tolerance:
+            matched.add(index)
+            position += 1
+
+        positions[workout_id] = position
+
+    return matched
+
+def empty_week(week):
+    return {"week_start": week, "scheduled": 0, "completed": 0, "missed": 0, "upcoming": 0, "missed_workouts": []}
+
+# Adherence of the clients to their scheduled workouts and the workouts scheduled by a personal trainer, per week between the
+# first and last week. Weeks that are over are read from and written to the cache, the others are always computed.
+# Uses three queries for all the weeks that are not cached, and two more when there are recurring workouts, no matter how many clients there are
+def compute_adherence(clients, first_week, last_week, tolerance=DEFAULT_ADHERENCE_TOLERANCE):
+    current_time = now()
+    weeks = [first_week + timedelta(weeks=index) for index in range((last_week - first_week).days // 7 + 1)]
+    client_ids = [client.id for client in clients]
+
+    # The tolerance is part of the cached value, since the cache key has to be known when it is cleared
+    cached = cache.get_many([adherence_cache_key(client_id, week) for client_id in client_ids for week in weeks])
+    tolerance_key = str(int(tolerance.total_seconds()))
+
+    results = {}
+    missing = defaultdict(set)
+    for client_id in client_ids:
+        for week in weeks:
+            result = cached.get(adherence_cache_key(client_id, week), {}).get(tolerance_key)
+            if result is None:
+                missing[client_id].add(week)
+            else:
+                results[(client_id, week)] = result
+
+    if missing:
+        missing_clients = list(missing)
+        missing_weeks = {week for client_weeks in missing.values() for week in client_weeks}
+        start = week_start_time(min(missing_weeks))
+        end = week_start_time(max(missing_weeks) + timedelta(weeks=1))
+
+        schedules = defaultdict(list)
+        for entry in ScheduledWorkout.objects.filter(user_id__in=missing_clients, scheduled_date__gte=start, scheduled_date__lt=end).values(
+            "id", "user_id", "workout_template_id", "scheduled_date"
+        ):
+            schedules[entry["user_id"]].append((entry["scheduled_date"], entry["workout_template_id"], ("scheduled", entry)))
+
+        for entry in PersonalTrainerScheduledWorkout.objects.filter(client_id__in=missing_clients, scheduled_date__gte=start, scheduled_date__lt=end).values(
+            "id", "client_id", "workout_template_id", "scheduled_date"
+        ):
+            schedules[entry["client_id"]].append((entry["scheduled_date"], entry["workout_template_id"], ("pt_scheduled", entry)))
+
+        # Occurrences of recurring workouts are identified by the recurring workout and the date of the occurrence in its rule
+        for rule, occurrence, scheduled_date, workout in expand(rules_in_range(RecurringScheduledWorkout.objects.filter(user_id__in=missing_clients), start, end), start, end):
+            schedules[rule.user_id].append((scheduled_date, workout.id, ("recurring", {"id": rule.id, "occurrence": occurrence})))
+
+        sessions = defaultdict(list)
+        for user_id, start_time, workout_id in (
+            WorkoutSession.objects.filter(user_id__in=missing_clients, start_time__gte=start - tolerance, start_time__lte=end + tolerance)
+            .order_by("user_id", "start_time")
+            .values_list("user_id", "start_time", "workout_id")
+        ):
+            sessions[user_id].append((start_time, workout_id))
+
+        new_cache = {}
+        for client_id, client_weeks in missing.items():
+            # The kinds of scheduled workouts are merged into one list sorted on time, ties are broken on the type and id
+            client_schedules = sorted(schedules[client_id], key=lambda schedule: (schedule[0], schedule[2][0], schedule[2][1]["id"]))
+            matched = match_schedules(client_schedules, sessions[client_id], tolerance)
+
+            client_results = {week: empty_week(week) for week in client_weeks}
+            for index, (scheduled_date, workout_id, (entry_type, entry)) in enumerate(client_schedules):
+                result = client_results.get(week_start(localdate(scheduled_date)))
+                if result is None:
+                    continue
+
+                if index in matched:
+                    result["scheduled"] += 1
+                    result["completed"] += 1
+                elif scheduled_date + tolerance > current_time:
+                    result["upcoming"] += 1
+                else:
+                    result["scheduled"] += 1
+                    result["missed"] += 1
+                    missed = {"type": entry_type, "id": entry["id"], "workout_template": workout_id, "scheduled_date": scheduled_date}
+                    if "occurrence" in entry:
+                        missed["occurrence"] = entry["occurrence"]
+                    result["missed_workouts"].append(missed)
+
+            for week, result in client_results.items():
+                results[(client_id, week)] = result
+
+                # Only weeks that can no longer change without a write are cached
+                if week_start_time(week + timedelta(weeks=1)) + tolerance <= current_time:
+                    key = adherence_cache_key(client_id, week)
+                    new_cache[key] = {**cached.get(key, {}), tolerance_key: result}
+
+        cache.set_many(new_cache, ADHERENCE_CACHE_TIMEOUT)
+
+    report = []
+    for client in clients:
+        client_weeks = [results[(client.id, week)] for week in weeks]
+        scheduled = sum(week["scheduled"] for week in client_weeks)
+        completed = sum(week["completed"] for week in client_weeks)
+
+        report.append({
+            "client": client.id,
+            "username": client.username,
+            "scheduled": scheduled,
+            "completed": completed,
+            "missed": scheduled - completed,
+            "upcoming": sum(week["upcoming"] for week in client_weeks),
+            "adherence": round(completed / scheduled, 2) if scheduled else None,
+            "weeks": client_weeks,
+        })
+
+    return report
@@ -0,0 +1,351 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils.timezone import localdate, now
+from .models import ExerciseSession, PersonalRecord, Set, TrainingRollup, WorkoutSession
+
+ALL = TrainingRollup.ALL_MUSCLE_CATEGORIES
+
+# Volume of a set, sets without a weight (e.g. bodyweight exercises) count as zero volume
+SET_VOLUME = ExpressionWrapper(
+    F("repetitions") * Coalesce(F("weight"), Value(Decimal("0.00"))),
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+# The rollup periods that a workout session started at start_time is counted in
+def period_starts(start_time):
+    day = localdate(start_time)
+    return [("day", day), ("week", week_start(day))]
+
+def empty_totals():
+    return {"volume": Decimal("0.00"), "set_count": 0, "session_count": 0, "duration": timedelta()}
+
+
+# Rollups are updated incrementally when sets and workout sessions are created.
+# The changes are given as (user id, period, period start, muscle category) -> totals to add
+def apply_changes(changes):
+    if not changes:
+        return
+
+    lookups = [
+        {"user_id": user_id, "period": period, "period_start": period_start, "muscle_category": muscle_category}
+        for user_id, period, period_start, muscle_category in changes
+    ]
+
+    # Make sure every rollup exists, rows created by another request at the same time are ignored
+    TrainingRollup.objects.bulk_create([TrainingRollup(**lookup) for lookup in lookups], ignore_conflicts=True)
+
+    # The totals are added in the database, so concurrent updates are not lost
+    for lookup, totals in zip(lookups, changes.values()):
+        increments = {field: F(field) + value for field, value in totals.items() if value}
+        if increments:
+            TrainingRollup.objects.filter(**lookup).update(**increments)
+
+# Count newly created workout sessions
+def add_workout_sessions(workout_sessions):
+    changes = defaultdict(empty_totals)
+
+    for workout_session in workout_sessions:
+        for period, period_start in period_starts(workout_session.start_time):
+            totals = changes[(workout_session.user_id, period, period_start, ALL)]
+            totals["session_count"] += 1
+            totals["duration"] += workout_session.duration or timedelta()
+
+    apply_changes(changes)
+
+# Count newly created sets, in two queries plus one update per changed rollup
+def add_sets(sets):
+    sets = list(sets)
+    if not sets:
+        return
+
+    exercise_sessions = {
+        exercise_session["id"]: exercise_session
+        for exercise_session in ExerciseSession.objects.filter(id__in={workout_set.exercise_session_id for workout_set in sets}).values(
+            "id", "workout_session_id", "workout_session__user_id", "workout_session__start_time", "exercise__muscle_category"
+        )
+    }
+
+    changes = defaultdict(empty_totals)
+    new_sets = defaultdict(int)
+
+    for workout_set in sets:
+        exercise_session = exercise_sessions[workout_set.exercise_session_id]
+        muscle_category = exercise_session["exercise__muscle_category"]
+        volume = workout_set.repetitions * (workout_set.weight or Decimal("0.00"))
+        new_sets[(exercise_session["workout_session_id"], muscle_category)] += 1
+
+        for period, period_start in period_starts(exercise_session["workout_session__start_time"]):
+            for category in (muscle_category, ALL):
+                totals = changes[(exercise_session["workout_session__user_id"], period, period_start, category)]
+                totals["volume"] += Decimal(volume)
+                totals["set_count"] += 1
+
+    # A workout session is counted for a muscle category when the first set of that category is added to it
+    session_ids = {session_id for session_id, _ in new_sets}
+    set_counts = {
+        (session_id, muscle_category): count
+        for session_id, muscle_category, count in Set.objects.filter(exercise_session__workout_session_id__in=session_ids)
+        .values_list("exercise_session__workout_session_id", "exercise_session__exercise__muscle_category")
+        .annotate(count=Count("id"))
+        .order_by()
+    }
+
+    workout_sessions = {exercise_session["workout_session_id"]: exercise_session for exercise_session in exercise_sessions.values()}
+    for (session_id, muscle_category), count in new_sets.items():
+        if set_counts.get((session_id, muscle_category)) != count:
+            continue
+
+        workout_session = workout_sessions[session_id]
+        for period, period_start in period_starts(workout_session["workout_session__start_time"]):
+            changes[(workout_session["workout_session__user_id"], period, period_start, muscle_category)]["session_count"] += 1
+
+    apply_changes(changes)
+
+
+# Recompute the rollups of a user from the sets and workout sessions, used when sets or workout sessions are changed or deleted.
+# The range is extended to whole weeks, so that the week rollups are complete
+def rebuild_rollups(user_id, start_date, end_date):
+    start_date = week_start(start_date)
+    end_date = week_start(end_date) + timedelta(days=7)
+
+    days = defaultdict(empty_totals)
+
+    sets = (
+        Set.objects.filter(
+            exercise_session__workout_session__user_id=user_id,
+            exercise_session__workout_session__start_time__date__gte=start_date,
+            exercise_session__workout_session__start_time__date__lt=end_date,
+        )
+        .annotate(day=TruncDate("exercise_session__workout_session__start_time"), muscle_category=F("exercise_session__exercise__muscle_category"))
+        .values("day", "muscle_category")
+        .annotate(volume=Sum(SET_VOLUME), set_count=Count("id"), session_count=Count("exercise_session__workout_session", distinct=True))
+        .order_by()
+    )
+    for row in sets:
+        for category in (row["muscle_category"], ALL):
+            totals = days[(row["day"], category)]
+            totals["volume"] += row["volume"] or Decimal("0.00")
+            totals["set_count"] += row["set_count"]
+
+        days[(row["day"], row["muscle_category"])]["session_count"] += row["session_count"]
+
+    sessions = (
+        WorkoutSession.objects.filter(user_id=user_id, start_time__date__gte=start_date, start_time__date__lt=end_date)
+        .annotate(day=TruncDate("start_time"))
+        .values("day")
+        .annotate(session_count=Count("id"), duration=Sum("duration"))
+        .order_by()
+    )
+    for row in sessions:
+        totals = days[(row["day"], ALL)]
+        totals["session_count"] += row["session_count"]
+        totals["duration"] += row["duration"] or timedelta()
+
+    # A workout session belongs to a single day, so the week rollups are the sums of the day rollups
+    weeks = defaultdict(empty_totals)
+    for (day, category), totals in days.items():
+        week_totals = weeks[(week_start(day), category)]
+        for field, value in totals.items():
+            week_totals[field] += value
+
+    rollups = [
+        TrainingRollup(user_id=user_id, period=period, period_start=period_start, muscle_category=category, **totals)
+        for period, rows in (("day", days), ("week", weeks))
+        for (period_start, category), totals in rows.items()
+    ]
+
+    with transaction.atomic():
+        TrainingRollup.objects.filter(user_id=user_id, period_start__gte=start_date, period_start__lt=end_date).delete()
+        TrainingRollup.objects.bulk_create(rollups)
+
+
+# Estimated one repetition max of a set. Brzycki is only defined below 37 repetitions
+def epley(weight, repetitions):
+    return weight if repetitions == 1 else weight * (30 + repetitions) / 30
+
+def brzycki(weight, repetitions):
+    return weight * 36 / (37 - repetitions) if repetitions < 37 else None
+
+# The sets of a user for an exercise in chronological order, as (start times of the workout sessions, repetitions, weights) columns.
+# The start times are kept as datetimes for the response, and the repetitions and weights are NumPy arrays.
+# Reading plain tuples in one query is much faster than building a model instance for every set.
+# Sets without a weight can not be used for estimating the max, so they are left out
+def load_exercise_history(user_id, exercise_id):
+    rows = list(
+        Set.objects.filter(exercise_session__exercise_id=exercise_id, exercise_session__workout_session__user_id=user_id, weight__isnull=False)
+        .order_by("exercise_session__workout_session__start_time", "id")
+        .values_list("exercise_session__workout_session__start_time", "repetitions", "weight")
+    )
+    if not rows:
+        return [], np.empty(0), np.empty(0)
+
+    start_times, repetitions, weights = zip(*rows)
+    return list(start_times), np.array(repetitions, dtype=np.float64), np.array(weights, dtype=np.float64)
+
+# Progression of an exercise computed on the columns of the history, without looping over the sets:
+#   - the best estimated one repetition max, volume and number of sets of every workout session
+#   - the volume of the last window_days days at every workout session
+#   - the slope of the best estimated one repetition max per session over time, in weight per week
+def exercise_progression(history, window_days=28):
+    start_times, repetitions, weights = history
+    if len(weights) == 0:
+        return {"set_count": 0, "session_count": 0, "estimated_one_rep_max": {"epley": None, "brzycki": None}, "progression_per_week": None, "sessions": []}
+
+    times = np.fromiter((start_time.timestamp() for start_time in start_times), dtype=np.float64, count=len(start_times))
+
+    estimates = np.where(repetitions == 1, weights, weights * (30 + repetitions) / 30)
+    brzycki_estimates = np.divide(weights * 36, 37 - repetitions, out=np.full(len(weights), np.nan), where=repetitions < 37)
+
+    # The history is sorted on the start time, so the sets of a workout session are next to each other.
+    # Every workout session is a slice of the columns starting at one of these indexes
+    starts = np.flatnonzero(np.r_[True, times[1:] != times[:-1]])
+    session_times = times[starts]
+
+    volumes = np.add.reduceat(repetitions * weights, starts)
+    set_counts = np.diff(np.r_[starts, len(times)])
+    best_weights = np.maximum.reduceat(weights, starts)
+    session_estimates = np.maximum.reduceat(estimates, starts)
+
+    # Rolling volume using prefix sums, the first session inside the window of every session is found with one binary search
+    prefix_volume = np.r_[0.0, np.cumsum(volumes)]
+    indexes = np.arange(len(starts))
+    first_in_window = np.minimum(np.searchsorted(session_times, session_times - window_days * 24 * 60 * 60, side="right"), indexes)
+    rolling_volumes = prefix_volume[indexes + 1] - prefix_volume[first_in_window]
+
+    slope = None
+    if len(starts) >= 2 and session_times[0] != session_times[-1]:
+        weeks = (session_times - session_times[0]) / (7 * 24 * 60 * 60)
+        slope = float(np.polyfit(weeks, session_estimates, 1)[0])
+
+    return {
+        "set_count": len(weights),
+        "session_count": len(starts),
+        "estimated_one_rep_max": {
+            "epley": round(float(estimates.max()), 2),
+            "brzycki": round_or_none(float(np.nanmax(brzycki_estimates)) if not np.isnan(brzycki_estimates).all() else None),
+        },
+        "progression_per_week": round_or_none(slope),
+        "sessions": [
+            {
+                "start_time": start_times[start],
+                "volume": round(volume, 2),
+                "rolling_volume": round(rolling_volume, 2),
+                "set_count": set_count,
+                "best_weight": round(best_weight, 2),
+                "estimated_one_rep_max": round(estimate, 2),
+            }
+            for start, volume, rolling_volume, set_count, best_weight, estimate in zip(
+                starts.tolist(), volumes.tolist(), rolling_volumes.tolist(), set_counts.tolist(), best_weights.tolist(), session_estimates.tolist()
+            )
+        ],
+    }
+
+def round_or_none(value):
+    return None if value is None else round(value, 2)
+
+
+# The best of the sets per user and exercise as {(user id, exercise id): [max weight, repetitions with it, max estimate]},
+# the sets are given as (user id, exercise id, repetitions, weight) tuples
+def best_of_sets(rows):
+    best = {}
+
+    for user_id, exercise_id, repetitions, weight in rows:
+        # Sets without a weight can not beat a record
+        if weight is None:
+            continue
+
+        weight = Decimal(weight)
+        estimate = Decimal(epley(weight, repetitions)).quantize(Decimal("0.01"))
+        record = best.setdefault((user_id, exercise_id), [weight, repetitions, estimate])
+
+        if weight > record[0] or (weight == record[0] and repetitions > record[1]):
+            record[0], record[1] = weight, repetitions
+        record[2] = max(record[2], estimate)
+
+    return best
+
+# Merge sets into the personal records, the sets are given as (user id, exercise id, repetitions, weight) tuples.
+# The number of queries does not depend on the number of sets, and it has to run in the same transaction as the sets are created
+def record_sets(rows):
+    best = best_of_sets(rows)
+    if not best:
+        return
+
+    with transaction.atomic():
+        # Make sure the records exist, and lock them so concurrent sets of the same user and exercise are merged one after the other
+        PersonalRecord.objects.bulk_create(
+            [PersonalRecord(user_id=user_id, exercise_id=exercise_id) for user_id, exercise_id in best],
+            ignore_conflicts=True,
+        )
+        user_ids = {user_id for user_id, _ in best}
+        exercise_ids = {exercise_id for _, exercise_id in best}
+        records = PersonalRecord.objects.select_for_update().filter(user_id__in=user_ids, exercise_id__in=exercise_ids)
+
+        changed = []
+        for record in records:
+            candidate = best.get((record.user_id, record.exercise_id))
+            if candidate is None:
+                continue
+
+            weight, repetitions, estimate = candidate
+            is_changed = False
+
+            if weight > record.max_weight or (weight == record.max_weight and repetitions > record.max_weight_repetitions):
+                record.max_weight, record.max_weight_repetitions = weight, repetitions
+                is_changed = True
+            if estimate > record.max_estimated_one_rep_max:
+                record.max_estimated_one_rep_max = estimate
+                is_changed = True
+
+            if is_changed:
+                # bulk_update does not set auto_now fields
+                record.date_updated = now()
+                changed.append(record)
+
+        PersonalRecord.objects.bulk_update(changed, ["max_weight", "max_weight_repetitions", "max_estimated_one_rep_max", "date_updated"])
+
+# Merge newly created sets into the personal records
+def update_personal_records(sets):
+    sets = list(sets)
+    if not sets:
+        return
+
+    exercise_sessions = {
+        exercise_session_id: (user_id, exercise_id)
+        for exercise_session_id, user_id, exercise_id in ExerciseSession.objects.filter(id__in={workout_set.exercise_session_id for workout_set in sets})
+        .values_list("id", "workout_session__user_id", "exercise_id")
+    }
+
+    record_sets(
+        (*exercise_sessions[workout_set.exercise_session_id], workout_set.repetitions, workout_set.weight)
+        for workout_set in sets
+    )
+
+# Recompute the personal records of the users from all their sets, e.g. after sets have been changed or deleted, which can lower them.
+# Only the records of the exercise are recomputed when it is given. The records are replaced in one transaction,
+# so they are never missing for other requests, and sets logged at the same time are merged into the new records when it is committed
+def rebuild_personal_records(user_ids, exercise_id=None):
+    sets = Set.objects.filter(exercise_session__workout_session__user_id__in=user_ids, weight__isnull=False)
+    records = PersonalRecord.objects.filter(user_id__in=user_ids)
+    if exercise_id is not None:
+        sets = sets.filter(exercise_session__exercise_id=exercise_id)
+        records = records.filter(exercise_id=exercise_id)
+
+    with transaction.atomic():
+        best = best_of_sets(
+            sets.values_list("exercise_session__workout_session__user_id", "exercise_session__exercise_id", "repetitions", "weight").iterator()
+        )
+
+        records.delete()
+        PersonalRecord.objects.bulk_create([
+            PersonalRecord(user_id=user_id, exercise_id=exercise_id, max_weight=weight, max_weight_repetitions=repetitions, max_estimated_one_rep_max=estimate)
+            for (user_id, exercise_id), (weight, repetitions, estimate) in best.items()
+        ])
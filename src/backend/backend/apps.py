@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class BackendConfig(AppConfig):
+    name = "backend"
+
+    def ready(self):
+        # Register the signal receivers
+        from . import signals
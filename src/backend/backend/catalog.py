@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db.models import Subquery
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from rest_framework import serializers
+from rest_framework.response import Response
+from .models import DeletedExercise, Exercise, ExerciseCatalog
+from .serializers import ExerciseSerializer
+from .utils import get_exercise_catalog_version
+
+# Responses are cached per version of the catalog, so old versions are never read again and only have to expire
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# The version is the ETag of every catalog response. It is strong, since the response for a version is built once and then read from the cache
+def catalog_etag(version):
+    return f'"{version}"'
+
+# The version of the catalog in the same query as the exercises, so that the version always matches the exercises that were read
+def with_catalog_version(queryset):
+    return queryset.annotate(catalog_version=Subquery(ExerciseCatalog.objects.filter(id=1).values("version")[:1]))
+
+# Image URLs are absolute, so the responses are cached per host
+def catalog_cache_key(name, version, request):
+    return f"exercise_catalog:{name}:{version}:{request.build_absolute_uri('/')}"
+
+def build_exercise_list(request):
+    exercises = list(with_catalog_version(Exercise.objects.order_by("id")))
+    version = exercises[0].catalog_version if exercises else ExerciseCatalog.current_version()
+    return version, ExerciseSerializer(exercises, many=True, context={"request": request}).data
+
+def build_exercise_detail(request, exercise_id):
+    exercise = with_catalog_version(Exercise.objects.filter(id=exercise_id)).first()
+    if exercise is None:
+        raise Http404
+
+    return exercise.catalog_version, ExerciseSerializer(exercise, context={"request": request}).data
+
+# Answers a request for the catalog from the cached version, without reading the database when the app has the current version
+# or the response for it has been cached. Otherwise the response is built and cached for the version it was built from
+def catalog_response(request, name, build):
+    version = get_exercise_catalog_version()
+
+    not_modified = get_conditional_response(request, etag=catalog_etag(version))
+    if not_modified is not None:
+        not_modified["ETag"] = catalog_etag(version)
+        return not_modified
+
+    data = cache.get(catalog_cache_key(name, version, request))
+    if data is None:
+        version, data = build()
+        cache.set(catalog_cache_key(name, version, request), data, CATALOG_CACHE_TIMEOUT)
+
+    return Response(data, headers={"ETag": catalog_etag(version)})
+
+# The exercises that were changed or deleted after the version that the app has, and the version to ask from the next time.
+# The version is read first, so a change that is committed while the changes are read is either included or read the next time
+def catalog_changes(request, since):
+    version = get_exercise_catalog_version()
+    if since == version:
+        return {"version": version, "changed": [], "deleted": []}
+
+    version = ExerciseCatalog.current_version()
+    if since > version:
+        raise serializers.ValidationError("Unknown catalog version")
+
+    changed = Exercise.objects.filter(version__gt=since).order_by("id")
+    changed_ids = {exercise.id for exercise in changed}
+    deleted = DeletedExercise.objects.filter(version__gt=since).values_list("exercise_id", flat=True).distinct()
+
+    return {
+        "version": version,
+        "changed": ExerciseSerializer(changed, many=True, context={"request": request}).data,
+        "deleted": sorted(exercise_id for exercise_id in deleted if exercise_id not in changed_ids),
+    }
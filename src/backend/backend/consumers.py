@@ -1,41 +1,114 @@
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from .models import Message, ChatRoom, Workout, WorkoutMessage, Notification
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.tokens import AccessToken
-from urllib.parse import parse_qs
+from django.core.exceptions import ValidationError
 from .serializers import WorkoutSerializer
+from .utils import is_chat_room_participant
 from datetime import datetime
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Reconnecting clients that missed more messages than this have to reload the chat room instead
+MAX_REPLAYED_MESSAGES = 500
+
+# Name of the channel layer group the notification sockets of a user join
+def user_group_name(user_id):
+    return f"user_{user_id}"
+
+
+# Socket that only receives the notifications of the user, from every chat room they are in. It joins no chat room,
+# so it does not receive the chat messages, and works for users without any chat rooms
+class NotificationConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        # The user is resolved from the access token by JWTAuthMiddleware
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_group = user_group_name(user.id)
+        await self.channel_layer.group_add(self.user_group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        # The connection was rejected before joining the group
+        if not hasattr(self, "user_group"):
+            return
+
+        await self.channel_layer.group_discard(self.user_group, self.channel_name)
+
+    async def notification(self, event):
+        sender = event["sender"]
+        message = event.get("message", None)
+        workout = event.get("workout", None)
+        chat_room_name = event["chat_room_name"]
+        chat_room_id = event["chat_room_id"]
+        date_sent = event["date_sent"]
+        id = event.get("id", None)
+
+        if message:
+            await self.send(text_data=json.dumps({
+                "type": "notification",
+                "id": id,
+                "sender": sender,
+                "message": message,
+                "chat_room_name": chat_room_name,
+                "chat_room_id": chat_room_id,
+                "date_sent": date_sent
+            }))
+        elif workout:
+            await self.send(text_data=json.dumps({
+                "type": "notification",
+                "id": id,
+                "sender": sender,
+                "workout": workout,
+                "chat_room_name": chat_room_name,
+                "chat_room_id": chat_room_id,
+                "date_sent": date_sent
+            }))
+
 
 class Chatconsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        query_parameter = self.scope["query_string"] # Get the query parameters from the URL 
-        query_string = query_parameter.decode("utf-8") 
-        query_dict = parse_qs(query_string) # Parse the query parameters into a dictionary
-        token_list = query_dict.get("token", [None])
-        token = token_list[0] # Get the token value from the list
-
-        if token:
-            try:
-                validated_token = AccessToken(token)  # Validate the token
-                self.scope["user"] = await database_sync_to_async(User.objects.get)(id=validated_token["user_id"]) # Get the user from the token
-            except:
-                await self.close()  
-                return
-        else:
+        # The user and the chat room are resolved from the access token by JWTAuthMiddleware
+        user = self.scope["user"]
+        self.room = self.scope["chat_room"]
+        
+        if not user.is_authenticated or self.room is None:
+            await self.close()
+            return
+        
+        # Only participants can join the chat room
+        is_participant = await database_sync_to_async(is_chat_room_participant)(self.room.id, user.id)
+        if not is_participant:
             await self.close()
+            return
 
-        # Retrieve the chat room
-        self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_id = str(self.room_id) # Django channels expects the room identifier to be a string
-        self.room = await database_sync_to_async(ChatRoom.objects.get)(id=self.room_id)
+        self.room_id = str(self.room.id) # Django channels expects the room identifier to be a string
         
-        # Join group
+        # Join the group of the chat room, notifications are delivered to the NotificationConsumer instead
         await self.channel_layer.group_add(self.room_id, self.channel_name)
         await self.accept()
+        
+        # Sequence number of the latest replayed message, live messages up to this number are not sent again
+        self.replayed_seq = 0
+        
+        # A reconnecting client sends the sequence number of the last message it received, and only the missed messages are sent.
+        # The group is joined before reading the missed messages, so messages sent in between are not lost
+        query_dict = parse_qs(self.scope["query_string"].decode("utf-8"))
+        last_seq = query_dict.get("last_seq", [None])[0]
+        if last_seq is not None and last_seq.isdigit():
+            await self.replay_missed_messages(int(last_seq))
     
     async def disconnect(self, close_code):
+        # The connection was rejected before joining the group
+        if not hasattr(self, "room_id"):
+            return
+        
         await self.channel_layer.group_discard(self.room_id, self.channel_name)
     
     async def receive(self, text_data): # WebSocket server receives data from the client
@@ -47,6 +120,12 @@ class Chatconsumer(AsyncWebsocketConsumer):
             print("User is not authenticated")
             return
         
+        # The user can be removed from the chat room while connected, and is then disconnected
+        is_participant = await database_sync_to_async(is_chat_room_participant)(self.room.id, sender.id)
+        if not is_participant:
+            await self.close()
+            return
+        
         # Initialize variables, these can be stored as none to the database model Notification, dependent on what kind of notification it is
         workout = None
         message_content = None
@@ -58,7 +137,7 @@ class Chatconsumer(AsyncWebsocketConsumer):
                 print("Workout not found")
                 return
 
-            await self.save_workout_message(sender, workout)
+            workout_message = await self.save_workout_message(sender, workout)
 
             workout_serialized = await self.get_serialized_workout(workout) 
             await self.channel_layer.group_send(
@@ -66,7 +145,8 @@ class Chatconsumer(AsyncWebsocketConsumer):
                 {
                     "type": "workout_message",  
                     "workout": workout_serialized,
-                    "sender": sender.id
+                    "sender": sender.id,
+                    "seq": workout_message.seq
                 }
             )
         
@@ -97,14 +177,15 @@ class Chatconsumer(AsyncWebsocketConsumer):
                 await database_sync_to_async(workout.owners.add)(user_id)
 
                 workout_serialized = await self.get_serialized_workout(workout)
-                await self.save_message(user, content)
+                message = await self.save_message(user, content)
                 await self.channel_layer.group_send(
                     self.room_id,
                     {
                         "type": "confirmation_message",
                         "workout": workout_serialized,
                         "added_to_workout": user.username,
-                        "content": content
+                        "content": content,
+                        "seq": message.seq
                     }
                 )
 
@@ -115,14 +196,15 @@ class Chatconsumer(AsyncWebsocketConsumer):
                 print("Received invalid websocket message")
                 return
             
-            await self.save_message(sender, message_content)
+            message = await self.save_message(sender, message_content)
 
             await self.channel_layer.group_send(
                 self.room_id,
                 {
                     "type": "chat_message",
                     "content": message_content,
-                    "sender": sender.id
+                    "sender": sender.id,
+                    "seq": message.seq
                 }
             )
         
@@ -139,28 +221,28 @@ class Chatconsumer(AsyncWebsocketConsumer):
                 print(f"User with ID {user_id} not found!")
                 return  
             
-            await self.save_message(user, content)
+            message = await self.save_message(user, content)
             await self.channel_layer.group_send(
                 self.room_id,
                 {
                     "type": "leave",
                     "left_the_group_chat": user.username,
-                    "content": content
+                    "content": content,
+                    "seq": message.seq
                 }
             )
 
             
 
-        # Broadcast notification to the rest of the users in the chat room, excluding the sender. And saving the notification to the database
+        # Send a notification to the rest of the users in the chat room, excluding the sender. And saving the notification to the database
         if type == "message":
-            notification = await self.save_notification(sender, message_content, workout) 
+            notification_ids = await self.save_notification(sender, message_content, workout) 
             
-            if notification:  # Only send if notification was created
-                await self.channel_layer.group_send(
-                    self.room_id,
+            if notification_ids:  # Only send if notifications were created
+                await self.send_notifications(
+                    notification_ids,
                     {
                         "type": "notification",
-                        "id": notification.id,
                         "sender": sender.username,
                         "message": message_content,
                         "chat_room_name": self.room.name,
@@ -169,15 +251,14 @@ class Chatconsumer(AsyncWebsocketConsumer):
                     }
                 ) 
         elif type == "workout":
-            notification = await self.save_notification(sender, message_content, workout)
+            notification_ids = await self.save_notification(sender, message_content, workout)
             
-            if notification:  # Only send if notification was created
+            if notification_ids:  # Only send if notifications were created
                 workout_serialized = await self.get_serialized_workout(workout)
-                await self.channel_layer.group_send(
-                    self.room_id,
+                await self.send_notifications(
+                    notification_ids,
                     {
                         "type": "notification",
-                        "id": notification.id,
                         "sender": sender.username,
                         "workout": workout_serialized,
                         "chat_room_name": self.room.name,
@@ -186,102 +267,139 @@ class Chatconsumer(AsyncWebsocketConsumer):
                     }
                 )
     
+    # Route the notification only to the notification sockets of each recipient, together with the id of their own notification
+    async def send_notifications(self, notification_ids, event):
+        for user_id, notification_id in notification_ids.items():
+            await self.channel_layer.group_send(user_group_name(user_id), {**event, "id": notification_id})
+    
+    # Live messages that were already sent while replaying the missed messages are skipped
+    def is_replayed(self, seq):
+        return seq <= self.replayed_seq
+    
     async def chat_message(self, event):
         message_content = event["content"]
         sender = event["sender"]
+        seq = event["seq"]
+        
+        if self.is_replayed(seq):
+            return
         
         await self.send(text_data=json.dumps({
             "type": "message",
             "content": message_content,
-            "sender": sender
+            "sender": sender,
+            "seq": seq
         }))
 
 
     async def workout_message(self, event):
         workout = event["workout"]
         sender = event["sender"]
+        seq = event["seq"]
+        
+        if self.is_replayed(seq):
+            return
 
         await self.send(text_data=json.dumps({
             "type": "workout",
             "workout": workout,
-            "sender": sender
+            "sender": sender,
+            "seq": seq
         }))
 
     async def confirmation_message(self, event):
         workout = event["workout"]
         added_to_workout = event["added_to_workout"]
         content = event["content"]
+        seq = event["seq"]
+        
+        if self.is_replayed(seq):
+            return
 
         await self.send(text_data=json.dumps({
             "type": "confirmation",
             "workout": workout,
             "added_to_workout": added_to_workout,
-            "content": content
+            "content": content,
+            "seq": seq
         }))
     
     async def leave(self, event):
         left_the_group_chat = event["left_the_group_chat"]
         content = event["content"]
+        seq = event["seq"]
+        
+        if self.is_replayed(seq):
+            return
         
         await self.send(text_data=json.dumps({
             "type": "leave",
             "left_the_group_chat": left_the_group_chat,
-            "content": content
+            "content": content,
+            "seq": seq
         }))
-
-    async def notification(self, event):
-        sender = event["sender"]
-        message = event.get("message", None)
-        workout = event.get("workout", None)
-        chat_room_name = event["chat_room_name"]
-        chat_room_id = event["chat_room_id"]
-        date_sent = event["date_sent"]
-        id = event.get("id", None)
-
-        if message:
-            await self.send(text_data=json.dumps({
-                "type": "notification",
-                "id": id,
-                "sender": sender,
-                "message": message,
-                "chat_room_name": chat_room_name,
-                "chat_room_id": chat_room_id,
-                "date_sent": date_sent
-            }))
-        elif workout:
+    
+    async def replay_missed_messages(self, last_seq):
+        missed_messages, latest_seq = await self.get_missed_messages(last_seq)
+        
+        # Too many messages were missed, the client should reload the history of the chat room instead
+        if missed_messages is None:
+            self.replayed_seq = latest_seq
             await self.send(text_data=json.dumps({
-                "type": "notification",
-                "id": id,
-                "sender": sender,
-                "workout": workout,
-                "chat_room_name": chat_room_name,
-                "chat_room_id": chat_room_id,
-                "date_sent": date_sent
+                "type": "resync",
+                "seq": latest_seq
             }))
-    
+            return
+        
+        for missed_message in missed_messages:
+            self.replayed_seq = missed_message["seq"]
+            await self.send(text_data=json.dumps(missed_message))
+
     @database_sync_to_async
     def save_message(self, sender, content):
-        Message.objects.create(sender=sender, content=content, chat_room=self.room)
+        return Message.objects.create(sender=sender, content=content, chat_room=self.room)
 
     @database_sync_to_async
     def save_workout_message(self, sender, workout):
-        WorkoutMessage.objects.create(sender=sender, workout=workout, chat_room=self.room)
+        return WorkoutMessage.objects.create(sender=sender, workout=workout, chat_room=self.room)
+
+    # Messages and workout messages sent after last_seq, in the same format as they are broadcast.
+    # Confirmation and leave messages are stored as normal messages, and are replayed as such
+    @database_sync_to_async
+    def get_missed_messages(self, last_seq):
+        messages = Message.objects.filter(chat_room=self.room, seq__gt=last_seq).order_by("seq")[:MAX_REPLAYED_MESSAGES + 1]
+        workout_messages = WorkoutSerializer.prefetch_related(
+            WorkoutMessage.objects.filter(chat_room=self.room, seq__gt=last_seq).select_related("workout"),
+            prefix="workout__",
+        ).order_by("seq")[:MAX_REPLAYED_MESSAGES + 1]
+        
+        missed_messages = [
+            {"type": "message", "content": message.content, "sender": message.sender_id, "seq": message.seq}
+            for message in messages
+        ]
+        missed_messages += [
+            {"type": "workout", "workout": WorkoutSerializer(workout_message.workout).data, "sender": workout_message.sender_id, "seq": workout_message.seq}
+            for workout_message in workout_messages
+        ]
+        missed_messages.sort(key=lambda missed_message: missed_message["seq"])
+        
+        if len(missed_messages) > MAX_REPLAYED_MESSAGES:
+            latest_seq = ChatRoom.objects.filter(id=self.room.id).values_list("last_seq", flat=True).first()
+            return None, latest_seq
+        
+        return missed_messages, None
 
     @database_sync_to_async
     def save_notification(self, sender, message, workout):
-        notification = None
-        other_participants = False
-        # Must save to database for each User in the chat room, exluding the sender
-        for user in self.room.participants.all():
-            if user != sender:
-                other_participants = True
-                # Save either a message or a workout (see model Notification)
-                if message:
-                    notification = Notification.objects.create(user=user, sender=sender, message=message, chat_room_name=self.room.name, chat_room_id=self.room.id)
-                if workout:
-                    notification = Notification.objects.create(user=user, sender=sender, workout_message=workout, chat_room_name=self.room.name, chat_room_id=self.room.id)
-
-        return notification if other_participants else None # Retrieve notification so that its ID can be sent to the client
+        # Save either a message or a workout notification (see model Notification) for each user in the chat room, excluding the sender
+        # Retrieve the notification ids so that they can be sent to the clients.
+        # The message has already been saved and sent when the sender was removed from the chat room after the membership check,
+        # so only the notifications are left out and the socket is kept open
+        try:
+            return Notification.create_for_chat_room(self.room, sender, message=message, workout=workout)
+        except ValidationError:
+            logger.warning("No notifications created for a message of user %s in chat room %s", sender.id, self.room.id, exc_info=True)
+            return []
 
     @database_sync_to_async
     def get_serialized_workout(self, workout):
@@ -0,0 +1,123 @@
+import csv
+import json
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from .models import WorkoutSession
+
+# Number of workout sessions read per query, with all their exercise sessions and sets
+EXPORT_CHUNK_SIZE = 200
+
+CSV_COLUMNS = [
+    "workout_session_id",
+    "start_time",
+    "workout",
+    "duration",
+    "calories_burned",
+    "exercise_session_id",
+    "exercise",
+    "set_id",
+    "repetitions",
+    "weight",
+]
+
+# The rows of the next chunk_size workout sessions of a user after the workout session `after`, as one flat row per set in the order of CSV_COLUMNS.
+# Workout sessions and exercise sessions without sets are included as rows without a set.
+# The workout sessions are paged on (start time, id) instead of with an offset, so every chunk is read with one query from the index
+def training_history_chunk(user_id, after, chunk_size):
+    workout_sessions = WorkoutSession.objects.filter(user_id=user_id)
+    if after is not None:
+        start_time, workout_session_id = after
+        workout_sessions = workout_sessions.filter(Q(start_time__gt=start_time) | Q(start_time=start_time, id__gt=workout_session_id))
+
+    return list(
+        WorkoutSession.objects.filter(id__in=workout_sessions.order_by("start_time", "id").values("id")[:chunk_size])
+        .order_by("start_time", "id", "exercise_sessions__id", "exercise_sessions__sets__id")
+        .values_list(
+            "id",
+            "start_time",
+            "workout__name",
+            "duration",
+            "calories_burned",
+            "exercise_sessions__id",
+            "exercise_sessions__exercise__name",
+            "exercise_sessions__sets__id",
+            "exercise_sessions__sets__repetitions",
+            "exercise_sessions__sets__weight",
+        )
+    )
+
+# The training history of a user in chunks of rows, every chunk ends with the last row of a workout session.
+# The response is served by the ASGI server, so the chunks are read one at a time in the thread of the database and only one chunk
+# is kept in memory. A synchronous iterator would be read completely into a list before the first chunk is sent
+async def training_history_chunks(user_id, chunk_size):
+    after = None
+
+    while True:
+        rows = await sync_to_async(training_history_chunk)(user_id, after, chunk_size)
+        if rows:
+            yield rows
+
+        if len({row[0] for row in rows}) < chunk_size:
+            return
+        after = (rows[-1][1], rows[-1][0])
+
+# File-like object that returns what is written to it, so csv.writer can be used for streaming
+class Echo:
+    def write(self, value):
+        return value
+
+async def stream_csv(chunks):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+
+    async for rows in chunks:
+        yield "".join(writer.writerow(["" if value is None else value for value in row]) for row in rows)
+
+# One JSON object per workout session with its exercise sessions and sets nested inside.
+# The rows are sorted on the workout session and a chunk never ends inside one, so every chunk is sent as the workout sessions in it
+async def stream_ndjson(chunks):
+    async for rows in chunks:
+        sessions = []
+
+        for session_id, start_time, workout, duration, calories_burned, exercise_session_id, exercise, set_id, repetitions, weight in rows:
+            if not sessions or sessions[-1]["id"] != session_id:
+                sessions.append({
+                    "id": session_id,
+                    "start_time": start_time,
+                    "workout": workout,
+                    "duration": duration,
+                    "calories_burned": calories_burned,
+                    "exercise_sessions": [],
+                })
+
+            if exercise_session_id is None:
+                continue
+
+            exercise_sessions = sessions[-1]["exercise_sessions"]
+            if not exercise_sessions or exercise_sessions[-1]["id"] != exercise_session_id:
+                exercise_sessions.append({"id": exercise_session_id, "exercise": exercise, "sets": []})
+
+            if set_id is not None:
+                exercise_sessions[-1]["sets"].append({"id": set_id, "repetitions": repetitions, "weight": weight})
+
+        yield "".join(json.dumps(session, cls=DjangoJSONEncoder) + "\n" for session in sessions)
+
+EXPORT_TYPES = {
+    "csv": (stream_csv, "text/csv", "csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson", "ndjson"),
+}
+
+# Streams the training history of a user as ?type=csv (default) or ?type=ndjson.
+# ?format= is not used since it is reserved by the REST framework for choosing a renderer
+def training_history_response(request, user):
+    export_type = request.query_params.get("type", "csv")
+    if export_type not in EXPORT_TYPES:
+        raise serializers.ValidationError("Type must be csv or ndjson")
+
+    stream, content_type, extension = EXPORT_TYPES[export_type]
+    response = StreamingHttpResponse(stream(training_history_chunks(user.id, EXPORT_CHUNK_SIZE)), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{user.username}-training-history.{extension}"'
+    return response
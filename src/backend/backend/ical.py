@@ -0,0 +1,157 @@
+import hashlib
+from datetime import timedelta, timezone
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.timezone import localdate, now
+from .models import PersonalTrainerScheduledWorkout, RecurringScheduledWorkout, ScheduledWorkout
+from .recurrence import expand, rules_in_range, validate_window
+from .utils import get_schedule_version, parse_date_range
+
+# Number of scheduled workouts read per query
+CALENDAR_CHUNK_SIZE = 2000
+
+# Range of the feed when ?start= and ?end= are not given, around today. Like the other ranges it can be at most MAX_RECURRENCE_WINDOW long
+CALENDAR_PAST = timedelta(weeks=4)
+CALENDAR_FUTURE = timedelta(weeks=26)
+
+# Scheduled workouts do not have a duration, so every event is shown as one hour
+EVENT_DURATION = "PT1H"
+
+# Lines of an iCalendar file can be at most 75 octets long without the line break
+MAX_LINE_LENGTH = 75
+
+
+# Commas, semicolons and backslashes have a meaning in iCalendar text, and line breaks are written as \n
+def escape_text(value):
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+# Longer lines are folded by continuing them on the next line after a space, without splitting a UTF-8 character
+def fold(line):
+    encoded = line.encode()
+    parts = []
+    limit = MAX_LINE_LENGTH
+
+    while len(encoded) > limit:
+        cut = limit
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut])
+        encoded = encoded[cut:]
+
+        # The space at the start of a continuation line counts towards its length
+        limit = MAX_LINE_LENGTH - 1
+
+    parts.append(encoded)
+    return b"\r\n ".join(parts).decode() + "\r\n"
+
+def format_datetime(value):
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def event(uid, stamp, scheduled_date, title, description=None):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{format_datetime(scheduled_date)}",
+        f"DURATION:{EVENT_DURATION}",
+        f"SUMMARY:{escape_text(title)}",
+    ]
+    if description is not None:
+        lines.append(f"DESCRIPTION:{escape_text(description)}")
+    lines.append("END:VEVENT")
+
+    return "".join(fold(line) for line in lines)
+
+# One chunk of the scheduled workouts of a queryset after the (scheduled_date, id) of the last one of the previous chunk,
+# so every chunk is read from the index instead of skipping the rows of the chunks before it. The first fields are id and scheduled_date
+def scheduled_workouts_chunk(queryset, fields, after, chunk_size):
+    if after is not None:
+        scheduled_date, scheduled_workout_id = after
+        queryset = queryset.filter(Q(scheduled_date__gt=scheduled_date) | Q(scheduled_date=scheduled_date, id__gt=scheduled_workout_id))
+
+    return list(queryset.order_by("scheduled_date", "id").values_list(*fields)[:chunk_size])
+
+# The chunks of scheduled workouts, read in a thread since the ORM cannot be used from the event loop
+async def scheduled_workouts_chunks(queryset, fields, chunk_size):
+    after = None
+
+    while True:
+        rows = await sync_to_async(scheduled_workouts_chunk)(queryset, fields, after, chunk_size)
+        if rows:
+            yield rows
+
+        if len(rows) < chunk_size:
+            return
+        after = (rows[-1][1], rows[-1][0])
+
+# The occurrences of the recurring workouts as events. They are only expanded in the range, so they are read at once
+def recurring_events(user_id, start, end, stamp):
+    events = []
+
+    rules = rules_in_range(RecurringScheduledWorkout.objects.filter(Q(user_id=user_id) | Q(pt_id=user_id)).select_related("user", "pt"), start, end)
+    for rule, occurrence, scheduled_date, workout_template in expand(rules, start, end):
+        description = None
+        if rule.pt_id is not None:
+            description = f"With {rule.pt.username if rule.user_id == user_id else rule.user.username}"
+
+        # An occurrence keeps its identity when it is moved, so calendar apps update the event instead of adding a new one
+        events.append(event(f"recurring-{rule.id}-{format_datetime(occurrence)}@igym", stamp, scheduled_date, workout_template.name, description))
+
+    return "".join(events)
+
+# The scheduled workouts of a user in [start, end) as an iCalendar file, one chunk of events at a time.
+# It is an asynchronous iterator, so the ASGI server sends every chunk when it is read instead of reading the whole file into memory first.
+# Workouts scheduled by a personal trainer are included for both the client and the personal trainer, with the other person in the description
+async def stream_calendar(user_id, start, end, chunk_size):
+    stamp = format_datetime(now())
+
+    yield "".join(fold(line) for line in ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//iGym//Schedule//EN", "CALSCALE:GREGORIAN", "X-WR-CALNAME:iGym"])
+
+    async for rows in scheduled_workouts_chunks(
+        ScheduledWorkout.objects.filter(user_id=user_id, scheduled_date__gte=start, scheduled_date__lt=end),
+        ["id", "scheduled_date", "workout_template__name"],
+        chunk_size,
+    ):
+        yield "".join(event(f"scheduled-{scheduled_workout_id}@igym", stamp, scheduled_date, title) for scheduled_workout_id, scheduled_date, title in rows)
+
+    async for rows in scheduled_workouts_chunks(
+        PersonalTrainerScheduledWorkout.objects.filter(Q(client_id=user_id) | Q(pt_id=user_id), scheduled_date__gte=start, scheduled_date__lt=end),
+        ["id", "scheduled_date", "workout_template__name", "client_id", "client__username", "pt__username"],
+        chunk_size,
+    ):
+        yield "".join(
+            event(f"pt-scheduled-{scheduled_workout_id}@igym", stamp, scheduled_date, title, f"With {pt if client_id == user_id else client}")
+            for scheduled_workout_id, scheduled_date, title, client_id, client, pt in rows
+        )
+
+    yield await sync_to_async(recurring_events)(user_id, start, end, stamp)
+
+    yield fold("END:VCALENDAR")
+
+# The calendar feed of a user in the range of ?start= and ?end=, or around today when they are not given.
+# The ETag is made from the version of the schedule of the user and the range, so a poll with a matching If-None-Match
+# is answered with 304 Not Modified from the cache, without reading the scheduled workouts
+def calendar_feed_response(request, user_id):
+    params = request.query_params
+    today = localdate()
+    start, end = parse_date_range({
+        "start": params.get("start") or (today - CALENDAR_PAST).isoformat(),
+        "end": params.get("end") or (today + CALENDAR_FUTURE).isoformat(),
+    })
+    validate_window(start, end)
+
+    # Weak since the time stamps of the events change, even though the events do not
+    version = hashlib.md5(f"{get_schedule_version(user_id)}:{start.isoformat()}:{end.isoformat()}".encode()).hexdigest()
+    etag = f'W/"{version}"'
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified["ETag"] = etag
+        return not_modified
+
+    response = StreamingHttpResponse(stream_calendar(user_id, start, end, CALENDAR_CHUNK_SIZE), content_type="text/calendar; charset=utf-8")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,128 @@
+import hashlib
+import multiprocessing
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+
+# Smaller copies of the uploaded images, as (width, height, cropped). Cropped variants are cut to exactly that size,
+# the others are scaled down to fit inside it and keep the shape of the image
+IMAGE_VARIANTS = {
+    "thumbnail": (256, 256, True),
+    "large": (1280, 1280, False),
+}
+
+# The variants are WebP, which is a fraction of the size of the same image as JPEG or PNG
+VARIANT_FORMAT = "WEBP"
+VARIANT_EXTENSION = "webp"
+VARIANT_QUALITY = 80
+
+# Length of the hash of the uploaded image in the names of its variants
+HASH_LENGTH = 20
+
+IMAGE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Errors of Pillow for uploads that are not images or cannot be decoded, e.g. truncated files and images that are too large to decode safely
+UNREADABLE_IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError, OSError)
+
+
+# Renders one variant of an image. Runs in the worker processes, so it only uses the bytes of the image and no Django state
+def render_variant(data, variant):
+    width, height, cropped = IMAGE_VARIANTS[variant]
+
+    with Image.open(BytesIO(data)) as image:
+        # JPEG images are decoded at a lower resolution when it is still larger than the variant, which is much faster for photos
+        image.draft("RGB", (width, height))
+
+        # Photos from phones are stored sideways with the rotation in the EXIF data
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+        if cropped:
+            image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+        output = BytesIO()
+        image.save(output, VARIANT_FORMAT, quality=VARIANT_QUALITY)
+        return output.getvalue()
+
+
+# The variants are rendered in worker processes, so the resizing and encoding runs next to the requests instead of holding the GIL.
+# The pool is started on first use, so every process that serves requests gets its own after forking.
+# The workers are started by a fork server instead of forking the process that serves requests, which would copy its threads,
+# locks and database connections into them
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+
+    # Daemon processes of multiprocessing, like the workers of the parallel test runner, cannot start processes of their own
+    if multiprocessing.current_process().daemon:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+        return _pool
+
+# Renders the variants of an image in parallel, as {variant: bytes}
+def render_variants(data, variants):
+    global _pool
+
+    pool = get_pool()
+    if pool is None:
+        return {variant: render_variant(data, variant) for variant in variants}
+
+    try:
+        futures = {variant: pool.submit(render_variant, data, variant) for variant in variants}
+        return {variant: future.result() for variant, future in futures.items()}
+    except BrokenProcessPool:
+        # A worker was killed, e.g. by running out of memory, so the next image starts a new pool
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+
+
+def variant_name(field, digest, variant):
+    return posixpath.join(field.upload_to, "variants", f"{digest}-{variant}.{VARIANT_EXTENSION}")
+
+# Stores the variants of an image and returns their names as {variant: name}.
+# The names contain the hash of the image, so they never change and can be cached forever, and uploading the same image again
+# reuses the variants that are already stored. Images that cannot be decoded are a validation error of the field, so uploads get a 400
+def save_variants(field_file, data):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    storage = field_file.storage
+    names = {variant: variant_name(field_file.field, digest, variant) for variant in IMAGE_VARIANTS}
+
+    missing = [variant for variant, name in names.items() if not storage.exists(name)]
+    try:
+        rendered = render_variants(data, missing)
+    except UNREADABLE_IMAGE_ERRORS:
+        raise ValidationError({field_file.field.name: "The file is not a valid image"})
+
+    for variant, content in rendered.items():
+        names[variant] = storage.save(names[variant], ContentFile(content))
+
+    return names
+
+# Sets the variants of an image field before the model is saved, when a new image has been uploaded to it.
+# Images that are set by name, e.g. by fixtures, are not read here, their variants are made by the rebuild_image_variants command
+def update_image_variants(instance, field_name, variants_field_name):
+    field_file = getattr(instance, field_name)
+
+    if not field_file:
+        setattr(instance, variants_field_name, {})
+    elif not field_file._committed:
+        field_file.seek(0)
+        data = field_file.read()
+        field_file.seek(0)
+        setattr(instance, variants_field_name, save_variants(field_file, data))
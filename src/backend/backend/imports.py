@@ -0,0 +1,282 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_duration
+from rest_framework import serializers
+from .adherence import invalidate_adherence
+from .analytics import add_sets, add_workout_sessions, update_personal_records
+from .models import Exercise, ExerciseSession, Set, Workout, WorkoutSession, validate_name
+from .utils import parse_date_parameter
+
+# Number of workout sessions and sets inserted per transaction. A workout session is never split between two transactions
+IMPORT_CHUNK_SIZE = 1000
+
+# Only the first errors are included in the report, the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Used for workout sessions without a workout name
+DEFAULT_WORKOUT_NAME = "Imported workout"
+
+REQUIRED_CSV_COLUMNS = {"start_time", "exercise"}
+
+
+# A training log is read as a stream of rows with one set each, so that files of any size can be imported with flat memory use.
+# Every row has the line it was read from, a key that is the same for the rows of one workout session, the fields of the workout session
+# and the exercise, repetitions and weight of the set. Exercise and set fields are empty for workout sessions or exercise sessions without sets
+
+# CSV with a header, in the same columns as the export. The rows of a workout session have to follow each other,
+# and are grouped on workout_session_id when the column is present and on start_time and workout otherwise.
+# Following rows of the same exercise in a workout session are one exercise session, unless they have different exercise_session_id
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+
+    missing = REQUIRED_CSV_COLUMNS - set(reader.fieldnames or [])
+    if missing:
+        raise serializers.ValidationError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    for row in reader:
+        yield {
+            **row,
+            "line": reader.line_num,
+            "error": None,
+            "session": row.get("workout_session_id") or (row.get("start_time"), row.get("workout")),
+            "exercise_session": row.get("exercise_session_id"),
+        }
+
+# One workout session per line as a JSON object, in the same format as the export
+def read_ndjson(lines):
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            session = json.loads(line)
+            if not isinstance(session, dict):
+                raise ValueError
+            exercise_sessions = session.get("exercise_sessions") or []
+            if not isinstance(exercise_sessions, list) or not all(isinstance(exercise_session, dict) for exercise_session in exercise_sessions):
+                raise ValueError
+        except ValueError:
+            yield {"line": line_number, "error": "Invalid JSON"}
+            continue
+
+        fields = {field: session.get(field) for field in ("start_time", "workout", "duration", "calories_burned")}
+        rows = [
+            {"exercise_session": index, "exercise": exercise_session.get("exercise"), "repetitions": workout_set.get("repetitions"), "weight": workout_set.get("weight")}
+            for index, exercise_session in enumerate(exercise_sessions)
+            for workout_set in (exercise_session.get("sets") or [{}])
+            if isinstance(workout_set, dict)
+        ]
+
+        for row in rows or [{}]:
+            yield {"line": line_number, "session": line_number, **fields, **row}
+
+READERS = {
+    "csv": read_csv,
+    "ndjson": read_ndjson,
+}
+
+# The type of a training log from the extension of its file name, csv when it is not known
+def guess_import_type(file_name):
+    return "ndjson" if file_name.lower().endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def is_empty(value):
+    return value is None or value == ""
+
+def parse_decimal(value, name, max_value=Decimal("999.99")):
+    try:
+        parsed = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a number")
+
+    if not parsed.is_finite() or parsed < 0 or parsed > max_value:
+        raise ValueError(f"{name} must be between 0 and {max_value}")
+    return parsed.quantize(Decimal("0.01"))
+
+def parse_session(row):
+    if is_empty(row.get("start_time")):
+        raise ValueError("start_time is required")
+    try:
+        start_time = parse_date_parameter(str(row["start_time"]), "start_time")
+    except serializers.ValidationError:
+        raise ValueError("start_time must be a date or a datetime")
+
+    duration = None
+    if not is_empty(row.get("duration")):
+        duration = parse_duration(str(row["duration"]))
+        if duration is None or duration.total_seconds() < 0:
+            raise ValueError("duration must be a positive duration")
+
+    calories_burned = None if is_empty(row.get("calories_burned")) else parse_decimal(row["calories_burned"], "calories_burned")
+
+    workout = DEFAULT_WORKOUT_NAME if is_empty(row.get("workout")) else str(row["workout"]).strip()
+    try:
+        validate_name(workout)
+        if len(workout) > Workout._meta.get_field("name").max_length:
+            raise DjangoValidationError("Too long")
+    except DjangoValidationError:
+        raise ValueError("workout is not a valid name")
+
+    return start_time, workout, duration, calories_burned
+
+def parse_set(row):
+    if is_empty(row.get("repetitions")):
+        if not is_empty(row.get("weight")):
+            raise ValueError("repetitions is required")
+        return None
+
+    try:
+        repetitions = int(row["repetitions"])
+    except (TypeError, ValueError):
+        raise ValueError("repetitions must be an integer")
+    if repetitions < 0:
+        raise ValueError("repetitions must be positive")
+
+    weight = None if is_empty(row.get("weight")) else parse_decimal(row["weight"], "weight")
+    return repetitions, weight
+
+
+# Imports the rows of a training log for the user. Rows that cannot be imported are reported as errors without stopping the import.
+# Exercise names are resolved with an index of the exercise catalog, and workouts by name among the workouts of the user,
+# creating a workout when the user does not have one with that name. progress is called with the report after every chunk
+class TrainingLogImporter:
+    def __init__(self, user, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+        # Names are matched case insensitively, and the first exercise wins when several have the same name
+        self.exercises = {}
+        for exercise_id, name in Exercise.objects.order_by("id").values_list("id", "name"):
+            self.exercises.setdefault(name.strip().casefold(), exercise_id)
+
+        self.workouts = {}
+        for workout_id, name in Workout.objects.filter(Q(author=user) | Q(owners=user)).order_by("id").values_list("id", "name").distinct():
+            self.workouts.setdefault(name.casefold(), workout_id)
+
+        self.report = {"workout_sessions": 0, "exercise_sessions": 0, "sets": 0, "error_count": 0, "errors": []}
+
+        # Workout sessions waiting to be inserted, as (workout session, start time, [(exercise session, [sets])])
+        self.pending = []
+        self.pending_sets = 0
+        self.workout_exercises = set()
+
+    def run(self, rows):
+        session_key = None
+        session = None
+        exercise_session_key = None
+
+        for row in rows:
+            if row.get("error"):
+                self.add_error(row["line"], row["error"])
+                continue
+
+            try:
+                if session_key is None or row["session"] != session_key:
+                    session_key = row["session"]
+                    exercise_session_key = None
+                    session = None
+
+                    if self.pending_sets + len(self.pending) >= self.chunk_size:
+                        self.flush()
+                    session = self.add_session(row)
+                elif session is None:
+                    raise ValueError("The workout session of this row could not be imported")
+
+                if is_empty(row.get("exercise")):
+                    if not is_empty(row.get("repetitions")):
+                        raise ValueError("exercise is required")
+                    continue
+
+                workout_set = parse_set(row)
+                exercise_id = self.exercises.get(str(row["exercise"]).strip().casefold())
+                if exercise_id is None:
+                    raise ValueError(f"Unknown exercise: {row['exercise']}")
+
+                if (row["exercise_session"], exercise_id) != exercise_session_key:
+                    exercise_session_key = (row["exercise_session"], exercise_id)
+                    session[2].append((ExerciseSession(workout_session=session[0], exercise_id=exercise_id), []))
+                    self.workout_exercises.add((session[0].workout_id, exercise_id))
+
+                if workout_set is not None:
+                    session[2][-1][1].append(Set(exercise_session=session[2][-1][0], repetitions=workout_set[0], weight=workout_set[1]))
+                    self.pending_sets += 1
+            except ValueError as error:
+                self.add_error(row["line"], str(error))
+
+        self.flush()
+        return self.report
+
+    def add_error(self, line, error):
+        self.report["error_count"] += 1
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"line": line, "error": error})
+
+    def add_session(self, row):
+        start_time, workout, duration, calories_burned = parse_session(row)
+
+        workout_id = self.workouts.get(workout.casefold())
+        if workout_id is None:
+            created = Workout.objects.create(name=workout, author=self.user)
+            created.owners.add(self.user)
+            workout_id = self.workouts[workout.casefold()] = created.id
+
+        session = (WorkoutSession(user=self.user, workout_id=workout_id, duration=duration, calories_burned=calories_burned), start_time, [])
+        self.pending.append(session)
+        return session
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        with transaction.atomic():
+            # Exercise sessions have to be of exercises in the workout, so the imported exercises are added to the workouts
+            Workout.exercises.through.objects.bulk_create(
+                [Workout.exercises.through(workout_id=workout_id, exercise_id=exercise_id) for workout_id, exercise_id in self.workout_exercises],
+                ignore_conflicts=True,
+            )
+
+            workout_sessions = WorkoutSession.objects.bulk_create([workout_session for workout_session, _, _ in self.pending])
+
+            # start_time is set to the current time on insert, so it is set to the logged time afterwards
+            for workout_session, start_time, _ in self.pending:
+                workout_session.start_time = start_time
+            WorkoutSession.objects.bulk_update(workout_sessions, ["start_time"])
+
+            exercise_sessions = ExerciseSession.objects.bulk_create([
+                exercise_session for _, _, exercise_sessions in self.pending for exercise_session, _ in exercise_sessions
+            ])
+            sets = Set.objects.bulk_create([
+                workout_set for _, _, exercise_sessions in self.pending for _, workout_sets in exercise_sessions for workout_set in workout_sets
+            ])
+
+            # bulk_create does not send post_save, so the objects are added to the training rollups and personal records here
+            add_workout_sessions(workout_sessions)
+            add_sets(sets)
+            update_personal_records(sets)
+
+        # The imported workout sessions can complete scheduled workouts in weeks with a cached adherence
+        invalidate_adherence((workout_session.user_id, workout_session.start_time) for workout_session in workout_sessions)
+
+        self.report["workout_sessions"] += len(workout_sessions)
+        self.report["exercise_sessions"] += len(exercise_sessions)
+        self.report["sets"] += len(sets)
+
+        self.pending = []
+        self.pending_sets = 0
+        self.workout_exercises = set()
+
+        if self.progress is not None:
+            self.progress(self.report)
+
+
+# Imports a training log of the given type from an iterable of lines
+def import_training_log(user, lines, import_type, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    if import_type not in READERS:
+        raise serializers.ValidationError("Type must be csv or ndjson")
+
+    return TrainingLogImporter(user, chunk_size, progress).run(READERS[import_type](lines))
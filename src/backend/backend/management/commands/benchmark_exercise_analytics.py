@@ -0,0 +1,71 @@
+import random
+from datetime import timedelta
+from statistics import median
+from time import perf_counter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+from backend.analytics import exercise_progression, load_exercise_history
+from backend.models import Exercise, ExerciseSession, Set, Workout, WorkoutSession
+
+SETS_PER_SESSION = 20
+
+# Measures the latency of the exercise analytics on a synthetic history.
+# The history is created in a transaction that is rolled back afterwards, so the database is left unchanged
+class Command(BaseCommand):
+    help = "Benchmark the exercise analytics on a synthetic set history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sets", type=int, default=100_000, help="Number of sets in the synthetic history")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of measured runs")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, exercise = self.create_history(options["sets"])
+
+            load_times, compute_times = [], []
+            for _ in range(options["repeat"]):
+                started = perf_counter()
+                history = load_exercise_history(user.id, exercise.id)
+                loaded = perf_counter()
+                progression = exercise_progression(history)
+                computed = perf_counter()
+
+                load_times.append(loaded - started)
+                compute_times.append(computed - loaded)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Sets: {progression['set_count']}")
+        self.stdout.write(f"Query: {median(load_times) * 1000:.1f} ms (median of {options['repeat']} runs)")
+        self.stdout.write(f"Computation: {median(compute_times) * 1000:.1f} ms (median of {options['repeat']} runs)")
+        self.stdout.write(self.style.SUCCESS(f"Total: {(median(load_times) + median(compute_times)) * 1000:.1f} ms"))
+
+    # One workout session per day with a single exercise session, going back in time from today
+    def create_history(self, set_count):
+        user = User.objects.create_user(username=f"benchmark-{random.getrandbits(32)}")
+        exercise = Exercise.objects.create(name="Benchmark Squat", description="Synthetic exercise.", muscle_group="Legs", muscle_category="legs")
+        workout = Workout.objects.create(name="Benchmark workout", author=user)
+        workout.exercises.add(exercise)
+
+        session_count = max(1, set_count // SETS_PER_SESSION)
+        workout_sessions = WorkoutSession.objects.bulk_create([WorkoutSession(user=user, workout=workout) for _ in range(session_count)])
+
+        # start_time is set to the current time on insert, so the dates are spread out afterwards
+        today = now()
+        for index, workout_session in enumerate(workout_sessions):
+            workout_session.start_time = today - timedelta(days=session_count - index)
+        WorkoutSession.objects.bulk_update(workout_sessions, ["start_time"], batch_size=1000)
+
+        exercise_sessions = ExerciseSession.objects.bulk_create([
+            ExerciseSession(workout_session=workout_session, exercise=exercise) for workout_session in workout_sessions
+        ])
+        Set.objects.bulk_create(
+            [
+                Set(exercise_session=exercise_sessions[index // SETS_PER_SESSION], repetitions=random.randint(1, 12), weight=random.randint(40, 160))
+                for index in range(session_count * SETS_PER_SESSION)
+            ],
+            batch_size=1000,
+        )
+        return user, exercise
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+from backend.imports import IMPORT_CHUNK_SIZE, guess_import_type, import_training_log
+
+# Imports a training log file for a user, see imports.py for the format.
+# Progress is written after every chunk, and the rows that could not be imported are listed at the end
+class Command(BaseCommand):
+    help = "Import a CSV or NDJSON training log for a user"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User the training log is imported for")
+        parser.add_argument("path", help="Path to the training log")
+        parser.add_argument("--type", choices=["csv", "ndjson"], help="Type of the training log, taken from the file name by default")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Number of workout sessions and sets inserted per transaction")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        import_type = options["type"] or guess_import_type(options["path"])
+
+        def progress(report):
+            self.stdout.write(f"Imported {report['workout_sessions']} workout sessions and {report['sets']} sets, {report['error_count']} errors")
+
+        try:
+            with open(options["path"], encoding="utf-8-sig", errors="replace", newline="") as lines:
+                report = import_training_log(user, lines, import_type, options["chunk_size"], progress)
+        except OSError as error:
+            raise CommandError(f"Could not read {options['path']}: {error}")
+        except serializers.ValidationError as error:
+            raise CommandError(" ".join(str(detail) for detail in error.detail))
+
+        for error in report["errors"]:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['error']}"))
+        if report["error_count"] > len(report["errors"]):
+            self.stdout.write(self.style.WARNING(f"... and {report['error_count'] - len(report['errors'])} more errors"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['workout_sessions']} workout sessions, {report['exercise_sessions']} exercise sessions and {report['sets']} sets"
+        ))
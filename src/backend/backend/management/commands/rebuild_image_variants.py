@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from rest_framework.exceptions import ValidationError
+from backend.images import save_variants
+from backend.signals import IMAGE_FIELDS
+
+# Makes the variants of the images that were stored without them, e.g. before variants were added or by fixtures.
+# The variants are stored under the hash of the image, so running the command again only renders the variants that are missing
+class Command(BaseCommand):
+    help = "Make the thumbnail and WebP variants of the exercise images and profile pictures"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Also rebuild the images that already have variants, e.g. after the variants have changed")
+
+    def handle(self, *args, **options):
+        count = 0
+        missing = 0
+        unreadable = 0
+
+        for model, (field_name, variants_field_name) in IMAGE_FIELDS.items():
+            queryset = model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True}).order_by("id")
+            if not options["all"]:
+                queryset = queryset.filter(**{variants_field_name: {}})
+
+            for instance in queryset.iterator():
+                field_file = getattr(instance, field_name)
+                if not field_file.storage.exists(field_file.name):
+                    missing += 1
+                    continue
+
+                with field_file.open("rb"):
+                    data = field_file.read()
+
+                try:
+                    variants = save_variants(field_file, data)
+                except ValidationError:
+                    unreadable += 1
+                    continue
+
+                # Saved like any other change, so the exercise catalog gets a new version and its cached responses are replaced
+                setattr(instance, variants_field_name, variants)
+                instance.save(update_fields=[variants_field_name])
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Made the variants of {count} images, {missing} images were not found and {unreadable} could not be read"))
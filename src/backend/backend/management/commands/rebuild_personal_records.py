@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from backend.analytics import rebuild_personal_records, record_sets
+from backend.models import PersonalRecord, Set
+
+# Rebuilds the personal records from the existing sets, a chunk of users at a time so memory use stays flat.
+# Without --reset the sets are merged into the records, which never lowers them, e.g. to add sets that were created without signals.
+# With --reset the records of every chunk are recomputed and replaced in one transaction, e.g. after sets were deleted without signals,
+# so the records of the other users are never missing while the command runs, and a failure leaves the chunks that were done
+class Command(BaseCommand):
+    help = "Rebuild the personal records of every user from their sets"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=100, help="Number of users whose records are rebuilt per transaction")
+        parser.add_argument("--reset", action="store_true", help="Replace the records instead of merging the sets into them, so records can be lowered")
+
+    def handle(self, *args, **options):
+        last_id = 0
+        count = 0
+
+        while True:
+            user_ids = list(User.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:options["chunk_size"]])
+            if not user_ids:
+                break
+
+            if options["reset"]:
+                rebuild_personal_records(user_ids)
+            else:
+                with transaction.atomic():
+                    record_sets(
+                        Set.objects.filter(exercise_session__workout_session__user_id__in=user_ids)
+                        .values_list("exercise_session__workout_session__user_id", "exercise_session__exercise_id", "repetitions", "weight")
+                        .iterator()
+                    )
+
+            last_id = user_ids[-1]
+            count += len(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the personal records of {count} users, {PersonalRecord.objects.count()} personal records"))
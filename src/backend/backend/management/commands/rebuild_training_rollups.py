@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils.timezone import localdate
+from backend.analytics import rebuild_rollups
+from backend.models import WorkoutSession
+
+# Rebuilds the training rollups from the existing workout sessions and sets, e.g. after the rollups were introduced
+class Command(BaseCommand):
+    help = "Rebuild the daily and weekly training rollups of every user"
+
+    def handle(self, *args, **options):
+        users = WorkoutSession.objects.values("user_id").annotate(first=Min("start_time"), last=Max("start_time")).order_by("user_id")
+
+        count = 0
+        for user in users:
+            rebuild_rollups(user["user_id"], localdate(user["first"]), localdate(user["last"]))
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the training rollups of {count} users"))
@@ -0,0 +1,124 @@
+import re
+from collections import OrderedDict
+from time import time
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from django.db.models import Exists, OuterRef, Subquery
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import ChatRoom
+from .utils import set_chat_room_participant
+
+MAX_CACHED_CONNECTIONS = 10000
+CHAT_ROOM_PATH = re.compile(r"ws/chat/(?P<room_id>\d+)/$")
+
+
+# Least recently used cache where every entry expires at its own point in time
+class TTLCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires_at):
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+
+        # Evict the least recently used entries
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Connections are cached on (token, room id) until the token expires, so reconnects skip both the token validation and the database
+connection_cache = TTLCache(MAX_CACHED_CONNECTIONS)
+
+
+def get_user_and_chat_room(user_id, room_id):
+    # Fetch the user, the chat room and whether the user is a participant in a single query
+    user = (
+        User.objects.filter(id=user_id)
+        .annotate(
+            chat_room_name=Subquery(ChatRoom.objects.filter(id=room_id).values("name")),
+            is_participant=Exists(ChatRoom.participants.through.objects.filter(chatroom_id=room_id, user_id=OuterRef("id"))),
+        )
+        .first()
+    )
+
+    if user is None:
+        return None, None, False
+
+    # The chat room is built from the annotated name, and is marked as already saved in the database
+    chat_room = None
+    if user.chat_room_name is not None:
+        chat_room = ChatRoom(id=room_id, name=user.chat_room_name)
+        chat_room._state.adding = False
+
+    return user, chat_room, user.is_participant
+
+
+# Authenticates websocket connections using the access token given in the query string
+class JWTAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope["user"] = AnonymousUser()
+        scope["chat_room"] = None
+
+        query_dict = parse_qs(scope["query_string"].decode("utf-8"))
+        token = query_dict.get("token", [None])[0]
+
+        # The middleware wraps the URL router, so the room id has to be read from the path.
+        # Sockets that are not for a chat room, like the notification socket, only authenticate the user
+        match = CHAT_ROOM_PATH.search(scope["path"])
+        room_id = int(match.group("room_id")) if match else None
+
+        if token:
+            connection = connection_cache.get((token, room_id))
+
+            if connection is None:
+                connection = await self.authenticate(token, room_id)
+
+            if connection is not None:
+                scope["user"], scope["chat_room"] = connection
+
+        return await super().__call__(scope, receive, send)
+
+    async def authenticate(self, token, room_id):
+        try:
+            validated_token = AccessToken(token)
+        except TokenError:
+            return None
+
+        if room_id is None:
+            user = await database_sync_to_async(User.objects.filter(id=validated_token["user_id"]).first)()
+            chat_room = None
+        else:
+            user, chat_room, is_participant = await database_sync_to_async(get_user_and_chat_room)(validated_token["user_id"], room_id)
+        if user is None:
+            return None
+
+        # The membership is not cached with the connection, since it changes when participants are added or removed
+        if chat_room is not None:
+            await database_sync_to_async(set_chat_room_participant)(chat_room.id, user.id, is_participant)
+        
+        connection = (user, chat_room)
+        connection_cache.set((token, room_id), connection, validated_token["exp"])
+        return connection
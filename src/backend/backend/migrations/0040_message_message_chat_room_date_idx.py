@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-17 22:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0039_alter_personaltrainerprofile_experience'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'date_sent', 'id'], name='message_chat_room_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-17 22:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0040_message_message_chat_room_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutmessage',
+            index=models.Index(fields=['chat_room', 'date_sent', 'id'], name='workout_msg_chat_room_date_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.1.5 on 2026-10-17 23:05
+
+import heapq
+from django.db import migrations, models
+
+
+# Number the existing messages and workout messages of every chat room in the order they were sent
+def backfill_seq(apps, schema_editor):
+    ChatRoom = apps.get_model('backend', 'ChatRoom')
+    Message = apps.get_model('backend', 'Message')
+    WorkoutMessage = apps.get_model('backend', 'WorkoutMessage')
+
+    for chat_room in ChatRoom.objects.all().iterator():
+        messages = Message.objects.filter(chat_room=chat_room).order_by('date_sent', 'id')
+        workout_messages = WorkoutMessage.objects.filter(chat_room=chat_room).order_by('date_sent', 'id')
+
+        seq = 0
+        updated_messages = []
+        updated_workout_messages = []
+        for _, _, _, item in heapq.merge(
+            ((message.date_sent, 0, message.id, message) for message in messages),
+            ((workout_message.date_sent, 1, workout_message.id, workout_message) for workout_message in workout_messages),
+            key=lambda entry: entry[:3],
+        ):
+            seq += 1
+            item.seq = seq
+            if isinstance(item, Message):
+                updated_messages.append(item)
+            else:
+                updated_workout_messages.append(item)
+
+        Message.objects.bulk_update(updated_messages, ['seq'], batch_size=1000)
+        WorkoutMessage.objects.bulk_update(updated_workout_messages, ['seq'], batch_size=1000)
+        ChatRoom.objects.filter(id=chat_room.id).update(last_seq=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0041_workoutmessage_workout_msg_chat_room_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='workoutmessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='workoutmessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('chat_room', 'seq'), name='message_chat_room_seq_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='workoutmessage',
+            constraint=models.UniqueConstraint(fields=('chat_room', 'seq'), name='workout_msg_chat_room_seq_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-17 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0042_chatroom_last_seq_message_seq_workoutmessage_seq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutsession',
+            index=models.Index(fields=['user', 'start_time'], name='workout_session_user_start_idx'),
+        ),
+    ]
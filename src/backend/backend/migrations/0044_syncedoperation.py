@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-17 23:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0043_workoutsession_workout_session_user_start_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncedOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('object_type', models.CharField(choices=[('workout_session', 'Workout session'), ('exercise_session', 'Exercise session'), ('set', 'Set')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('date_synced', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='synced_operations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='synced_operation_user_key_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-17 23:11
+
+import datetime
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0044_syncedoperation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('muscle_category', models.CharField(choices=[('chest', 'Chest'), ('back', 'Back'), ('legs', 'Legs'), ('arms', 'Arms'), ('shoulders', 'Shoulders'), ('abs', 'Abdominals'), ('all', 'All')], max_length=20)),
+                ('volume', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('set_count', models.PositiveIntegerField(default=0)),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('duration', models.DurationField(default=datetime.timedelta)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='training_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'period_start', 'muscle_category'), name='training_rollup_unique')],
+            },
+        ),
+    ]
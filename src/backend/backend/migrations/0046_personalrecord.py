@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-17 23:23
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0045_trainingrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_weight', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=5)),
+                ('max_weight_repetitions', models.PositiveIntegerField(default=0)),
+                ('max_estimated_one_rep_max', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=7)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='backend.exercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'exercise'), name='personal_record_user_exercise_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-17 23:59
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0046_personalrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringScheduledWorkout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('weekdays', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)])),
+                ('until', models.DateTimeField(blank=True, null=True)),
+                ('pt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='arranged_recurring_workouts_clients', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_scheduled_workouts', to=settings.AUTH_USER_MODEL)),
+                ('workout_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.workout')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurringScheduledWorkoutException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence', models.DateTimeField()),
+                ('cancelled', models.BooleanField(default=False)),
+                ('scheduled_date', models.DateTimeField(blank=True, null=True)),
+                ('recurring_workout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='backend.recurringscheduledworkout')),
+                ('workout_template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='backend.workout')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('recurring_workout', 'occurrence'), name='recurring_workout_exception_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 00:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0047_recurringscheduledworkout'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='personaltrainerscheduledworkout',
+            index=models.Index(fields=['client', 'scheduled_date'], name='pt_scheduled_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='personaltrainerscheduledworkout',
+            index=models.Index(fields=['pt', 'scheduled_date'], name='pt_scheduled_pt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledworkout',
+            index=models.Index(fields=['user', 'scheduled_date'], name='scheduled_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+
+# The search indexes are only used on PostgreSQL, other databases search the catalog with an index in memory (see search.py).
+# The full-text index is on the same expression as search_vector() in search.py, so that it is used by the search
+def search_indexes():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        GinIndex(
+            SearchVector("name", weight="A", config="english")
+            + SearchVector("muscle_group", weight="B", config="english")
+            + SearchVector("description", weight="C", config="english"),
+            name="exercise_search_vector_idx",
+        ),
+        GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="exercise_name_trgm_idx"),
+        GinIndex(fields=["muscle_group"], opclasses=["gin_trgm_ops"], name="exercise_muscle_group_trgm_idx"),
+    ]
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    Exercise = apps.get_model("backend", "Exercise")
+    for index in search_indexes():
+        schema_editor.add_index(Exercise, index)
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Exercise = apps.get_model("backend", "Exercise")
+    for index in search_indexes():
+        schema_editor.remove_index(Exercise, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0049_calendarfeed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, remove_search_indexes),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.5 on 2026-10-18 00:34
+
+from django.db import migrations, models
+
+
+# The exercises that already exist are the first version of the catalog, so an app without a copy of the catalog can ask for the changes since 0
+def create_catalog(apps, schema_editor):
+    ExerciseCatalog = apps.get_model("backend", "ExerciseCatalog")
+    Exercise = apps.get_model("backend", "Exercise")
+
+    ExerciseCatalog.objects.create(id=1, version=1)
+    Exercise.objects.update(version=1)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0050_exercise_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedExercise',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exercise_id', models.PositiveIntegerField()),
+                ('version', models.PositiveBigIntegerField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExerciseCatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(create_catalog, migrations.RunPython.noop),
+    ]
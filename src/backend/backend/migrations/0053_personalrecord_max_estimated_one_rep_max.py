@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 01:40
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0052_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='personalrecord',
+            name='max_estimated_one_rep_max',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=13),
+        ),
+    ]
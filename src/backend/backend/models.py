@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from datetime import timedelta
 from django.core.exceptions import ValidationError
 from django.contrib.auth.validators import UnicodeUsernameValidator
 import re
+import secrets
 
 # Custom validator for names
 def validate_name(name):
@@ -31,6 +33,9 @@ class PersonalTrainerProfile(models.Model):
 
     profile_picture = models.ImageField(upload_to="profile_pictures/", blank=True, null=True)
 
+    # Names of the smaller WebP copies of the profile picture, see images.py
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+
 # Model for normal users
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -45,6 +50,27 @@ class UserProfile(models.Model):
     
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
 
+    # Names of the smaller WebP copies of the profile picture, see images.py
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+# Single row with the version of the exercise catalog, increased by every change to an exercise.
+# Apps keep the version of their copy of the catalog, and ask for the exercises that changed since then
+class ExerciseCatalog(models.Model):
+    version = models.PositiveBigIntegerField(default=0)
+
+    # Allocate the next version of the catalog. Like ChatRoom.next_seq the row stays locked until the surrounding transaction commits,
+    # so changes to the catalog are committed in the same order as their versions
+    @classmethod
+    def next_version(cls):
+        if not cls.objects.filter(id=1).update(version=models.F("version") + 1):
+            cls.objects.get_or_create(id=1)
+            cls.objects.filter(id=1).update(version=models.F("version") + 1)
+        return cls.current_version()
+
+    @classmethod
+    def current_version(cls):
+        return cls.objects.filter(id=1).values_list("version", flat=True).first() or 0
+
 class Exercise(models.Model):
     name = models.CharField(max_length=255, blank=False)
     
@@ -67,8 +93,26 @@ class Exercise(models.Model):
     # Illustration of the exercise
     image = models.ImageField(upload_to='exercise_images/', blank=True, null=True)
 
+    # Names of the smaller WebP copies of the illustration, see images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # The version of the catalog when the exercise was last changed
+    version = models.PositiveBigIntegerField(default=0, editable=False, db_index=True)
+
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.version = ExerciseCatalog.next_version()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+            super().save(*args, **kwargs)
+
+# Exercises that have been deleted from the catalog, so that apps can remove them from their copy
+class DeletedExercise(models.Model):
+    exercise_id = models.PositiveIntegerField()
+    version = models.PositiveBigIntegerField(db_index=True)
      
 
 class Workout(models.Model):
@@ -98,6 +142,10 @@ class WorkoutSession(models.Model):
     calories_burned = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(Decimal("0.00"))])
     duration = models.DurationField(null=True, blank=True)
 
+    class Meta:
+        # Used for listing the workout sessions of a user in a date range
+        indexes = [models.Index(fields=["user", "start_time"], name="workout_session_user_start_idx")]
+
     def save(self, *args, **kwargs):
         if self.duration is not None and self.duration.total_seconds() < 0:
             raise ValidationError("Duration cannot be negative")
@@ -115,6 +163,85 @@ class Set(models.Model):
     weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=False, validators=[MinValueValidator(Decimal("0.00"))])
 
 
+# Training totals of a user per day or week, and per muscle category. Kept up to date by the signals in signals.py, see analytics.py
+class TrainingRollup(models.Model):
+    PERIODS = [
+        ("day", "Day"),
+        ("week", "Week"),
+    ]
+
+    # The rows with this category contain the totals over all muscle categories
+    ALL_MUSCLE_CATEGORIES = "all"
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="training_rollups")
+    period = models.CharField(max_length=10, choices=PERIODS)
+
+    # The day, or the monday of the week
+    period_start = models.DateField()
+    muscle_category = models.CharField(max_length=20, choices=Exercise.MUSCLE_CATEGORIES + [(ALL_MUSCLE_CATEGORIES, "All")])
+
+    # Sum of repetitions times weight of the sets
+    volume = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    set_count = models.PositiveIntegerField(default=0)
+
+    # Number of workout sessions that trained the muscle category
+    session_count = models.PositiveIntegerField(default=0)
+
+    # Duration of the workout sessions, a session can not be split between muscle categories so it is only counted in the rows of all categories
+    duration = models.DurationField(default=timedelta)
+
+    class Meta:
+        # Used for reading the rollups of a user in a date range
+        constraints = [
+            models.UniqueConstraint(fields=["user", "period", "period_start", "muscle_category"], name="training_rollup_unique"),
+        ]
+
+
+# Best lifts of a user for an exercise. Updated in the same transaction as the sets are created, see analytics.py.
+# Records are not lowered when sets are deleted, the rebuild_personal_records command recomputes them
+class PersonalRecord(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="personal_records")
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name="personal_records")
+
+    # Heaviest weight lifted, and the most repetitions done with that weight
+    max_weight = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal("0.00"))
+    max_weight_repetitions = models.PositiveIntegerField(default=0)
+
+    # Highest estimated one repetition max (Epley) of a single set. Repetitions are not limited, so it has room for the estimate
+    # of the heaviest weight with the most repetitions a set can have, 999.99 * (30 + 2147483647) / 30
+    max_estimated_one_rep_max = models.DecimalField(max_digits=13, decimal_places=2, default=Decimal("0.00"))
+
+    # Merged with every new set, and rebuilt for the user and exercise when a set is changed or deleted, see analytics.py.
+    # Sets created and deleted without signals, e.g. with bulk_create or update, are only included by the rebuild_personal_records command
+
+    date_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "exercise"], name="personal_record_user_exercise_unique")]
+
+
+# Operation uploaded by the app when syncing workouts that were logged offline.
+# The key is generated by the client, so an operation that is uploaded again after a failed sync is recognized instead of creating duplicates
+class SyncedOperation(models.Model):
+    OBJECT_TYPES = [
+        ("workout_session", "Workout session"),
+        ("exercise_session", "Exercise session"),
+        ("set", "Set"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="synced_operations")
+    key = models.CharField(max_length=64)
+
+    # The object created by the operation
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPES)
+    object_id = models.PositiveBigIntegerField()
+
+    date_synced = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "key"], name="synced_operation_user_key_unique")]
+
+
 class ChatRoom(models.Model):
     # People currently in the chatroom, many to many field since the chat room can have multiple participants and people can be in multiple chat rooms
     participants = models.ManyToManyField(User)
@@ -122,11 +249,35 @@ class ChatRoom(models.Model):
     
     name = models.CharField(max_length=255, blank=False, null=False, validators=[validate_name])
 
+    # Sequence number of the latest message or workout message sent in the chat room
+    last_seq = models.PositiveBigIntegerField(default=0)
+
+    # Allocate the next sequence number of the chat room. The row stays locked until the surrounding transaction commits,
+    # so messages are committed in the same order as their sequence numbers
+    @classmethod
+    def next_seq(cls, chat_room_id):
+        cls.objects.filter(id=chat_room_id).update(last_seq=models.F("last_seq") + 1)
+        return cls.objects.filter(id=chat_room_id).values_list("last_seq", flat=True).first()
+
 class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_messages", blank=False, null=False)
     content = models.TextField(blank=False, null=False)
     date_sent = models.DateTimeField(auto_now_add=True)
     chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="messages", blank=False, null=False)
+
+    # Shared sequence of messages and workout messages in the chat room, used for replaying missed messages on reconnect
+    seq = models.PositiveBigIntegerField(editable=False)
+
+    class Meta:
+        # Used for paginating the history of a chat room
+        indexes = [models.Index(fields=["chat_room", "date_sent", "id"], name="message_chat_room_date_idx")]
+        constraints = [models.UniqueConstraint(fields=["chat_room", "seq"], name="message_chat_room_seq_unique")]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.seq is None:
+                self.seq = ChatRoom.next_seq(self.chat_room_id)
+            super().save(*args, **kwargs)
     
 class WorkoutMessage(models.Model):
     workout = models.ForeignKey(Workout, on_delete=models.CASCADE, blank=False, null=False)
@@ -134,10 +285,28 @@ class WorkoutMessage(models.Model):
     chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="workout_messages", blank=False, null=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="workout_messages", blank=False, null=False)
 
+    # Shares the sequence of the chat room with Message
+    seq = models.PositiveBigIntegerField(editable=False)
+
+    class Meta:
+        # Used for paginating the timeline of a chat room
+        indexes = [models.Index(fields=["chat_room", "date_sent", "id"], name="workout_msg_chat_room_date_idx")]
+        constraints = [models.UniqueConstraint(fields=["chat_room", "seq"], name="workout_msg_chat_room_seq_unique")]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.seq is None:
+                self.seq = ChatRoom.next_seq(self.chat_room_id)
+            super().save(*args, **kwargs)
+
 class ScheduledWorkout(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="scheduled_workouts", blank=False, null=False)
     workout_template = models.ForeignKey(Workout, on_delete=models.CASCADE, blank=False, null=False)
     scheduled_date = models.DateTimeField(blank=False, null=False)
+
+    class Meta:
+        # Used for listing the scheduled workouts of a user in a date range
+        indexes = [models.Index(fields=["user", "scheduled_date"], name="scheduled_user_date_idx")]
      
     def __str__(self):
          return f"{self.workout_template.name} scheduled on {self.scheduled_date}"
@@ -149,11 +318,78 @@ class PersonalTrainerScheduledWorkout(models.Model):
     
     workout_template = models.ForeignKey(Workout, on_delete=models.CASCADE, blank=False, null=False)
     scheduled_date = models.DateTimeField(blank=False, null=False)
+
+    class Meta:
+        # Used for listing the workouts of a client or of a personal trainer in a date range
+        indexes = [
+            models.Index(fields=["client", "scheduled_date"], name="pt_scheduled_client_date_idx"),
+            models.Index(fields=["pt", "scheduled_date"], name="pt_scheduled_pt_date_idx"),
+        ]
      
     def __str__(self):
          return f"{self.workout_template.name} scheduled on {self.scheduled_date}"
     
 
+# Workout that is repeated every day or on some days of the week, stored once instead of as one scheduled workout per occurrence.
+# The occurrences are expanded when the scheduled workouts in a date range are listed, see recurrence.py.
+# Scheduled by the user themselves when pt is empty, and by their personal trainer otherwise
+class RecurringScheduledWorkout(models.Model):
+    FREQUENCIES = [
+        ("daily", "Daily"),
+        ("weekly", "Weekly"),
+    ]
+
+    WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recurring_scheduled_workouts")
+    pt = models.ForeignKey(User, on_delete=models.CASCADE, related_name="arranged_recurring_workouts_clients", null=True, blank=True)
+    workout_template = models.ForeignKey(Workout, on_delete=models.CASCADE)
+
+    # The first occurrence, every occurrence is at the same time of day
+    start = models.DateTimeField()
+
+    # Repeated every interval days or weeks
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES)
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+
+    # Days of the week of a weekly workout, e.g. "MO,WE,FR". The day of the first occurrence when empty
+    weekdays = models.CharField(max_length=20, blank=True, default="")
+
+    # The workout ends after count occurrences or at until, and is repeated forever when both are empty
+    count = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
+    until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.workout_template.name} every {self.interval} {self.frequency} from {self.start}"
+
+# An occurrence of a recurring workout that is cancelled, moved or done with another workout.
+# Only the occurrences that differ from the rule are stored
+class RecurringScheduledWorkoutException(models.Model):
+    recurring_workout = models.ForeignKey(RecurringScheduledWorkout, on_delete=models.CASCADE, related_name="exceptions")
+
+    # The date of the occurrence as given by the rule
+    occurrence = models.DateTimeField()
+
+    cancelled = models.BooleanField(default=False)
+
+    # The new date and workout of the occurrence, empty when they are not changed
+    scheduled_date = models.DateTimeField(null=True, blank=True)
+    workout_template = models.ForeignKey(Workout, on_delete=models.CASCADE, null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["recurring_workout", "occurrence"], name="recurring_workout_exception_unique")]
+
+def generate_calendar_token():
+    return secrets.token_urlsafe(32)
+
+# Secret address of the calendar feed of a user. Calendar apps cannot send a JWT, so the token in the address is the authentication.
+# Resetting the feed generates a new token, which stops the old address from working
+class CalendarFeed(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="calendar_feed")
+    token = models.CharField(max_length=64, unique=True, default=generate_calendar_token)
+    created = models.DateTimeField(auto_now_add=True)
+
+
 class Notification(models.Model):
     # The user receiving the notification
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications", blank=False, null=False)
@@ -188,9 +424,34 @@ class Notification(models.Model):
         # Check that the sender and the user are participants in the chat room
         if not chat_room.participants.filter(id=self.user.id).exists():
             raise ValidationError(f"User is not part of the chat room")
-        
+
         super().save(*args, **kwargs)
 
+    # Create one notification for every participant in the chat room except the sender.
+    # bulk_create skips save(), so the membership check is done once here for the whole message instead of once per recipient
+    @classmethod
+    def create_for_chat_room(cls, chat_room, sender, message=None, workout=None):
+        participant_ids = set(chat_room.participants.values_list("id", flat=True))
+
+        if sender.id not in participant_ids:
+            raise ValidationError("Sender is not part of the chat room")
+
+        notifications = [
+            cls(
+                user_id=user_id,
+                sender=sender.username,
+                message=message,
+                workout_message=workout,
+                chat_room_id=chat_room.id,
+                chat_room_name=chat_room.name,
+            )
+            for user_id in participant_ids if user_id != sender.id
+        ]
+
+        # Returns a mapping from recipient to notification id, so that each client can be sent its own notification id
+        created = cls.objects.bulk_create(notifications)
+        return {notification.user_id: notification.id for notification in created}
+
 class FailedLoginAttempt(models.Model):
     username = models.CharField(max_length=255, blank=False, null=False, validators=[UnicodeUsernameValidator()])
     ip_address = models.GenericIPAddressField(blank=False, null=False)
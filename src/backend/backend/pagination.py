@@ -0,0 +1,188 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+from django.db.models import Q
+from django.utils.timezone import is_naive, make_aware
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+# Cursors are opaque to the client, they encode the date_sent of an item followed by the keys that break ties, e.g. (date_sent, id)
+def encode_cursor(date_sent, *keys):
+    payload = json.dumps([date_sent.isoformat(), *keys])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor, length):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        # The last key is always the id of the item
+        if not isinstance(values, list) or len(values) != length or not isinstance(values[-1], int):
+            raise ValueError
+        # Cursors are made with aware datetimes, a naive one is in the current time zone like the other date parameters
+        date_sent = datetime.fromisoformat(values[0])
+        return (make_aware(date_sent) if is_naive(date_sent) else date_sent, *values[1:])
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid cursor")
+
+def get_limit(limit, default_limit, max_limit):
+    if limit is None:
+        return default_limit
+
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValidationError("Limit must be an integer")
+
+    if limit < 1:
+        raise ValidationError("Limit must be positive")
+    return min(limit, max_limit)
+
+
+# Keyset pagination ordered by (date_sent, id), so every page costs one indexed query no matter how long the history is.
+#   ?before=<cursor> returns the messages sent before the cursor, used for lazily loading older history
+#   ?after=<cursor> returns the messages sent after the cursor, used for catching up after a reconnect
+#   Without a cursor the latest messages are returned. Pages are always in chronological order.
+# Requests without any of the query parameters are not paginated, so existing clients keep receiving the full list
+class MessageCursorPagination(BasePagination):
+    default_limit = 50
+    max_limit = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if not any(param in params for param in ("before", "after", "limit")):
+            return None
+
+        self.limit = get_limit(params.get("limit"), self.default_limit, self.max_limit)
+        before = params.get("before")
+        after = params.get("after")
+
+        if before and after:
+            raise ValidationError("Cannot use both the before and after cursor")
+
+        if after:
+            date_sent, id = decode_cursor(after, 2)
+            queryset = queryset.filter(Q(date_sent__gt=date_sent) | Q(date_sent=date_sent, id__gt=id)).order_by("date_sent", "id")
+
+            # Fetch one extra message to know if there are more messages after this page
+            page = list(queryset[:self.limit + 1])
+            self.has_after = len(page) > self.limit
+            page = page[:self.limit]
+            self.has_before = True
+        else:
+            if before:
+                date_sent, id = decode_cursor(before, 2)
+                queryset = queryset.filter(Q(date_sent__lt=date_sent) | Q(date_sent=date_sent, id__lt=id))
+
+            page = list(queryset.order_by("-date_sent", "-id")[:self.limit + 1])
+            self.has_before = len(page) > self.limit
+            page = page[:self.limit][::-1]
+            self.has_after = bool(before)
+
+        self.page = page
+        self.request_cursor = after
+        return page
+
+    def get_paginated_response(self, data):
+        first = self.page[0] if self.page else None
+        last = self.page[-1] if self.page else None
+
+        return Response({
+            # Cursor for loading older messages, None if there are no older messages
+            "before": encode_cursor(first.date_sent, first.id) if first and self.has_before else None,
+            # Cursor for catching up on newer messages, stays the same when nothing new has been sent
+            "after": encode_cursor(last.date_sent, last.id) if last else self.request_cursor,
+            "has_more_after": self.has_after,
+            "results": data,
+        })
+
+
+# Keyset pagination over several tables at once, e.g. the messages and workout messages of a chat room.
+# Each table is read with the same cursor, and the pages are merged in (date_sent, kind, id) order, so a page costs one query per table.
+# Supports the same before, after and limit query parameters as MessageCursorPagination, but always paginates
+class TimelineCursorPagination(MessageCursorPagination):
+
+    # querysets is a dictionary from the kind of item to the queryset of that kind
+    def paginate_querysets(self, querysets, request):
+        params = request.query_params
+        self.limit = get_limit(params.get("limit"), self.default_limit, self.max_limit)
+        before = params.get("before")
+        after = params.get("after")
+
+        if before and after:
+            raise ValidationError("Cannot use both the before and after cursor")
+
+        if after:
+            date_sent, kind, id = self.decode_timeline_cursor(after, querysets)
+            pages = [
+                self.read_page(kind_of_queryset, queryset.filter(self.after_filter(kind_of_queryset, date_sent, kind, id)), ("date_sent", "id"))
+                for kind_of_queryset, queryset in querysets.items()
+            ]
+
+            # Fetch one extra item from each table to know if there are more items after this page
+            items = list(heapq.merge(*pages, key=lambda item: item[:3]))
+            self.has_after = len(items) > self.limit
+            items = items[:self.limit]
+            self.has_before = True
+        else:
+            if before:
+                date_sent, kind, id = self.decode_timeline_cursor(before, querysets)
+
+            pages = []
+            for kind_of_queryset, queryset in querysets.items():
+                if before:
+                    queryset = queryset.filter(self.before_filter(kind_of_queryset, date_sent, kind, id))
+                pages.append(self.read_page(kind_of_queryset, queryset, ("-date_sent", "-id")))
+
+            items = list(heapq.merge(*pages, key=lambda item: item[:3], reverse=True))
+            self.has_before = len(items) > self.limit
+            items = items[:self.limit][::-1]
+            self.has_after = bool(before)
+
+        self.page = items
+        self.request_cursor = after
+        return [(kind, item) for date_sent, kind, id, item in items]
+
+    # The kind in the cursor is compared with the kinds of the querysets, so it has to be one of them
+    def decode_timeline_cursor(self, cursor, querysets):
+        date_sent, kind, id = decode_cursor(cursor, 3)
+        if not isinstance(kind, str) or kind not in querysets:
+            raise ValidationError("Invalid cursor")
+        return date_sent, kind, id
+
+    def read_page(self, kind, queryset, ordering):
+        return [(item.date_sent, kind, item.id, item) for item in queryset.order_by(*ordering)[:self.limit + 1]]
+
+    # Items of this kind that come after the cursor, ties on date_sent are broken by the kind and then the id
+    def after_filter(self, kind, date_sent, cursor_kind, id):
+        query = Q(date_sent__gt=date_sent)
+        if kind > cursor_kind:
+            query |= Q(date_sent=date_sent)
+        elif kind == cursor_kind:
+            query |= Q(date_sent=date_sent, id__gt=id)
+        return query
+
+    def before_filter(self, kind, date_sent, cursor_kind, id):
+        query = Q(date_sent__lt=date_sent)
+        if kind < cursor_kind:
+            query |= Q(date_sent=date_sent)
+        elif kind == cursor_kind:
+            query |= Q(date_sent=date_sent, id__lt=id)
+        return query
+
+    def get_paginated_response(self, data):
+        first = self.page[0] if self.page else None
+        last = self.page[-1] if self.page else None
+
+        return Response({
+            "before": encode_cursor(*first[:3]) if first and self.has_before else None,
+            "after": encode_cursor(*last[:3]) if last else self.request_cursor,
+            "has_more_after": self.has_after,
+            "results": data,
+        })
+
+
+# Only paginates when ?limit= is given, so existing clients keep receiving the full list
+class WorkoutSessionPagination(LimitOffsetPagination):
+    default_limit = None
+    max_limit = 200
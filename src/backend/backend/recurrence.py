@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from django.db.models import Q
+from django.utils.timezone import localdate, localtime, make_aware
+from rest_framework import serializers
+from .analytics import week_start
+from .models import RecurringScheduledWorkout
+
+# Longest date range that recurring workouts are expanded for in one request
+MAX_RECURRENCE_WINDOW = timedelta(days=366)
+
+# How far an exception can move an occurrence from its date in the rule
+MAX_EXCEPTION_SHIFT = timedelta(days=30)
+
+# Range used when a list of scheduled workouts is requested without ?start= and ?end=, from today
+DEFAULT_RECURRENCE_WINDOW = timedelta(weeks=12)
+
+
+# The days in a period of the rule, as offsets from the start of the period. A period is interval days or interval weeks long
+def period_offsets(rule):
+    if rule.frequency == "daily":
+        return [0]
+
+    weekdays = [RecurringScheduledWorkout.WEEKDAYS.index(weekday) for weekday in rule.weekdays.split(",") if weekday]
+    return sorted(set(weekdays)) or [localtime(rule.start).weekday()]
+
+# Dates of the occurrences of a rule in [start, end), without the exceptions.
+# The expansion starts at the period that contains start, so the cost depends on the size of the range and not on how long ago the rule started
+def occurrences(rule, start, end):
+    first = localtime(rule.start)
+    offsets = period_offsets(rule)
+
+    if rule.frequency == "daily":
+        origin = first.date()
+        period_days = rule.interval
+    else:
+        origin = week_start(first.date())
+        period_days = 7 * rule.interval
+
+    def occurrence(period, offset):
+        return make_aware(datetime.combine(origin + timedelta(days=period * period_days + offset), first.time()))
+
+    period = max(0, (localdate(start) - origin).days // period_days)
+
+    # The number of occurrences before the period, needed when the rule ends after a number of occurrences.
+    # Every period has the same occurrences, except the first that can start after some of them
+    index = 0
+    if period > 0:
+        index = sum(1 for offset in offsets if occurrence(0, offset) >= rule.start) + (period - 1) * len(offsets)
+
+    while True:
+        for offset in offsets:
+            date = occurrence(period, offset)
+            if date < rule.start:
+                continue
+            if date >= end or (rule.count is not None and index >= rule.count) or (rule.until is not None and date > rule.until):
+                return
+
+            index += 1
+            if date >= start:
+                yield date
+
+        period += 1
+
+# Whether the date is an occurrence of the rule, used to check the occurrence of a new exception
+def is_occurrence(rule, date):
+    return date in occurrences(rule, date, date + timedelta(microseconds=1))
+
+# The rules of a queryset that can have occurrences in [start, end), with the exceptions and workouts loaded in three queries.
+# Rules that start or end just outside the range are included, since their occurrences can be moved into it
+def rules_in_range(queryset, start, end):
+    return (
+        queryset.filter(start__lt=end + MAX_EXCEPTION_SHIFT)
+        .filter(Q(until__isnull=True) | Q(until__gte=start - MAX_EXCEPTION_SHIFT))
+        .select_related("workout_template")
+        .prefetch_related("exceptions__workout_template")
+    )
+
+# The occurrences of the rules in [start, end) with the exceptions applied, as (rule, occurrence, scheduled date, workout).
+# Occurrences that are moved into the range are included, and those that are cancelled or moved out of it are not
+def expand(rules, start, end):
+    expanded = []
+
+    for rule in rules:
+        exceptions = {exception.occurrence: exception for exception in rule.exceptions.all()}
+
+        for date in occurrences(rule, start, end):
+            if date not in exceptions:
+                expanded.append((rule, date, date, rule.workout_template))
+
+        for exception in exceptions.values():
+            if exception.cancelled:
+                continue
+
+            scheduled_date = exception.scheduled_date or exception.occurrence
+            if start <= scheduled_date < end and is_occurrence(rule, exception.occurrence):
+                expanded.append((rule, exception.occurrence, scheduled_date, exception.workout_template or rule.workout_template))
+
+    return sorted(expanded, key=lambda occurrence: (occurrence[2], occurrence[0].id))
+
+# The range that the recurring workouts of a list of scheduled workouts are expanded in, from the range of parse_date_range.
+# The saved scheduled workouts are filtered on that range itself, which can be open ended, so the missing start is today,
+# or DEFAULT_RECURRENCE_WINDOW before the end when the end is in the past, and the missing end is DEFAULT_RECURRENCE_WINDOW after the start.
+# At most MAX_RECURRENCE_WINDOW from the start is expanded, the occurrences after that are not listed
+def recurrence_window(start, end):
+    if start is None:
+        start = make_aware(datetime.combine(localdate(), datetime.min.time()))
+        if end is not None and end <= start:
+            start = end - DEFAULT_RECURRENCE_WINDOW
+    if end is None:
+        end = start + DEFAULT_RECURRENCE_WINDOW
+
+    return start, min(end, start + MAX_RECURRENCE_WINDOW)
+
+# Checks a range that everything is read in, like the calendar feed, which has to be bounded
+def validate_window(start, end):
+    if end <= start:
+        raise serializers.ValidationError("End must be after start")
+    if end - start > MAX_RECURRENCE_WINDOW:
+        raise serializers.ValidationError(f"The range can be at most {MAX_RECURRENCE_WINDOW.days} days")
@@ -2,5 +2,6 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
-    re_path(r'ws/chat/(?P<room_id>\d+)/$', consumers.Chatconsumer.as_asgi())
+    re_path(r'ws/chat/(?P<room_id>\d+)/$', consumers.Chatconsumer.as_asgi()),
+    re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,205 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Exercise
+from .utils import get_exercise_catalog_version
+
+# Matches in the name count more than matches in the muscle group, which count more than matches in the description
+FIELD_WEIGHTS = {"name": 3, "muscle_group": 2, "description": 1}
+
+# A word in the search matches a word in the catalog exactly, as the start of the word, or with typos
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+
+MAX_SEARCH_RESULTS = 50
+DEFAULT_SEARCH_RESULTS = 20
+
+# Words in the search that are shorter than this are only matched exactly or as a prefix, since any short word is close to many others
+MIN_FUZZY_LENGTH = 4
+
+# Minimum trigram word similarity between the search and a word of the name or muscle group on PostgreSQL
+TRIGRAM_THRESHOLD = 0.3
+
+
+def tokenize(text):
+    return re.findall(r"\w+", text.casefold())
+
+# The number of typos allowed in a word of the search, one for normal words and two for long words
+def allowed_typos(word):
+    if len(word) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+# Trigrams of a word padded like in pg_trgm, so that the start and end of the word have trigrams of their own
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+# Number of insertions, deletions, substitutions and swaps of neighbouring characters between two words.
+# Stops early and returns limit + 1 once the distance is known to be more than limit
+def edit_distance(first, second, limit):
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+
+    two_rows_back = None
+    previous_row = list(range(len(second) + 1))
+
+    for i in range(1, len(first) + 1):
+        row = [i] + [0] * len(second)
+
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                row[j] = min(row[j], two_rows_back[j - 2] + 1)
+
+        if min(row) > limit:
+            return limit + 1
+        two_rows_back, previous_row = previous_row, row
+
+    return previous_row[-1]
+
+
+# Inverted index of the exercise catalog, from every word in the name, muscle group and description to the exercises it is in.
+# The words are also kept sorted for prefix matches, and indexed on their trigrams to find the candidates for typo matches
+class ExerciseSearchIndex:
+    def __init__(self, exercises):
+        postings = defaultdict(dict)
+        self.categories = {}
+        self.names = {}
+
+        for exercise_id, name, muscle_group, description, muscle_category in exercises:
+            self.categories[exercise_id] = muscle_category
+            self.names[exercise_id] = name.casefold()
+
+            for field, text in (("name", name), ("muscle_group", muscle_group), ("description", description)):
+                for word in tokenize(text):
+                    postings[word][exercise_id] = max(postings[word].get(exercise_id, 0), FIELD_WEIGHTS[field])
+
+        self.postings = dict(postings)
+        self.words = sorted(self.postings)
+
+        self.trigrams = defaultdict(set)
+        for word in self.words:
+            for trigram in trigrams(word):
+                self.trigrams[trigram].add(word)
+
+    # The words of the catalog that a word of the search matches, with how good the match is
+    def matching_words(self, word):
+        matches = {}
+        if word in self.postings:
+            matches[word] = EXACT_MATCH
+
+        for index in range(bisect_left(self.words, word), len(self.words)):
+            if not self.words[index].startswith(word):
+                break
+            matches.setdefault(self.words[index], PREFIX_MATCH)
+
+        typos = allowed_typos(word)
+        if typos:
+            candidates = {candidate for trigram in trigrams(word) for candidate in self.trigrams.get(trigram, ())}
+            for candidate in candidates:
+                if candidate not in matches and edit_distance(word, candidate, typos) <= typos:
+                    matches[candidate] = FUZZY_MATCH
+
+        return matches
+
+    # Ids of the exercises that match every word of the search, best matches first.
+    # The score of an exercise is the sum of its best match for every word, weighted by the field the match is in
+    def search(self, text, muscle_category=None, limit=DEFAULT_SEARCH_RESULTS):
+        scores = None
+
+        for word in dict.fromkeys(tokenize(text)):
+            word_scores = {}
+            for match, quality in self.matching_words(word).items():
+                for exercise_id, weight in self.postings[match].items():
+                    word_scores[exercise_id] = max(word_scores.get(exercise_id, 0), quality * weight)
+
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {exercise_id: score + word_scores[exercise_id] for exercise_id, score in scores.items() if exercise_id in word_scores}
+
+            if not scores:
+                return []
+
+        if scores is None:
+            return []
+
+        if muscle_category is not None:
+            scores = {exercise_id: score for exercise_id, score in scores.items() if self.categories[exercise_id] == muscle_category}
+
+        return sorted(scores, key=lambda exercise_id: (-scores[exercise_id], self.names[exercise_id], exercise_id))[:limit]
+
+
+# The index is kept in memory by every process, and rebuilt when the version of the catalog has changed since it was built.
+# The version is kept in the cache and refreshed after every change to an exercise (see signals.py), so all processes see the change
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+def get_search_index():
+    global _index, _index_version
+
+    version = get_exercise_catalog_version()
+    if _index_version != version:
+        with _index_lock:
+            if _index_version != version:
+                _index = ExerciseSearchIndex(
+                    Exercise.objects.values_list("id", "name", "muscle_group", "description", "muscle_category").iterator()
+                )
+                _index_version = version
+
+    return _index
+
+# The weighted full-text vector of the catalog on PostgreSQL. The GIN index created in migration 0050 is on the same expression
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector("name", weight="A", config="english")
+        + SearchVector("muscle_group", weight="B", config="english")
+        + SearchVector("description", weight="C", config="english")
+    )
+
+# On PostgreSQL the words are matched as prefixes with full-text search, and typos in the name and muscle group are matched on trigrams.
+# Both use the GIN indexes of migration 0050, so the catalog is not held in memory
+def search_exercises_postgresql(text, muscle_category=None, limit=DEFAULT_SEARCH_RESULTS):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+    from django.db.models.functions import Greatest
+
+    words = tokenize(text)
+    if not words:
+        return []
+
+    # The words only contain letters, digits and underscores, so they can be used in a raw query
+    query = SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw", config="english")
+    similarity = Greatest(TrigramWordSimilarity(text, "name"), TrigramWordSimilarity(text, "muscle_group"))
+
+    queryset = Exercise.objects.annotate(search=search_vector(), rank=SearchRank(search_vector(), query), similarity=similarity).filter(
+        Q(search=query) | Q(name__trigram_word_similar=text) | Q(muscle_group__trigram_word_similar=text)
+    )
+    if muscle_category is not None:
+        queryset = queryset.filter(muscle_category=muscle_category)
+
+    # The trigram operators use a threshold of the session instead of a parameter, the default only allows small typos in long words.
+    # It is only set for the transaction of the search, so other queries on the connection, which is reused between requests, keep the default
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(TRIGRAM_THRESHOLD)])
+
+        return list(queryset.order_by("-rank", "-similarity", "name", "id")[:limit])
+
+# The exercises that match the search, best matches first
+def search_exercises(text, muscle_category=None, limit=DEFAULT_SEARCH_RESULTS):
+    if connection.vendor == "postgresql":
+        return search_exercises_postgresql(text, muscle_category, limit)
+
+    exercise_ids = get_search_index().search(text, muscle_category, limit)
+    exercises = Exercise.objects.in_bulk(exercise_ids)
+    return [exercises[exercise_id] for exercise_id in exercise_ids if exercise_id in exercises]
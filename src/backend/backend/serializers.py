@@ -7,6 +7,9 @@ from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed, ValidationError as DRFValidationError
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.urls import reverse
 
 from .models import (
     UserProfile,
@@ -23,8 +26,17 @@ from .models import (
     PersonalTrainerScheduledWorkout,
     Notification,
     FailedLoginAttempt,
+    SyncedOperation,
+    TrainingRollup,
+    PersonalRecord,
+    RecurringScheduledWorkout,
+    RecurringScheduledWorkoutException,
+    CalendarFeed,
 )
-from .utils import is_locked_out, get_client_ip_address
+from .utils import is_locked_out, get_client_ip_address, bump_schedule_versions
+from .recurrence import MAX_EXCEPTION_SHIFT, is_occurrence
+from .analytics import add_sets, add_workout_sessions, update_personal_records
+from .adherence import invalidate_adherence
 
 
 
@@ -38,10 +50,23 @@ class DefaultUserSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
+# The URLs of the variants of an image, absolute like the URL of the image itself, e.g. {"thumbnail": "http://.../thumbnail.webp"}.
+# Lists should show the thumbnail, and fall back to the image when it has no variants yet
+class ImageVariantsField(serializers.ReadOnlyField):
+    def to_representation(self, value):
+        request = self.context.get("request")
+        urls = {variant: default_storage.url(name) for variant, name in value.items()}
+        if request is not None:
+            urls = {variant: request.build_absolute_uri(url) for variant, url in urls.items()}
+        return urls
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField()
+
     class Meta:
         model = UserProfile
-        fields = ["id", "height", "weight", "personal_trainer", "pt_chatroom", "profile_picture"]
+        fields = ["id", "height", "weight", "personal_trainer", "pt_chatroom", "profile_picture", "profile_picture_variants"]
 
 # Nested serializer to connect with the User profile model
 class UserSerializer(serializers.ModelSerializer):
@@ -104,9 +129,11 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class PersonalTrainerProfileSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField()
+
     class Meta:
         model = PersonalTrainerProfile
-        fields = ["id", "experience", "pt_type", "profile_picture"] 
+        fields = ["id", "experience", "pt_type", "profile_picture", "profile_picture_variants"] 
 
 
 class PersonalTrainerSerializer(serializers.ModelSerializer):
@@ -149,9 +176,19 @@ class PersonalTrainerSerializer(serializers.ModelSerializer):
 
 
 class ExerciseSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = Exercise
+        fields = ["id", "name", "description", "muscle_category", "muscle_group", "image", "image_variants"]
+
+# Search results leave out the description, which is the largest part of an exercise
+class ExerciseSearchResultSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Exercise
-        fields = ["id", "name", "description", "muscle_category", "muscle_group", "image"]
+        fields = ["id", "name", "muscle_category", "muscle_group", "image", "image_variants"]
 
 
 class SetSerializer(serializers.ModelSerializer):
@@ -177,6 +214,12 @@ class WorkoutSerializer(serializers.ModelSerializer):
         # Should not be able to set the author manually
         extra_kwargs = {"author": {"read_only": True}}
 
+    # Prefetch the owners and exercises of the workouts in a queryset, so they are read from the prefetch cache instead of two queries per workout.
+    # The prefix is the path to the workout when the queryset is of another model, e.g. "workout__"
+    @staticmethod
+    def prefetch_related(queryset, prefix=""):
+        return queryset.prefetch_related(f"{prefix}owners", f"{prefix}exercises")
+
 
 class WorkoutSessionSerializer(serializers.ModelSerializer):
     # Include related exercise sessions
@@ -195,32 +238,513 @@ class WorkoutSessionSerializer(serializers.ModelSerializer):
         ]
         extra_kwargs = {"user": {"read_only": True}}
 
+    # Load the exercise sessions and sets of all the workout sessions in a queryset with one query each, so the whole tree costs three queries
+    @staticmethod
+    def prefetch_related(queryset):
+        return queryset.prefetch_related("exercise_sessions__sets")
+
+
+class TrainingRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TrainingRollup
+        fields = ["period", "period_start", "muscle_category", "volume", "set_count", "session_count", "duration"]
+
+
+class PersonalRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PersonalRecord
+        fields = ["exercise", "max_weight", "max_weight_repetitions", "max_estimated_one_rep_max", "date_updated"]
+
+
+# Serializers for logging a whole workout session in one request, see WorkoutSessionLogSerializer
+class LoggedSetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Set
+        fields = ["repetitions", "weight"]
+
+
+class LoggedExerciseSessionSerializer(serializers.Serializer):
+    # A plain id, the exercises are validated against the workout all at once instead of one query per exercise
+    exercise = serializers.IntegerField()
+    sets = LoggedSetSerializer(many=True, required=False, default=list)
+
+
+class WorkoutSessionLogSerializer(serializers.ModelSerializer):
+    exercise_sessions = LoggedExerciseSessionSerializer(many=True, required=False, default=list)
+
+    class Meta:
+        model = WorkoutSession
+        fields = ["workout", "calories_burned", "duration", "exercise_sessions"]
+
+    def validate_duration(self, duration):
+        if duration is not None and duration.total_seconds() < 0:
+            raise serializers.ValidationError("Duration cannot be negative")
+        return duration
+
+    def validate(self, data):
+        exercise_ids = {exercise_session["exercise"] for exercise_session in data["exercise_sessions"]}
+
+        # One query for checking that every exercise is a part of the workout
+        workout_exercise_ids = set(data["workout"].exercises.filter(id__in=exercise_ids).values_list("id", flat=True))
+        missing_ids = exercise_ids - workout_exercise_ids
+
+        if missing_ids:
+            raise serializers.ValidationError({"exercise_sessions": f"Exercises {sorted(missing_ids)} are not a part of the workout"})
+        return data
+
+    # The workout session, the exercise sessions and the sets are inserted with one query each, and nothing is saved if any of them fails
+    def create(self, validated_data):
+        exercise_sessions_data = validated_data.pop("exercise_sessions")
+
+        with transaction.atomic():
+            workout_session = WorkoutSession.objects.create(**validated_data)
+
+            exercise_sessions = ExerciseSession.objects.bulk_create([
+                ExerciseSession(workout_session=workout_session, exercise_id=exercise_session["exercise"])
+                for exercise_session in exercise_sessions_data
+            ])
+
+            sets = Set.objects.bulk_create([
+                Set(exercise_session=exercise_session, **set_data)
+                for exercise_session, exercise_session_data in zip(exercise_sessions, exercise_sessions_data)
+                for set_data in exercise_session_data["sets"]
+            ])
+
+            # bulk_create does not send post_save, so the sets are added to the training rollups and personal records here
+            add_sets(sets)
+            update_personal_records(sets)
+
+        return workout_session
+
+    # Respond with the created session tree in the same format as the workout session list
+    def to_representation(self, instance):
+        workout_session = WorkoutSessionSerializer.prefetch_related(WorkoutSession.objects.filter(id=instance.id)).get()
+        return WorkoutSessionSerializer(workout_session).data
+
+
+# Serializers for syncing workouts that were logged offline, see WorkoutSessionSyncSerializer.
+# An object is referenced either by its id on the server, or by the key of the operation in the same or an earlier sync that created it
+def validate_reference(data, field):
+    if (field in data) == (f"{field}_key" in data):
+        raise serializers.ValidationError(f"Either {field} or {field}_key is required")
+    return data
+
+
+class SyncedWorkoutSessionSerializer(serializers.ModelSerializer):
+    workout = serializers.IntegerField()
+
+    class Meta:
+        model = WorkoutSession
+        fields = ["workout", "calories_burned", "duration"]
+
+    def validate_duration(self, duration):
+        if duration is not None and duration.total_seconds() < 0:
+            raise serializers.ValidationError("Duration cannot be negative")
+        return duration
+
+
+class SyncedExerciseSessionSerializer(serializers.Serializer):
+    exercise = serializers.IntegerField()
+    workout_session = serializers.IntegerField(required=False)
+    workout_session_key = serializers.CharField(max_length=64, required=False)
+
+    def validate(self, data):
+        return validate_reference(data, "workout_session")
+
+
+class SyncedSetSerializer(serializers.ModelSerializer):
+    exercise_session = serializers.IntegerField(required=False)
+    exercise_session_key = serializers.CharField(max_length=64, required=False)
+
+    class Meta:
+        model = Set
+        fields = ["exercise_session", "exercise_session_key", "repetitions", "weight"]
+
+    def validate(self, data):
+        return validate_reference(data, "exercise_session")
+
+
+class SyncOperationSerializer(serializers.Serializer):
+    DATA_SERIALIZERS = {
+        "workout_session": SyncedWorkoutSessionSerializer,
+        "exercise_session": SyncedExerciseSessionSerializer,
+        "set": SyncedSetSerializer,
+    }
+
+    # Generated by the client, and unique for every operation of the user
+    key = serializers.CharField(max_length=64)
+    type = serializers.ChoiceField(choices=SyncedOperation.OBJECT_TYPES)
+    data = serializers.DictField()
+
+    def validate(self, operation):
+        serializer = self.DATA_SERIALIZERS[operation["type"]](data=operation["data"])
+        if not serializer.is_valid():
+            raise serializers.ValidationError({"data": serializer.errors})
+
+        operation["data"] = serializer.validated_data
+        return operation
+
+
+# Applies a queued batch of operations in one transaction. Operations whose key has been synced before are skipped,
+# so the app can safely upload the same batch again when it does not know if the previous upload went through.
+# The number of queries does not depend on the size of the batch
+class WorkoutSessionSyncSerializer(serializers.Serializer):
+    operations = SyncOperationSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate(self, data):
+        user = self.context["request"].user
+        operations = data["operations"]
+
+        # The keys of the operations and the keys they reference
+        keys = {operation["key"] for operation in operations}
+        keys.update(
+            operation["data"][field] for operation in operations for field in ("workout_session_key", "exercise_session_key") if field in operation["data"]
+        )
+
+        # Operations that have been synced before, as key -> (object type, object id)
+        synced = {
+            key: (object_type, object_id)
+            for key, object_type, object_id in SyncedOperation.objects.filter(user=user, key__in=keys).values_list("key", "object_type", "object_id")
+        }
+
+        # Operations that are repeated in the same batch are only applied once
+        new_operations = {}
+        for operation in operations:
+            if operation["key"] not in synced:
+                new_operations.setdefault(operation["key"], operation)
+
+        workout_sessions = [operation for operation in new_operations.values() if operation["type"] == "workout_session"]
+        exercise_sessions = [operation for operation in new_operations.values() if operation["type"] == "exercise_session"]
+        sets = [operation for operation in new_operations.values() if operation["type"] == "set"]
+
+        errors = {}
+
+        # Resolves a reference to an object of the given type, returns the key of a new operation or the id of an object on the server
+        def resolve(operation, field):
+            key = operation["data"].get(f"{field}_key")
+            if key is None:
+                return operation["data"][field]
+            if key in new_operations and new_operations[key]["type"] == field:
+                return key
+            if key in synced and synced[key][0] == field:
+                return synced[key][1]
+
+            errors[operation["key"]] = f"Unknown {field} key"
+            return None
+
+        # The workouts of the new workout sessions have to exist
+        workout_ids = {operation["data"]["workout"] for operation in workout_sessions}
+        existing_workout_ids = set(Workout.objects.filter(id__in=workout_ids).values_list("id", flat=True)) if workout_ids else set()
+
+        for operation in workout_sessions:
+            if operation["data"]["workout"] not in existing_workout_ids:
+                errors[operation["key"]] = "Workout does not exist"
+
+        # The workout sessions of the new exercise sessions have to belong to the user, and the exercises have to be part of their workouts
+        references = {operation["key"]: resolve(operation, "workout_session") for operation in exercise_sessions}
+        session_ids = {reference for reference in references.values() if isinstance(reference, int)}
+        session_workouts = dict(WorkoutSession.objects.filter(user=user, id__in=session_ids).values_list("id", "workout_id")) if session_ids else {}
+        session_workouts.update({key: operation["data"]["workout"] for key, operation in new_operations.items() if operation["type"] == "workout_session"})
+
+        exercise_ids = {operation["data"]["exercise"] for operation in exercise_sessions}
+        workout_exercises = set(
+            Workout.exercises.through.objects.filter(workout_id__in=set(session_workouts.values()), exercise_id__in=exercise_ids)
+            .values_list("workout_id", "exercise_id")
+        ) if exercise_ids else set()
+
+        for operation in exercise_sessions:
+            reference = references[operation["key"]]
+            if reference is None:
+                continue
+            if reference not in session_workouts:
+                errors[operation["key"]] = "Workout session does not exist"
+            elif (session_workouts[reference], operation["data"]["exercise"]) not in workout_exercises:
+                errors[operation["key"]] = "This exercise is not a part of the workout"
+
+        # The exercise sessions of the new sets have to belong to the user
+        set_references = {operation["key"]: resolve(operation, "exercise_session") for operation in sets}
+        exercise_session_ids = {reference for reference in set_references.values() if isinstance(reference, int)}
+        existing_exercise_session_ids = set(
+            ExerciseSession.objects.filter(workout_session__user=user, id__in=exercise_session_ids).values_list("id", flat=True)
+        ) if exercise_session_ids else set()
+
+        for operation in sets:
+            reference = set_references[operation["key"]]
+            if isinstance(reference, int) and reference not in existing_exercise_session_ids:
+                errors[operation["key"]] = "Exercise session does not exist"
+
+        if errors:
+            raise serializers.ValidationError({"operations": errors})
+
+        data["synced"] = synced
+        data["workout_sessions"] = workout_sessions
+        data["exercise_sessions"] = list(zip(exercise_sessions, [references[operation["key"]] for operation in exercise_sessions]))
+        data["sets"] = list(zip(sets, [set_references[operation["key"]] for operation in sets]))
+        return data
+
+    # Returns the ids of the objects of every operation in the batch, both the new and the previously synced ones
+    def create(self, validated_data):
+        user = self.context["request"].user
+        ids = {key: object_id for key, (object_type, object_id) in validated_data["synced"].items()}
+        created = []
+
+        try:
+            with transaction.atomic():
+                # The objects are created one type at a time, so a reference to a key is always created before the objects referencing it
+                workout_sessions = WorkoutSession.objects.bulk_create([
+                    WorkoutSession(
+                        user=user,
+                        workout_id=operation["data"]["workout"],
+                        calories_burned=operation["data"].get("calories_burned"),
+                        duration=operation["data"].get("duration"),
+                    )
+                    for operation in validated_data["workout_sessions"]
+                ])
+                for operation, workout_session in zip(validated_data["workout_sessions"], workout_sessions):
+                    ids[operation["key"]] = workout_session.id
+                    created.append(operation)
+
+                exercise_sessions = ExerciseSession.objects.bulk_create([
+                    ExerciseSession(workout_session_id=ids.get(reference, reference), exercise_id=operation["data"]["exercise"])
+                    for operation, reference in validated_data["exercise_sessions"]
+                ])
+                for (operation, reference), exercise_session in zip(validated_data["exercise_sessions"], exercise_sessions):
+                    ids[operation["key"]] = exercise_session.id
+                    created.append(operation)
+
+                sets = Set.objects.bulk_create([
+                    Set(exercise_session_id=ids.get(reference, reference), repetitions=operation["data"]["repetitions"], weight=operation["data"].get("weight"))
+                    for operation, reference in validated_data["sets"]
+                ])
+                for (operation, reference), created_set in zip(validated_data["sets"], sets):
+                    ids[operation["key"]] = created_set.id
+                    created.append(operation)
+
+                # bulk_create does not send post_save, so the objects are added to the training rollups and personal records here
+                add_workout_sessions(workout_sessions)
+                add_sets(sets)
+                update_personal_records(sets)
+
+                SyncedOperation.objects.bulk_create([
+                    SyncedOperation(user=user, key=operation["key"], object_type=operation["type"], object_id=ids[operation["key"]])
+                    for operation in created
+                ])
+
+        # Another upload of the same operations was applied at the same time
+        except IntegrityError:
+            raise serializers.ValidationError("The operations are already being synced, try again")
+
+        return {
+            "ids": {operation["key"]: ids[operation["key"]] for operation in validated_data["operations"]},
+            "created": [operation["key"] for operation in created],
+            "duplicates": [operation["key"] for operation in validated_data["operations"] if operation["key"] in validated_data["synced"]],
+        }
+
 
 
 class ScheduledWorkoutSerializer(serializers.ModelSerializer):
     # Include the name of the related workout
     workout_title = serializers.ReadOnlyField(source="workout_template.name")
 
+    # Set on the occurrences of recurring workouts, which have no id of their own
+    recurrence = serializers.IntegerField(source="recurrence_id", read_only=True, default=None)
+    occurrence = serializers.DateTimeField(read_only=True, default=None)
 
     class Meta:
         model = ScheduledWorkout
-        fields = ["id", "user", "workout_template", "workout_title", "scheduled_date"]
+        fields = ["id", "user", "workout_template", "workout_title", "scheduled_date", "recurrence", "occurrence"]
         extra_kwargs = {"user": {"read_only": True}}
 
 
+# Short version of a workout session without the exercise sessions, used in the trainer dashboard
+class WorkoutSessionSummarySerializer(serializers.ModelSerializer):
+    workout_title = serializers.ReadOnlyField(source="workout.name")
+
+    class Meta:
+        model = WorkoutSession
+        fields = ["id", "workout", "workout_title", "start_time", "calories_burned", "duration"]
+
+
+# The next scheduled workout of a client in the trainer dashboard, which is either a scheduled workout ("scheduled") or a workout
+# scheduled by a personal trainer ("pt_scheduled"). Occurrences of recurring workouts have no id, and are identified by recurrence and occurrence
+class NextScheduledWorkoutSerializer(serializers.Serializer):
+    type = serializers.SerializerMethodField()
+    id = serializers.IntegerField(read_only=True)
+    workout_template = serializers.IntegerField(source="workout_template_id", read_only=True)
+    workout_title = serializers.ReadOnlyField(source="workout_template.name")
+    scheduled_date = serializers.DateTimeField(read_only=True)
+    pt = serializers.IntegerField(source="pt_id", read_only=True, default=None)
+    recurrence = serializers.IntegerField(source="recurrence_id", read_only=True, default=None)
+    occurrence = serializers.DateTimeField(read_only=True, default=None)
+
+    def get_type(self, scheduled_workout):
+        return "pt_scheduled" if isinstance(scheduled_workout, PersonalTrainerScheduledWorkout) else "scheduled"
+
+
+# A client in the trainer dashboard. The last session, next scheduled workout and totals are loaded by TrainerDashboardView
+class TrainerDashboardClientSerializer(serializers.ModelSerializer):
+    last_session = WorkoutSessionSummarySerializer(read_only=True)
+    next_scheduled_workout = NextScheduledWorkoutSerializer(read_only=True)
+
+    sessions_last_7_days = serializers.IntegerField(read_only=True)
+    sessions_last_30_days = serializers.IntegerField(read_only=True)
+    volume_last_7_days = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    volume_last_30_days = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = User
+        fields = [
+            "id",
+            "username",
+            "first_name",
+            "last_name",
+            "last_session",
+            "next_scheduled_workout",
+            "sessions_last_7_days",
+            "sessions_last_30_days",
+            "volume_last_7_days",
+            "volume_last_30_days",
+        ]
+
+
 class PersonalTrainerScheduledWorkoutSerializer(serializers.ModelSerializer):
     workout_title = serializers.ReadOnlyField(source="workout_template.name")
 
+    recurrence = serializers.IntegerField(source="recurrence_id", read_only=True, default=None)
+    occurrence = serializers.DateTimeField(read_only=True, default=None)
+
     class Meta:
         model = PersonalTrainerScheduledWorkout
-        fields = ["id", "client", "pt", "workout_template", "workout_title", "scheduled_date"]
+        fields = ["id", "client", "pt", "workout_template", "workout_title", "scheduled_date", "recurrence", "occurrence"]
         extra_kwargs = {"pt": {"read_only": True}}
 
+class BulkScheduledClientSerializer(serializers.Serializer):
+    client = serializers.IntegerField()
+    scheduled_date = serializers.DateTimeField()
+
+# Schedules the same workout for many clients of a personal trainer in one transaction, e.g. for a group class.
+# Every client is checked to be a client of the personal trainer in one query, no matter how many clients there are
+class BulkPersonalTrainerScheduledWorkoutSerializer(serializers.Serializer):
+    workout_template = serializers.PrimaryKeyRelatedField(queryset=Workout.objects.all())
+    schedules = BulkScheduledClientSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate(self, data):
+        trainer = self.context["request"].user
+
+        if not hasattr(trainer, "trainer_profile"):
+            raise serializers.ValidationError("PT is not a personal trainer")
+
+        client_ids = {schedule["client"] for schedule in data["schedules"]}
+        clients = set(UserProfile.objects.filter(user_id__in=client_ids, personal_trainer=trainer.trainer_profile).values_list("user_id", flat=True))
+
+        # The errors are given per position in the list
+        errors = {
+            index: "Client does not have this pt as its personal trainer"
+            for index, schedule in enumerate(data["schedules"])
+            if schedule["client"] not in clients
+        }
+        if errors:
+            raise serializers.ValidationError({"schedules": errors})
+
+        return data
+
+    def create(self, validated_data):
+        trainer = self.context["request"].user
+
+        with transaction.atomic():
+            scheduled_workouts = PersonalTrainerScheduledWorkout.objects.bulk_create([
+                PersonalTrainerScheduledWorkout(
+                    client_id=schedule["client"], pt=trainer, workout_template=validated_data["workout_template"], scheduled_date=schedule["scheduled_date"]
+                )
+                for schedule in validated_data["schedules"]
+            ])
+
+        # bulk_create does not send post_save, so the cached adherence reports and calendar feeds of the clients are cleared here
+        invalidate_adherence((scheduled_workout.client_id, scheduled_workout.scheduled_date) for scheduled_workout in scheduled_workouts)
+        bump_schedule_versions([trainer.id, *(scheduled_workout.client_id for scheduled_workout in scheduled_workouts)])
+
+        return scheduled_workouts
+
+
+class RecurringScheduledWorkoutExceptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecurringScheduledWorkoutException
+        fields = ["id", "occurrence", "cancelled", "scheduled_date", "workout_template"]
+
+    # The recurring workout is given in the context by the view
+    def validate(self, data):
+        recurring_workout = self.context["recurring_workout"]
+
+        if not is_occurrence(recurring_workout, data["occurrence"]):
+            raise serializers.ValidationError({"occurrence": "This is not an occurrence of the recurring workout"})
+
+        scheduled_date = data.get("scheduled_date")
+        if scheduled_date is not None and abs(scheduled_date - data["occurrence"]) > MAX_EXCEPTION_SHIFT:
+            raise serializers.ValidationError({"scheduled_date": f"An occurrence can be moved at most {MAX_EXCEPTION_SHIFT.days} days"})
+
+        return data
+
+    # There is at most one exception per occurrence, so a new exception replaces the previous one
+    def create(self, validated_data):
+        exception, _ = RecurringScheduledWorkoutException.objects.update_or_create(
+            recurring_workout=self.context["recurring_workout"],
+            occurrence=validated_data["occurrence"],
+            defaults={field: validated_data.get(field, default) for field, default in (("cancelled", False), ("scheduled_date", None), ("workout_template", None))},
+        )
+        return exception
+
+
+class RecurringScheduledWorkoutSerializer(serializers.ModelSerializer):
+    workout_title = serializers.ReadOnlyField(source="workout_template.name")
+    exceptions = RecurringScheduledWorkoutExceptionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = RecurringScheduledWorkout
+        fields = ["id", "user", "pt", "workout_template", "workout_title", "start", "frequency", "interval", "weekdays", "count", "until", "exceptions"]
+        extra_kwargs = {"user": {"read_only": True}, "pt": {"read_only": True}}
+
+    def validate_weekdays(self, weekdays):
+        weekdays = weekdays.upper()
+        if weekdays and not all(weekday in RecurringScheduledWorkout.WEEKDAYS for weekday in weekdays.split(",")):
+            raise serializers.ValidationError(f"Weekdays must be a comma separated list of {', '.join(RecurringScheduledWorkout.WEEKDAYS)}")
+        return weekdays
+
+    def validate(self, data):
+        if data["frequency"] == "daily" and data.get("weekdays"):
+            raise serializers.ValidationError({"weekdays": "Weekdays can only be given for weekly workouts"})
+
+        if data.get("count") is not None and data.get("until") is not None:
+            raise serializers.ValidationError("A recurring workout can end after a number of occurrences or at a date, not both")
+
+        if data.get("until") is not None and data["until"] < data["start"]:
+            raise serializers.ValidationError({"until": "Until must be after start"})
+
+        return data
+
+
+# Recurring workout that a personal trainer schedules for a client
+class PersonalTrainerRecurringScheduledWorkoutSerializer(RecurringScheduledWorkoutSerializer):
+    class Meta(RecurringScheduledWorkoutSerializer.Meta):
+        extra_kwargs = {"user": {"required": True}, "pt": {"read_only": True}}
+
+# The address that calendar apps subscribe to, absolute so it can be pasted into them
+class CalendarFeedSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CalendarFeed
+        fields = ["token", "url", "created"]
+
+    def get_url(self, obj):
+        path = reverse("calendar-feed", kwargs={"token": obj.token})
+        request = self.context.get("request")
+        return request.build_absolute_uri(path) if request is not None else path
+
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = ["id", "sender", "content", "date_sent", "chat_room"]
+        fields = ["id", "sender", "content", "date_sent", "chat_room", "seq"]
 
 
 class WorkoutMessageSerializer(serializers.ModelSerializer):
@@ -228,7 +752,7 @@ class WorkoutMessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WorkoutMessage
-        fields = ["id", "sender", "workout", "date_sent", "chat_room"]
+        fields = ["id", "sender", "workout", "date_sent", "chat_room", "seq"]
 
 
 class ChatRoomSerializer(serializers.ModelSerializer):
@@ -0,0 +1,241 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import localdate
+from .adherence import invalidate_adherence, invalidate_recurring_adherence
+from .analytics import add_sets, add_workout_sessions, rebuild_personal_records, rebuild_rollups, update_personal_records
+from .images import update_image_variants
+from .models import (
+    ChatRoom, DeletedExercise, Exercise, ExerciseCatalog, ExerciseSession, PersonalTrainerProfile, PersonalTrainerScheduledWorkout, RecurringScheduledWorkout,
+    RecurringScheduledWorkoutException, ScheduledWorkout, Set, UserProfile, Workout, WorkoutSession
+)
+from .utils import bump_chat_room_version, refresh_exercise_catalog_version, bump_schedule_versions
+
+# A new chat room can reuse the id of a deleted one, so it always starts with a new version
+@receiver(post_save, sender=ChatRoom)
+def chat_room_created(sender, instance, created, **kwargs):
+    if created:
+        bump_chat_room_version(instance.id)
+
+# Participants were added to, removed from or cleared from a chat room
+@receiver(m2m_changed, sender=ChatRoom.participants.through)
+def chat_room_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+    
+    # The change was made from the user side, e.g. user.chatroom_set.add(chat_room)
+    if reverse:
+        chat_room_ids = pk_set if pk_set is not None else instance.chatroom_set.values_list("id", flat=True)
+    else:
+        chat_room_ids = [instance.id]
+    
+    for chat_room_id in chat_room_ids:
+        bump_chat_room_version(chat_room_id)
+
+# Deleting a user removes it from its chat rooms without sending m2m_changed
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    for chat_room_id in instance.chatroom_set.values_list("id", flat=True):
+        bump_chat_room_version(chat_room_id)
+
+
+# Training rollups are updated incrementally when sets and workout sessions are created, and rebuilt for the affected week when they are changed or deleted.
+# Sets and workout sessions that are created with bulk_create are added to the rollups by the code creating them
+def rebuild_rollups_of_day(user_id, start_time):
+    day = localdate(start_time)
+    rebuild_rollups(user_id, day, day)
+
+# The model whose deletion caused the signal, deleting a workout session also deletes its exercise sessions and sets
+def deletion_origin(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+@receiver(post_save, sender=WorkoutSession)
+def workout_session_saved(sender, instance, created, **kwargs):
+    if created:
+        add_workout_sessions([instance])
+    else:
+        rebuild_rollups_of_day(instance.user_id, instance.start_time)
+
+# A new set can only raise the personal records, a changed or deleted set can lower them, so the record of its exercise is rebuilt
+@receiver(post_save, sender=Set)
+def set_saved(sender, instance, created, **kwargs):
+    if created:
+        add_sets([instance])
+        update_personal_records([instance])
+    else:
+        exercise_session = ExerciseSession.objects.filter(id=instance.exercise_session_id).values("exercise_id", "workout_session__user_id", "workout_session__start_time").first()
+        rebuild_rollups_of_day(exercise_session["workout_session__user_id"], exercise_session["workout_session__start_time"])
+        rebuild_personal_records([exercise_session["workout_session__user_id"]], exercise_session["exercise_id"])
+
+# The rollups are rebuilt once by the object that was deleted, instead of once for every set it cascades to.
+# When a user is deleted the rollups are deleted with it
+# The same goes for the personal records, which are rebuilt for every exercise of the user when a workout session is deleted
+@receiver(post_delete, sender=WorkoutSession)
+def workout_session_deleted(sender, instance, origin=None, **kwargs):
+    if deletion_origin(origin) is not User:
+        rebuild_rollups_of_day(instance.user_id, instance.start_time)
+        rebuild_personal_records([instance.user_id])
+
+@receiver(post_delete, sender=ExerciseSession)
+def exercise_session_deleted(sender, instance, origin=None, **kwargs):
+    if deletion_origin(origin) in (User, Workout, WorkoutSession):
+        return
+
+    workout_session = WorkoutSession.objects.filter(id=instance.workout_session_id).values("user_id", "start_time").first()
+    rebuild_rollups_of_day(workout_session["user_id"], workout_session["start_time"])
+    rebuild_personal_records([workout_session["user_id"]], instance.exercise_id)
+
+@receiver(post_delete, sender=Set)
+def set_deleted(sender, instance, origin=None, **kwargs):
+    if deletion_origin(origin) is not Set:
+        return
+
+    exercise_session = ExerciseSession.objects.filter(id=instance.exercise_session_id).values("exercise_id", "workout_session__user_id", "workout_session__start_time").first()
+    rebuild_rollups_of_day(exercise_session["workout_session__user_id"], exercise_session["workout_session__start_time"])
+    rebuild_personal_records([exercise_session["workout_session__user_id"]], exercise_session["exercise_id"])
+
+
+# Adherence reports are cached per client and week, and cleared for the weeks around the workout sessions and scheduled workouts that are written.
+# The fields with the user and the time of each model
+ADHERENCE_FIELDS = {
+    WorkoutSession: ("user_id", "start_time"),
+    ScheduledWorkout: ("user_id", "scheduled_date"),
+    PersonalTrainerScheduledWorkout: ("client_id", "scheduled_date"),
+}
+
+# An update can move the object to another user or time, so the weeks around the previous values are cleared as well
+@receiver(pre_save, sender=WorkoutSession)
+@receiver(pre_save, sender=ScheduledWorkout)
+@receiver(pre_save, sender=PersonalTrainerScheduledWorkout)
+def adherence_entry_updating(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values_list(*ADHERENCE_FIELDS[sender]).first()
+    if previous is not None:
+        invalidate_adherence([previous])
+
+@receiver([post_save, post_delete], sender=WorkoutSession)
+@receiver([post_save, post_delete], sender=ScheduledWorkout)
+@receiver([post_save, post_delete], sender=PersonalTrainerScheduledWorkout)
+def adherence_entry_written(sender, instance, **kwargs):
+    user_field, time_field = ADHERENCE_FIELDS[sender]
+    invalidate_adherence([(getattr(instance, user_field), getattr(instance, time_field))])
+
+# Recurring workouts are created and deleted but not changed, their exceptions can be changed
+@receiver([post_save, post_delete], sender=RecurringScheduledWorkout)
+def recurring_workout_written(sender, instance, **kwargs):
+    invalidate_recurring_adherence(instance)
+
+# The weeks around the date in the rule and the date the occurrence is moved to, before and after the change
+def invalidate_exception_adherence(recurring_workout_id, moments):
+    user_id = RecurringScheduledWorkout.objects.filter(id=recurring_workout_id).values_list("user_id", flat=True).first()
+    if user_id is not None:
+        invalidate_adherence((user_id, moment) for moment in moments if moment is not None)
+
+@receiver(pre_save, sender=RecurringScheduledWorkoutException)
+def recurring_workout_exception_updating(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values_list("recurring_workout_id", "occurrence", "scheduled_date").first()
+    if previous is not None:
+        invalidate_exception_adherence(previous[0], previous[1:])
+
+@receiver([post_save, post_delete], sender=RecurringScheduledWorkoutException)
+def recurring_workout_exception_written(sender, instance, origin=None, **kwargs):
+    # Deleting the recurring workout clears all its weeks
+    if kwargs["signal"] is post_delete and deletion_origin(origin) in (User, Workout, RecurringScheduledWorkout):
+        return
+
+    invalidate_exception_adherence(instance.recurring_workout_id, (instance.occurrence, instance.scheduled_date))
+
+
+# The version of the schedule of a user is replaced when a scheduled workout that is shown in their calendar feed is written.
+# The fields with the users of each model, both the client and the personal trainer see the workouts scheduled by the personal trainer
+SCHEDULE_USER_FIELDS = {
+    ScheduledWorkout: ("user_id",),
+    PersonalTrainerScheduledWorkout: ("client_id", "pt_id"),
+    RecurringScheduledWorkout: ("user_id", "pt_id"),
+}
+
+# An update can move the scheduled workout to another user, who no longer sees it
+@receiver(pre_save, sender=ScheduledWorkout)
+@receiver(pre_save, sender=PersonalTrainerScheduledWorkout)
+@receiver(pre_save, sender=RecurringScheduledWorkout)
+def schedule_updating(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values_list(*SCHEDULE_USER_FIELDS[sender]).first()
+    if previous is not None:
+        bump_schedule_versions(previous)
+
+@receiver([post_save, post_delete], sender=ScheduledWorkout)
+@receiver([post_save, post_delete], sender=PersonalTrainerScheduledWorkout)
+@receiver([post_save, post_delete], sender=RecurringScheduledWorkout)
+def schedule_written(sender, instance, **kwargs):
+    bump_schedule_versions(getattr(instance, field) for field in SCHEDULE_USER_FIELDS[sender])
+
+@receiver([post_save, post_delete], sender=RecurringScheduledWorkoutException)
+def schedule_exception_written(sender, instance, origin=None, **kwargs):
+    # Deleting the recurring workout replaces the versions of its users
+    if kwargs["signal"] is post_delete and deletion_origin(origin) in (User, Workout, RecurringScheduledWorkout):
+        return
+
+    users = RecurringScheduledWorkout.objects.filter(id=instance.recurring_workout_id).values_list("user_id", "pt_id").first()
+    if users is not None:
+        bump_schedule_versions(users)
+
+# The name of the workout is the title of the events in the calendar feed, so renaming it changes the feeds of everyone it is scheduled for.
+# The users are read in one query
+@receiver(post_save, sender=Workout)
+def scheduled_workout_template_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+
+    users = ScheduledWorkout.objects.filter(workout_template=instance).values_list("user_id", flat=True).union(
+        PersonalTrainerScheduledWorkout.objects.filter(workout_template=instance).values_list("client_id", flat=True),
+        PersonalTrainerScheduledWorkout.objects.filter(workout_template=instance).values_list("pt_id", flat=True),
+        RecurringScheduledWorkout.objects.filter(workout_template=instance).values_list("user_id", flat=True),
+        RecurringScheduledWorkout.objects.filter(workout_template=instance).values_list("pt_id", flat=True),
+        RecurringScheduledWorkoutException.objects.filter(workout_template=instance).values_list("recurring_workout__user_id", flat=True),
+        RecurringScheduledWorkoutException.objects.filter(workout_template=instance).values_list("recurring_workout__pt_id", flat=True),
+    )
+    bump_schedule_versions(users)
+
+
+# Exercise.save gives every exercise the next version of the catalog. Exercises loaded from fixtures are saved without calling save
+@receiver(pre_save, sender=Exercise)
+def exercise_loading(sender, instance, raw, **kwargs):
+    if raw:
+        instance.version = ExerciseCatalog.next_version()
+
+# Deleted exercises are kept with the version of the deletion. Runs in the transaction of the deletion
+@receiver(post_delete, sender=Exercise)
+def exercise_deleted(sender, instance, **kwargs):
+    DeletedExercise.objects.create(exercise_id=instance.id, version=ExerciseCatalog.next_version())
+
+# The cached version is only refreshed once the change is visible to other processes, so the responses cached for a version
+# and the search index always match it
+@receiver([post_save, post_delete], sender=Exercise)
+def exercise_written(sender, instance, **kwargs):
+    transaction.on_commit(refresh_exercise_catalog_version)
+
+
+# The image fields of the models with the fields holding the names of their variants
+IMAGE_FIELDS = {
+    Exercise: ("image", "image_variants"),
+    UserProfile: ("profile_picture", "profile_picture_variants"),
+    PersonalTrainerProfile: ("profile_picture", "profile_picture_variants"),
+}
+
+# The variants of a new image are made when it is uploaded, before the image itself is stored by the save
+@receiver(pre_save, sender=Exercise)
+@receiver(pre_save, sender=UserProfile)
+@receiver(pre_save, sender=PersonalTrainerProfile)
+def image_uploading(sender, instance, raw, **kwargs):
+    if not raw:
+        update_image_variants(instance, *IMAGE_FIELDS[sender])
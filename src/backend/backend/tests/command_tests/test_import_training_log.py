@@ -0,0 +1,54 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.timezone import now
+from backend.models import Exercise, PersonalRecord, TrainingRollup
+from backend.analytics import rebuild_rollups, week_start
+from decimal import Decimal
+from io import StringIO
+import os
+import tempfile
+
+
+class ImportTrainingLogCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.exercise = Exercise.objects.create(name="Squat", description="Squat with the bar.", muscle_group="Legs", muscle_category="legs")
+
+    def write_log(self, content, suffix):
+        log = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False)
+        log.write(content)
+        log.close()
+        self.addCleanup(os.remove, log.name)
+        return log.name
+
+    def test_import_in_chunks_matches_rebuilt_rollups(self):
+        rows = "".join(f"2024-01-{day:02d},Leg day,Squat,5,{100 + day}\n2024-01-{day:02d},Leg day,Squat,3,{110 + day}\n" for day in range(1, 29))
+        path = self.write_log("start_time,workout,exercise,repetitions,weight\n" + rows + "2024-02-01,Leg day,Lunge,5,20\n", ".csv")
+
+        output = StringIO()
+        call_command("import_training_log", "testUser", path, "--chunk-size", "5", stdout=output)
+
+        # Progress is written after every chunk, and the rows that could not be imported at the end
+        self.assertIn("Imported 2 workout sessions and 4 sets, 0 errors", output.getvalue())
+        self.assertIn("Line 58: Unknown exercise: Lunge", output.getvalue())
+        self.assertIn("Imported 29 workout sessions, 28 exercise sessions and 56 sets", output.getvalue())
+
+        self.assertEqual(PersonalRecord.objects.get(user=self.user, exercise=self.exercise).max_weight, Decimal("138.00"))
+
+        rollups = set(TrainingRollup.objects.values_list("period", "period_start", "muscle_category", "volume", "set_count", "session_count"))
+        rebuild_rollups(self.user.id, week_start(now().date().replace(year=2024, month=1, day=1)), week_start(now().date().replace(year=2024, month=2, day=5)))
+        self.assertEqual(set(TrainingRollup.objects.values_list("period", "period_start", "muscle_category", "volume", "set_count", "session_count")), rollups)
+
+    def test_import_unknown_user(self):
+        path = self.write_log("start_time,exercise\n", ".csv")
+
+        with self.assertRaises(CommandError):
+            call_command("import_training_log", "unknownUser", path, stdout=StringIO())
+
+    def test_import_with_missing_columns(self):
+        path = self.write_log("workout,repetitions\n", ".csv")
+
+        with self.assertRaises(CommandError):
+            call_command("import_training_log", "testUser", path, stdout=StringIO())
@@ -0,0 +1,47 @@
+from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from backend.models import Exercise, ExerciseCatalog
+from backend.tests.helpers import image_bytes, use_temporary_media_root
+from PIL import Image
+from io import BytesIO, StringIO
+
+
+class RebuildImageVariantsCommandTest(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+
+    def open_variant(self, name):
+        with default_storage.open(name) as variant:
+            image = Image.open(BytesIO(variant.read()))
+            return image.format, image.size
+
+    def test_rebuild_image_variants_command(self):
+        default_storage.save("exercise_images/squat.png", BytesIO(image_bytes((400, 400))))
+        exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs", image="exercise_images/squat.png")
+        Exercise.objects.create(name="Lunge", description="A lower body exercise.", muscle_group="Legs", image="exercise_images/missing.png")
+        Exercise.objects.create(name="Plank", description="A core exercise.", muscle_group="Abs")
+
+        # Images that cannot be decoded are skipped
+        default_storage.save("exercise_images/broken.png", BytesIO(b"not an image"))
+        broken = Exercise.objects.create(name="Crunch", description="A core exercise.", muscle_group="Abs", image="exercise_images/broken.png")
+
+        # Images that are set by name get their variants from the command
+        self.assertEqual(exercise.image_variants, {})
+        version = ExerciseCatalog.current_version()
+
+        output = StringIO()
+        call_command("rebuild_image_variants", stdout=output)
+        self.assertIn("Made the variants of 1 images, 1 images were not found and 1 could not be read", output.getvalue())
+
+        exercise.refresh_from_db()
+        self.assertEqual(self.open_variant(exercise.image_variants["thumbnail"]), ("WEBP", (256, 256)))
+        self.assertGreater(exercise.version, version)
+
+        broken.refresh_from_db()
+        self.assertEqual(broken.image_variants, {})
+
+        # Images that already have variants are skipped
+        output = StringIO()
+        call_command("rebuild_image_variants", stdout=output)
+        self.assertIn("Made the variants of 0 images", output.getvalue())
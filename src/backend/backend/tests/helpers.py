@@ -0,0 +1,80 @@
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from backend.models import Workout, WorkoutSession, ExerciseSession, Set
+from io import BytesIO
+from PIL import Image
+import tempfile
+
+# Sizes used to check that the number of queries of a list view does not grow with the number of rows
+QUERY_COUNT_SIZES = (1, 10, 1000)
+
+# Create many workouts owned by the given users, using bulk inserts so that large sizes stay fast
+def create_workouts(count, author, owners, exercises, name="workout"):
+    workouts = Workout.objects.bulk_create([Workout(name=f"{name} {i}", author=author) for i in range(count)])
+
+    Workout.owners.through.objects.bulk_create([
+        Workout.owners.through(workout_id=workout.id, user_id=owner.id) for workout in workouts for owner in owners
+    ])
+    Workout.exercises.through.objects.bulk_create([
+        Workout.exercises.through(workout_id=workout.id, exercise_id=exercise.id) for workout in workouts for exercise in exercises
+    ])
+    return workouts
+
+# Create many workout sessions of a user, each with one exercise session per exercise and the given number of sets in every exercise session
+def create_workout_sessions(count, user, workout, exercises, sets=2):
+    workout_sessions = WorkoutSession.objects.bulk_create([WorkoutSession(user=user, workout=workout) for _ in range(count)])
+
+    exercise_sessions = ExerciseSession.objects.bulk_create([
+        ExerciseSession(workout_session=workout_session, exercise=exercise) for workout_session in workout_sessions for exercise in exercises
+    ])
+    Set.objects.bulk_create([
+        Set(exercise_session=exercise_session, repetitions=10, weight=50 + i) for exercise_session in exercise_sessions for i in range(sets)
+    ])
+    return workout_sessions
+
+# An image of the given size as the content of a file in the given format
+def image_bytes(size, mode="RGB", image_format="PNG"):
+    output = BytesIO()
+    Image.new(mode, size, 128).save(output, image_format)
+    return output.getvalue()
+
+# Stores the files of a test, like uploaded images and their variants, in a directory that is removed after the test
+def use_temporary_media_root(test):
+    media_root = tempfile.TemporaryDirectory()
+    test.addCleanup(media_root.cleanup)
+
+    settings = override_settings(MEDIA_ROOT=media_root.name)
+    settings.enable()
+    test.addCleanup(settings.disable)
+
+# Reads the whole content of a streaming response that is served from an asynchronous iterator, like the ASGI server does
+def read_streaming_content(response):
+    async def read():
+        return b"".join([part async for part in response.streaming_content])
+
+    return async_to_sync(read)()
+
+
+class ConstantQueryCountMixin:
+    # Checks that a GET request to the url uses the same number of queries for every size.
+    # create_rows is called with the size before each request, and the created rows are deleted afterwards
+    def assertConstantQueryCount(self, url, create_rows, expected_count=None):
+        query_counts = {}
+
+        for size in QUERY_COUNT_SIZES:
+            rows = create_rows(size)
+
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data), size)
+            query_counts[size] = len(context.captured_queries)
+
+            model = type(rows[0])
+            model.objects.filter(id__in=[row.id for row in rows]).delete()
+
+        self.assertEqual(len(set(query_counts.values())), 1, f"Number of queries grows with the number of rows: {query_counts}")
+        if expected_count is not None:
+            self.assertEqual(query_counts[QUERY_COUNT_SIZES[0]], expected_count)
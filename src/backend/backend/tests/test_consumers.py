@@ -0,0 +1,227 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from unittest import mock
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+from backend.models import ChatRoom, Message, Notification, Workout, WorkoutMessage
+from backend.middleware import JWTAuthMiddleware, connection_cache
+from backend.routing import websocket_urlpatterns
+from backend.utils import set_chat_room_participant
+
+application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+
+class ConsumerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        connection_cache.clear()
+        self.communicators = []
+
+    async def connect(self, path, user):
+        separator = "&" if "?" in path else "?"
+        communicator = WebsocketCommunicator(application, f"{path}{separator}token={AccessToken.for_user(user)}")
+        connected, _ = await communicator.connect()
+        self.communicators.append(communicator)
+        return communicator, connected
+
+    # The sockets have to be closed inside the event loop of the test, so every test ends with this
+    async def disconnect(self):
+        for communicator in self.communicators:
+            await communicator.disconnect()
+
+
+class NotificationConsumerTest(ConsumerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.sender = User.objects.create_user(username="sender", password="password")
+        self.recipient = User.objects.create_user(username="recipient", password="password")
+        self.outsider = User.objects.create_user(username="outsider", password="password")
+
+        self.chat_room = ChatRoom.objects.create(name="test chat room")
+        self.chat_room.participants.set([self.sender, self.recipient])
+
+    async def test_notification_is_only_sent_to_the_recipient(self):
+        recipient, connected = await self.connect("/ws/notifications/", self.recipient)
+        self.assertTrue(connected)
+        sender, _ = await self.connect("/ws/notifications/", self.sender)
+
+        # Users that are not in any chat room can connect as well
+        outsider, connected = await self.connect("/ws/notifications/", self.outsider)
+        self.assertTrue(connected)
+
+        chat, _ = await self.connect(f"/ws/chat/{self.chat_room.id}/", self.sender)
+        await chat.send_json_to({"type": "message", "message": "Hello"})
+        self.assertEqual((await chat.receive_json_from())["content"], "Hello")
+
+        notification = await recipient.receive_json_from()
+        notification_id = await database_sync_to_async(Notification.objects.filter(user=self.recipient).values_list("id", flat=True).get)()
+        self.assertEqual(notification["type"], "notification")
+        self.assertEqual(notification["id"], notification_id)
+        self.assertEqual((notification["sender"], notification["message"], notification["chat_room_id"]), ("sender", "Hello", self.chat_room.id))
+
+        self.assertTrue(await recipient.receive_nothing())
+        self.assertTrue(await sender.receive_nothing())
+        self.assertTrue(await outsider.receive_nothing())
+        await self.disconnect()
+
+    async def test_chat_socket_does_not_receive_notifications(self):
+        recipient_chat, _ = await self.connect(f"/ws/chat/{self.chat_room.id}/", self.recipient)
+        chat, _ = await self.connect(f"/ws/chat/{self.chat_room.id}/", self.sender)
+
+        await chat.send_json_to({"type": "message", "message": "Hello"})
+
+        # Only the chat message is sent to the chat socket of the recipient
+        self.assertEqual((await recipient_chat.receive_json_from())["type"], "message")
+        self.assertTrue(await recipient_chat.receive_nothing())
+        await self.disconnect()
+
+    async def test_unauthenticated_user_is_rejected(self):
+        communicator = WebsocketCommunicator(application, "/ws/notifications/?token=invalid")
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class ChatConsumerNotificationTest(ConsumerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.sender = User.objects.create_user(username="sender", password="password")
+        self.recipient = User.objects.create_user(username="recipient", password="password")
+
+        self.chat_room = ChatRoom.objects.create(name="test chat room")
+        self.chat_room.participants.set([self.sender, self.recipient])
+
+    async def test_removed_sender_is_disconnected(self):
+        chat, _ = await self.connect(f"/ws/chat/{self.chat_room.id}/", self.sender)
+        recipient, _ = await self.connect("/ws/notifications/", self.recipient)
+
+        await database_sync_to_async(self.chat_room.participants.remove)(self.sender)
+        await chat.send_json_to({"type": "message", "message": "Hello"})
+
+        # The socket is closed instead of failing, and nothing is saved or sent
+        self.assertEqual(await chat.receive_output(), {"type": "websocket.close"})
+        self.assertFalse(await database_sync_to_async(Message.objects.exists)())
+        self.assertFalse(await database_sync_to_async(Notification.objects.exists)())
+        self.assertTrue(await recipient.receive_nothing())
+        await self.disconnect()
+
+    async def test_sender_removed_while_sending_keeps_the_socket(self):
+        chat, _ = await self.connect(f"/ws/chat/{self.chat_room.id}/", self.sender)
+
+        # The sender is removed after the membership was checked, so the message is saved and sent but no notifications are created
+        await database_sync_to_async(self.chat_room.participants.remove)(self.sender)
+        await database_sync_to_async(set_chat_room_participant)(self.chat_room.id, self.sender.id, True)
+
+        with self.assertLogs("backend.consumers", level="WARNING"):
+            await chat.send_json_to({"type": "message", "message": "Hello"})
+            self.assertEqual((await chat.receive_json_from())["content"], "Hello")
+            self.assertTrue(await chat.receive_nothing())
+
+        self.assertTrue(await database_sync_to_async(Message.objects.filter(content="Hello").exists)())
+        self.assertFalse(await database_sync_to_async(Notification.objects.exists)())
+        await self.disconnect()
+
+
+class ChatConsumerMembershipTest(ConsumerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.outsider = User.objects.create_user(username="outsider", password="password")
+
+        self.chat_room = ChatRoom.objects.create(name="test chat room")
+        self.chat_room.participants.set([self.user])
+
+    async def test_participant_can_connect(self):
+        _, connected = await self.connect(f"/ws/chat/{self.chat_room.id}/", self.user)
+        self.assertTrue(connected)
+        await self.disconnect()
+
+    async def test_non_participant_is_rejected(self):
+        _, connected = await self.connect(f"/ws/chat/{self.chat_room.id}/", self.outsider)
+        self.assertFalse(connected)
+
+    async def test_non_existent_chat_room_is_rejected(self):
+        _, connected = await self.connect("/ws/chat/9999/", self.user)
+        self.assertFalse(connected)
+
+    async def test_removed_participant_is_rejected_on_reconnect(self):
+        path = f"/ws/chat/{self.chat_room.id}/?token={AccessToken.for_user(self.user)}"
+
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+        # Removing the participant bumps the version of the chat room, so the cached membership is not used.
+        # The same token is used, so the connection itself is read from the cache of the middleware
+        await database_sync_to_async(self.chat_room.participants.remove)(self.user)
+
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class ChatConsumerReplayTest(ConsumerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.chat_room = ChatRoom.objects.create(name="test chat room")
+        self.chat_room.participants.set([self.user])
+
+        # Messages and workout messages share the sequence numbers of the chat room
+        self.workout = Workout.objects.create(name="Leg day", author=self.user)
+        self.first = Message.objects.create(sender=self.user, content="first", chat_room=self.chat_room)
+        self.workout_message = WorkoutMessage.objects.create(sender=self.user, workout=self.workout, chat_room=self.chat_room)
+        self.second = Message.objects.create(sender=self.user, content="second", chat_room=self.chat_room)
+
+    def path(self, last_seq):
+        return f"/ws/chat/{self.chat_room.id}/?last_seq={last_seq}"
+
+    async def test_missed_messages_are_replayed_in_order(self):
+        chat, connected = await self.connect(self.path(self.first.seq), self.user)
+        self.assertTrue(connected)
+
+        workout_message = await chat.receive_json_from()
+        self.assertEqual((workout_message["type"], workout_message["seq"], workout_message["workout"]["name"]), ("workout", self.workout_message.seq, "Leg day"))
+
+        message = await chat.receive_json_from()
+        self.assertEqual((message["type"], message["seq"], message["content"], message["sender"]), ("message", self.second.seq, "second", self.user.id))
+
+        self.assertTrue(await chat.receive_nothing())
+        await self.disconnect()
+
+    async def test_nothing_is_replayed_without_missed_messages(self):
+        chat, _ = await self.connect(self.path(self.second.seq), self.user)
+        self.assertTrue(await chat.receive_nothing())
+        await self.disconnect()
+
+    async def test_resync_when_too_many_messages_were_missed(self):
+        with mock.patch("backend.consumers.MAX_REPLAYED_MESSAGES", 1):
+            chat, _ = await self.connect(self.path(0), self.user)
+
+            self.assertEqual(await chat.receive_json_from(), {"type": "resync", "seq": self.second.seq})
+            self.assertTrue(await chat.receive_nothing())
+            await self.disconnect()
+
+    async def test_replayed_messages_are_not_sent_again(self):
+        chat, _ = await self.connect(self.path(0), self.user)
+        self.assertEqual([(await chat.receive_json_from())["seq"] for _ in range(3)], [self.first.seq, self.workout_message.seq, self.second.seq])
+
+        # A message that was saved while replaying is also broadcast to the group, and is skipped since it was already replayed
+        channel_layer = get_channel_layer()
+        await channel_layer.group_send(str(self.chat_room.id), {"type": "chat_message", "content": "second", "sender": self.user.id, "seq": self.second.seq})
+        self.assertTrue(await chat.receive_nothing())
+
+        # Newer messages are sent as usual
+        await chat.send_json_to({"type": "message", "message": "third"})
+        message = await chat.receive_json_from()
+        self.assertEqual((message["content"], message["seq"]), ("third", self.second.seq + 1))
+        self.assertTrue(await chat.receive_nothing())
+        await self.disconnect()
@@ -0,0 +1,86 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import AccessToken
+from backend.models import ChatRoom
+from backend.middleware import JWTAuthMiddleware, TTLCache, connection_cache, get_user_and_chat_room
+from time import time
+
+
+class TTLCacheTest(TestCase):
+    def test_get_and_set_basic(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("key", "value", time() + 60)
+        
+        self.assertEqual(cache.get("key"), "value")
+        self.assertIsNone(cache.get("missing"))
+    
+    def test_expired_entry_is_removed(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("key", "value", time() - 1)
+        
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(len(cache.entries), 0)
+    
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("first", 1, time() + 60)
+        cache.set("second", 2, time() + 60)
+        
+        # Reading the first entry makes the second one the least recently used
+        cache.get("first")
+        cache.set("third", 3, time() + 60)
+        
+        self.assertEqual(cache.get("first"), 1)
+        self.assertIsNone(cache.get("second"))
+        self.assertEqual(cache.get("third"), 3)
+
+
+class JWTAuthMiddlewareTest(TestCase):
+    def setUp(self):
+        connection_cache.clear()
+        
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.chat_room = ChatRoom.objects.create(name="test chat room")
+        self.chat_room.participants.set([self.user])
+        
+        self.token = str(AccessToken.for_user(self.user))
+        self.middleware = JWTAuthMiddleware(None)
+    
+    def test_get_user_and_chat_room_in_one_query(self):
+        with self.assertNumQueries(1):
+            user, chat_room, is_participant = get_user_and_chat_room(self.user.id, self.chat_room.id)
+        
+        self.assertEqual(user, self.user)
+        self.assertEqual(chat_room.id, self.chat_room.id)
+        self.assertTrue(is_participant)
+    
+    async def test_authenticate_basic(self):
+        user, chat_room = await self.middleware.authenticate(self.token, self.chat_room.id)
+        
+        self.assertEqual(user, self.user)
+        self.assertEqual(chat_room.id, self.chat_room.id)
+        self.assertEqual(chat_room.name, self.chat_room.name)
+    
+    async def test_authenticate_is_cached_until_token_expires(self):
+        await self.middleware.authenticate(self.token, self.chat_room.id)
+        
+        user, chat_room = connection_cache.get((self.token, self.chat_room.id))
+        self.assertEqual(user, self.user)
+    
+    async def test_authenticate_with_invalid_token(self):
+        connection = await self.middleware.authenticate("invalid token", self.chat_room.id)
+        
+        self.assertIsNone(connection)
+        self.assertEqual(len(connection_cache.entries), 0)
+    
+    async def test_authenticate_with_non_existent_chat_room(self):
+        user, chat_room = await self.middleware.authenticate(self.token, 9999)
+        
+        self.assertEqual(user, self.user)
+        self.assertIsNone(chat_room)
+    
+    async def test_authenticate_without_chat_room(self):
+        user, chat_room = await self.middleware.authenticate(self.token, None)
+        
+        self.assertEqual(user, self.user)
+        self.assertIsNone(chat_room)
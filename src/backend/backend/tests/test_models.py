@@ -4,8 +4,17 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from backend.models import UserProfile, PersonalTrainerProfile, Exercise, Workout, WorkoutSession, ExerciseSession, Set
 from backend.models import ChatRoom, Message, WorkoutMessage, ScheduledWorkout, Notification, PersonalTrainerScheduledWorkout, FailedLoginAttempt
+from backend.models import TrainingRollup, PersonalRecord, RecurringScheduledWorkout, RecurringScheduledWorkoutException, CalendarFeed
+from backend.models import ExerciseCatalog, DeletedExercise
+from backend.analytics import rebuild_rollups, week_start
+from backend.recurrence import expand, occurrences
+from backend.ical import escape_text, fold
+from decimal import Decimal
+from django.core.management import call_command
+from io import StringIO
 from datetime import timedelta
-from django.utils.timezone import now
+from django.utils.timezone import now, make_aware
+from datetime import datetime
 
 
 
@@ -418,6 +427,224 @@ class SetModelTest(TestCase):
         self.assertEqual(Set.objects.count(), 0)
 
 
+class TrainingRollupModelTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.bench_press = Exercise.objects.create(name="Bench Press", description="A classic chest exercise.", muscle_group="Chest", muscle_category="chest")
+        self.squat = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs", muscle_category="legs")
+        self.workout.exercises.set([self.bench_press, self.squat])
+
+        self.workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout, duration=timedelta(hours=1))
+        self.day = self.workout_session.start_time.date()
+
+        self.bench_press_session = ExerciseSession.objects.create(exercise=self.bench_press, workout_session=self.workout_session)
+        self.squat_session = ExerciseSession.objects.create(exercise=self.squat, workout_session=self.workout_session)
+
+        Set.objects.create(exercise_session=self.bench_press_session, repetitions=10, weight=50)
+        Set.objects.create(exercise_session=self.bench_press_session, repetitions=8, weight=60)
+        self.squat_set = Set.objects.create(exercise_session=self.squat_session, repetitions=5, weight=100)
+
+    def get_rollup(self, period, muscle_category):
+        period_start = self.day if period == "day" else week_start(self.day)
+        return TrainingRollup.objects.get(user=self.user, period=period, period_start=period_start, muscle_category=muscle_category)
+
+    def get_rollups(self):
+        return list(
+            TrainingRollup.objects.filter(user=self.user)
+            .order_by("period", "period_start", "muscle_category")
+            .values("period", "period_start", "muscle_category", "volume", "set_count", "session_count", "duration")
+        )
+
+    def test_rollups_are_updated_when_sets_are_created(self):
+        for period in ("day", "week"):
+            chest = self.get_rollup(period, "chest")
+            self.assertEqual(chest.volume, Decimal("980.00"))
+            self.assertEqual(chest.set_count, 2)
+            self.assertEqual(chest.session_count, 1)
+
+            legs = self.get_rollup(period, "legs")
+            self.assertEqual(legs.volume, Decimal("500.00"))
+            self.assertEqual(legs.set_count, 1)
+            self.assertEqual(legs.session_count, 1)
+
+            total = self.get_rollup(period, TrainingRollup.ALL_MUSCLE_CATEGORIES)
+            self.assertEqual(total.volume, Decimal("1480.00"))
+            self.assertEqual(total.set_count, 3)
+            self.assertEqual(total.session_count, 1)
+            self.assertEqual(total.duration, timedelta(hours=1))
+
+    def test_second_session_is_counted(self):
+        second_workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout, duration=timedelta(minutes=30))
+        exercise_session = ExerciseSession.objects.create(exercise=self.bench_press, workout_session=second_workout_session)
+        Set.objects.create(exercise_session=exercise_session, repetitions=10, weight=40)
+
+        self.assertEqual(self.get_rollup("day", "chest").session_count, 2)
+        self.assertEqual(self.get_rollup("day", "legs").session_count, 1)
+
+        total = self.get_rollup("week", TrainingRollup.ALL_MUSCLE_CATEGORIES)
+        self.assertEqual(total.session_count, 2)
+        self.assertEqual(total.duration, timedelta(hours=1, minutes=30))
+
+    def test_incremental_rollups_match_rebuilt_rollups(self):
+        incremental = self.get_rollups()
+
+        rebuild_rollups(self.user.id, self.day, self.day)
+        self.assertEqual(self.get_rollups(), incremental)
+
+    def test_rollups_are_rebuilt_when_a_set_is_deleted(self):
+        self.squat_set.delete()
+
+        self.assertFalse(TrainingRollup.objects.filter(muscle_category="legs").exists())
+        self.assertEqual(self.get_rollup("day", TrainingRollup.ALL_MUSCLE_CATEGORIES).volume, Decimal("980.00"))
+
+    def test_rollups_are_rebuilt_when_a_set_is_changed(self):
+        self.squat_set.weight = 110
+        self.squat_set.save()
+
+        self.assertEqual(self.get_rollup("week", "legs").volume, Decimal("550.00"))
+        self.assertEqual(self.get_rollup("week", TrainingRollup.ALL_MUSCLE_CATEGORIES).volume, Decimal("1530.00"))
+
+    def test_rollups_are_rebuilt_when_a_workout_session_is_deleted(self):
+        self.workout_session.delete()
+        self.assertEqual(TrainingRollup.objects.count(), 0)
+
+    def test_rollups_are_deleted_with_the_user(self):
+        self.user.delete()
+        self.assertEqual(TrainingRollup.objects.count(), 0)
+
+    def test_rebuild_command_restores_the_rollups(self):
+        rollups = self.get_rollups()
+        TrainingRollup.objects.all().delete()
+
+        call_command("rebuild_training_rollups", stdout=StringIO())
+        self.assertEqual(self.get_rollups(), rollups)
+
+    def test_unique_rollup_per_period_and_muscle_category(self):
+        with self.assertRaises(IntegrityError):
+            TrainingRollup.objects.create(user=self.user, period="day", period_start=self.day, muscle_category="chest")
+
+
+class PersonalRecordModelTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs", muscle_category="legs")
+        self.workout.exercises.set([self.exercise])
+
+        self.workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout)
+        self.exercise_session = ExerciseSession.objects.create(exercise=self.exercise, workout_session=self.workout_session)
+
+    def get_record(self):
+        return PersonalRecord.objects.get(user=self.user, exercise=self.exercise)
+
+    def test_record_is_created_with_the_first_set(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=5, weight=100)
+
+        record = self.get_record()
+        self.assertEqual(record.max_weight, Decimal("100.00"))
+        self.assertEqual(record.max_weight_repetitions, 5)
+        self.assertEqual(record.max_estimated_one_rep_max, Decimal("116.67"))
+
+    def test_heavier_set_beats_the_record(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=5, weight=100)
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=1, weight=110)
+
+        record = self.get_record()
+        self.assertEqual(record.max_weight, Decimal("110.00"))
+        self.assertEqual(record.max_weight_repetitions, 1)
+
+        # The single repetition of 110 has a lower estimate than five repetitions of 100
+        self.assertEqual(record.max_estimated_one_rep_max, Decimal("116.67"))
+
+    def test_more_repetitions_at_the_same_weight_beats_the_record(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=5, weight=100)
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=6, weight=100)
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=4, weight=100)
+
+        record = self.get_record()
+        self.assertEqual(record.max_weight_repetitions, 6)
+        self.assertEqual(record.max_estimated_one_rep_max, Decimal("120.00"))
+
+    def test_lighter_set_only_beats_the_estimated_max(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=1, weight=100)
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=12, weight=80)
+
+        record = self.get_record()
+        self.assertEqual(record.max_weight, Decimal("100.00"))
+        self.assertEqual(record.max_weight_repetitions, 1)
+        self.assertEqual(record.max_estimated_one_rep_max, Decimal("112.00"))
+
+    def test_set_without_weight_does_not_create_a_record(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=20)
+        self.assertFalse(PersonalRecord.objects.exists())
+
+    def test_largest_set_fits_in_the_record(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=2147483647, weight=Decimal("999.99"))
+        self.assertEqual(self.get_record().max_estimated_one_rep_max, Decimal("71582073405.44"))
+
+    def test_changed_set_lowers_the_record(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=5, weight=100)
+        heaviest_set = Set.objects.create(exercise_session=self.exercise_session, repetitions=1, weight=140)
+
+        heaviest_set.weight = 90
+        heaviest_set.save()
+
+        record = self.get_record()
+        self.assertEqual((record.max_weight, record.max_weight_repetitions), (Decimal("100.00"), 5))
+        self.assertEqual(record.max_estimated_one_rep_max, Decimal("116.67"))
+
+    def test_deleted_sets_lower_the_record(self):
+        other_exercise = Exercise.objects.create(name="Lunge", description="A lower body exercise.", muscle_group="Legs", muscle_category="legs")
+        other_exercise_session = ExerciseSession.objects.create(exercise=other_exercise, workout_session=self.workout_session)
+        Set.objects.create(exercise_session=other_exercise_session, repetitions=5, weight=60)
+
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=5, weight=100)
+        heaviest_set = Set.objects.create(exercise_session=self.exercise_session, repetitions=1, weight=140)
+
+        heaviest_set.delete()
+        self.assertEqual(self.get_record().max_weight, Decimal("100.00"))
+
+        # The record is removed with the last set of the exercise, and the other exercises keep theirs
+        self.exercise_session.delete()
+        self.assertFalse(PersonalRecord.objects.filter(exercise=self.exercise).exists())
+        self.assertEqual(PersonalRecord.objects.get(exercise=other_exercise).max_weight, Decimal("60.00"))
+
+        self.workout_session.delete()
+        self.assertFalse(PersonalRecord.objects.exists())
+
+    def test_rebuild_command_recomputes_the_records(self):
+        other_user = User.objects.create_user(username="otherUser", password="password")
+        other_exercise_session = ExerciseSession.objects.create(exercise=self.exercise, workout_session=WorkoutSession.objects.create(user=other_user, workout=self.workout))
+        Set.objects.create(exercise_session=other_exercise_session, repetitions=3, weight=80)
+
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=5, weight=100)
+        heaviest_set = Set.objects.create(exercise_session=self.exercise_session, repetitions=1, weight=140)
+
+        # Records are not lowered when sets are changed without signals
+        Set.objects.filter(id=heaviest_set.id).update(weight=90)
+        self.assertEqual(self.get_record().max_weight, Decimal("140.00"))
+
+        # Merging the sets does not lower the records either
+        call_command("rebuild_personal_records", "--chunk-size", "1", stdout=StringIO())
+        self.assertEqual(self.get_record().max_weight, Decimal("140.00"))
+
+        output = StringIO()
+        call_command("rebuild_personal_records", "--reset", "--chunk-size", "1", stdout=output)
+        self.assertIn("Rebuilt the personal records of 2 users, 2 personal records", output.getvalue())
+
+        record = self.get_record()
+        self.assertEqual(record.max_weight, Decimal("100.00"))
+        self.assertEqual(record.max_weight_repetitions, 5)
+        self.assertEqual(PersonalRecord.objects.get(user=other_user).max_weight, Decimal("80.00"))
+
+    def test_unique_record_per_user_and_exercise(self):
+        Set.objects.create(exercise_session=self.exercise_session, repetitions=5, weight=100)
+
+        with self.assertRaises(IntegrityError):
+            PersonalRecord.objects.create(user=self.user, exercise=self.exercise)
+
+
 class ChatRoomModelTest(TestCase):
     def setUp(self):
         self.first_user = User.objects.create_user(username="firstTestuser", password="password")
@@ -472,6 +699,21 @@ class MessageModelTest(TestCase):
         self.assertIsNotNone(message.date_sent)
         self.assertEqual(message.chat_room, self.chat_room)
     
+    def test_messages_get_increasing_sequence_numbers(self):
+        first_message = Message.objects.create(sender=self.user, content="first message", chat_room=self.chat_room)
+        second_message = Message.objects.create(sender=self.user, content="second message", chat_room=self.chat_room)
+        
+        self.assertEqual(first_message.seq, 1)
+        self.assertEqual(second_message.seq, 2)
+        
+        self.chat_room.refresh_from_db()
+        self.assertEqual(self.chat_room.last_seq, 2)
+        
+        # Every chat room has its own sequence
+        other_chat_room = ChatRoom.objects.create(name="other chat room")
+        other_message = Message.objects.create(sender=self.user, content="other message", chat_room=other_chat_room)
+        self.assertEqual(other_message.seq, 1)
+    
     def test_create_message_without_content(self):
         message = Message(sender=self.user, chat_room=self.chat_room)
         
@@ -524,6 +766,13 @@ class WorkoutMessageModelTest(TestCase):
         
         self.assertIsNotNone(workout_message.date_sent)
     
+    def test_workout_messages_share_sequence_with_messages(self):
+        message = Message.objects.create(sender=self.user, content="test message", chat_room=self.chat_room)
+        workout_message = WorkoutMessage.objects.create(workout=self.workout, chat_room=self.chat_room, sender=self.user)
+        
+        self.assertEqual(message.seq, 1)
+        self.assertEqual(workout_message.seq, 2)
+    
     def  test_create_workout_message_without_workout(self):
         workout_message = WorkoutMessage(chat_room=self.chat_room, sender=self.user)
         
@@ -726,9 +975,42 @@ class NotificationModelTest(TestCase):
         notification = Notification.objects.create(user=self.user, sender=self.sender, chat_room_id=self.chat_room.id, chat_room_name=self.chat_room.name, workout_message=self.workout)
         
         self.workout.delete()
-        
+
         self.assertEqual(Notification.objects.count(), 0)
 
+    def test_create_for_chat_room_basic(self):
+        notification_ids = Notification.create_for_chat_room(self.chat_room, self.second_user, message=self.message)
+
+        # Only the other participant should be notified
+        self.assertEqual(list(notification_ids.keys()), [self.user.id])
+
+        notification = Notification.objects.get(id=notification_ids[self.user.id])
+        self.assertEqual(notification.user, self.user)
+        self.assertEqual(notification.sender, self.sender)
+        self.assertEqual(notification.chat_room_id, self.chat_room.id)
+        self.assertEqual(notification.chat_room_name, self.chat_room.name)
+        self.assertEqual(notification.message, self.message)
+        self.assertIsNone(notification.workout_message)
+
+    def test_create_for_chat_room_with_sender_not_part_of_the_chat_room(self):
+        user = User.objects.create_user(username="someUser", password="password")
+
+        with self.assertRaises(ValidationError):
+            Notification.create_for_chat_room(self.chat_room, user, workout=self.workout)
+
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_create_for_chat_room_query_count_does_not_grow_with_participants(self):
+        users = User.objects.bulk_create([User(username=f"participant{i}") for i in range(40)])
+        self.chat_room.participants.add(*users)
+
+        # One query for the participants and one for the bulk insert
+        with self.assertNumQueries(2):
+            notification_ids = Notification.create_for_chat_room(self.chat_room, self.second_user, message=self.message)
+
+        self.assertEqual(len(notification_ids), 41)
+        self.assertEqual(Notification.objects.filter(id__in=notification_ids.values()).count(), 41)
+
 class TestPersonalTrainerScheduledWorkout(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
@@ -883,3 +1165,134 @@ class TestFailedLoginAttempt(TestCase):
     
 
 
+
+
+class RecurringScheduledWorkoutModelTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.other_workout = Workout.objects.create(name="other workout", author=self.user)
+
+        # A wednesday
+        self.start = make_aware(datetime(2025, 1, 1, 18, 30))
+
+    def create_rule(self, **fields):
+        return RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, start=self.start, **fields)
+
+    def dates(self, rule, start, end):
+        return [date.strftime("%Y-%m-%d %H:%M") for date in occurrences(rule, make_aware(start), make_aware(end))]
+
+    def test_weekly_occurrences(self):
+        rule = self.create_rule(frequency="weekly", weekdays="MO,WE")
+
+        # The monday before the start is not an occurrence
+        self.assertEqual(self.dates(rule, datetime(2024, 12, 25), datetime(2025, 1, 13)), [
+            "2025-01-01 18:30", "2025-01-06 18:30", "2025-01-08 18:30",
+        ])
+
+        # The end of the range is exclusive
+        self.assertEqual(self.dates(rule, datetime(2025, 1, 6, 18, 30), datetime(2025, 1, 8, 18, 30)), ["2025-01-06 18:30"])
+
+    def test_weekly_occurrences_with_interval_and_count(self):
+        rule = self.create_rule(frequency="weekly", interval=2, weekdays="WE,FR", count=5)
+
+        self.assertEqual(self.dates(rule, datetime(2025, 1, 1), datetime(2025, 3, 1)), [
+            "2025-01-01 18:30", "2025-01-03 18:30", "2025-01-15 18:30", "2025-01-17 18:30", "2025-01-29 18:30",
+        ])
+
+        # The occurrences before the range are counted without expanding them
+        self.assertEqual(self.dates(rule, datetime(2025, 1, 16), datetime(2025, 3, 1)), ["2025-01-17 18:30", "2025-01-29 18:30"])
+
+    def test_weekly_occurrences_on_the_day_of_the_start(self):
+        rule = self.create_rule(frequency="weekly")
+
+        self.assertEqual(self.dates(rule, datetime(2025, 1, 1), datetime(2025, 1, 16)), ["2025-01-01 18:30", "2025-01-08 18:30", "2025-01-15 18:30"])
+
+    def test_daily_occurrences_until(self):
+        rule = self.create_rule(frequency="daily", interval=3, until=make_aware(datetime(2025, 1, 10, 18, 30)))
+
+        self.assertEqual(self.dates(rule, datetime(2024, 1, 1), datetime(2026, 1, 1)), [
+            "2025-01-01 18:30", "2025-01-04 18:30", "2025-01-07 18:30", "2025-01-10 18:30",
+        ])
+
+    def test_occurrences_long_after_the_start(self):
+        rule = self.create_rule(frequency="daily")
+
+        self.assertEqual(self.dates(rule, datetime(2125, 1, 1), datetime(2125, 1, 3)), ["2125-01-01 18:30", "2125-01-02 18:30"])
+
+    def test_expand_with_exceptions(self):
+        rule = self.create_rule(frequency="weekly")
+        first, second, third = [self.start + timedelta(weeks=week) for week in range(3)]
+
+        RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=first, cancelled=True)
+        RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=second, scheduled_date=second + timedelta(days=1))
+        RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=third, workout_template=self.other_workout)
+
+        expanded = expand(RecurringScheduledWorkout.objects.filter(id=rule.id), self.start, self.start + timedelta(weeks=3))
+        self.assertEqual(
+            [(occurrence, scheduled_date, workout) for _, occurrence, scheduled_date, workout in expanded],
+            [(second, second + timedelta(days=1), self.workout), (third, third, self.other_workout)],
+        )
+
+        # An occurrence that is moved out of the range is not in it, and one that is moved into it is
+        expanded = expand(RecurringScheduledWorkout.objects.filter(id=rule.id), self.start, second + timedelta(hours=1))
+        self.assertEqual(expanded, [])
+
+        expanded = expand(RecurringScheduledWorkout.objects.filter(id=rule.id), second + timedelta(hours=1), second + timedelta(days=2))
+        self.assertEqual([scheduled_date for _, _, scheduled_date, _ in expanded], [second + timedelta(days=1)])
+
+    def test_unique_exception_per_occurrence(self):
+        rule = self.create_rule(frequency="daily")
+        RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=self.start, cancelled=True)
+
+        with self.assertRaises(IntegrityError):
+            RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=self.start)
+
+
+class CalendarFeedModelTest(TestCase):
+    def test_calendar_feeds_have_unique_tokens(self):
+        first = CalendarFeed.objects.create(user=User.objects.create_user(username="firstUser", password="password"))
+        second = CalendarFeed.objects.create(user=User.objects.create_user(username="secondUser", password="password"))
+        self.assertGreaterEqual(len(first.token), 40)
+        self.assertNotEqual(first.token, second.token)
+
+        with self.assertRaises(IntegrityError):
+            CalendarFeed.objects.create(user=first.user)
+
+    def test_long_lines_are_folded(self):
+        self.assertEqual(fold("SUMMARY:Legs"), "SUMMARY:Legs\r\n")
+
+        line = "SUMMARY:" + "ø" * 100
+        folded = fold(line)
+        parts = folded.split("\r\n ")
+
+        # No line is longer than 75 octets, and no character is split
+        self.assertTrue(all(len(part.encode()) <= 75 for part in parts))
+        self.assertEqual("".join(parts), line + "\r\n")
+
+    def test_text_is_escaped(self):
+        self.assertEqual(escape_text("Legs, glutes; core\\\nday"), "Legs\\, glutes\\; core\\\\\\nday")
+
+
+class ExerciseCatalogModelTest(TestCase):
+    def test_exercise_versions(self):
+        version = ExerciseCatalog.current_version()
+
+        exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        self.assertEqual(exercise.version, version + 1)
+        self.assertEqual(ExerciseCatalog.current_version(), version + 1)
+
+        # Every save gives the exercise the next version of the catalog, also when only some fields are saved
+        exercise.name = "Diamond push-up"
+        exercise.save(update_fields=["name"])
+        exercise.refresh_from_db()
+        self.assertEqual(exercise.version, version + 2)
+
+    def test_deleted_exercise_is_kept(self):
+        exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        exercise_id = exercise.id
+        exercise.delete()
+
+        deleted = DeletedExercise.objects.get()
+        self.assertEqual(deleted.exercise_id, exercise_id)
+        self.assertEqual(deleted.version, ExerciseCatalog.current_version())
@@ -0,0 +1,74 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.exceptions import ValidationError
+from backend.models import Exercise, UserProfile
+from backend.images import render_variant, render_variants
+from backend.tests.helpers import image_bytes, use_temporary_media_root
+from PIL import Image
+from io import BytesIO
+
+
+class ImageVariantsTest(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+
+    def open_variant(self, name):
+        with default_storage.open(name) as variant:
+            image = Image.open(BytesIO(variant.read()))
+            return image.format, image.size
+
+    def test_render_variants(self):
+        data = image_bytes((2000, 1000), image_format="JPEG")
+
+        # The thumbnail is cropped to a square, the large variant keeps the shape of the image
+        self.assertEqual(Image.open(BytesIO(render_variant(data, "thumbnail"))).size, (256, 256))
+        self.assertEqual(Image.open(BytesIO(render_variant(data, "large"))).size, (1280, 640))
+
+        # Images with a palette are converted before they are resized
+        variant = Image.open(BytesIO(render_variant(image_bytes((300, 300), mode="P"), "thumbnail")))
+        self.assertEqual((variant.format, variant.mode), ("WEBP", "RGB"))
+
+        # The same variants are rendered in the worker processes
+        self.assertEqual(render_variants(data, ["thumbnail", "large"]), {"thumbnail": render_variant(data, "thumbnail"), "large": render_variant(data, "large")})
+
+    def test_uploaded_image_variants(self):
+        data = image_bytes((800, 600))
+        exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest", image=SimpleUploadedFile("push_up.png", data))
+
+        # The variants are named after the hash of the image
+        self.assertEqual(set(exercise.image_variants), {"thumbnail", "large"})
+        self.assertRegex(exercise.image_variants["thumbnail"], r"^exercise_images/variants/[0-9a-f]{20}-thumbnail\.webp$")
+        self.assertEqual(self.open_variant(exercise.image_variants["thumbnail"]), ("WEBP", (256, 256)))
+        self.assertEqual(self.open_variant(exercise.image_variants["large"]), ("WEBP", (800, 600)))
+
+        # Uploading the same image again reuses the variants
+        profile = UserProfile.objects.create(user=User.objects.create_user(username="testUser", password="password"), profile_picture=SimpleUploadedFile("me.png", data))
+        self.assertEqual(profile.profile_picture_variants["thumbnail"], exercise.image_variants["thumbnail"].replace("exercise_images", "profile_pictures"))
+
+        # A new image gets new variants
+        thumbnail = exercise.image_variants["thumbnail"]
+        exercise.image = SimpleUploadedFile("push_up.png", image_bytes((800, 600), mode="L"))
+        exercise.save()
+        exercise.refresh_from_db()
+        self.assertNotEqual(exercise.image_variants["thumbnail"], thumbnail)
+
+        exercise.image = None
+        exercise.save()
+        exercise.refresh_from_db()
+        self.assertEqual(exercise.image_variants, {})
+
+    def test_unreadable_image_is_a_validation_error(self):
+        # Truncated JPEG files pass the check of the image field, and fail when they are decoded
+        noise = BytesIO()
+        Image.effect_noise((800, 600), 50).convert("RGB").save(noise, "JPEG")
+        truncated = noise.getvalue()[:len(noise.getvalue()) // 2]
+
+        for data in (b"not an image", truncated):
+            with self.assertRaises(ValidationError) as context:
+                Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest", image=SimpleUploadedFile("push_up.jpg", data))
+            self.assertIn("image", context.exception.detail)
+
+        self.assertFalse(Exercise.objects.exists())
+        self.assertEqual(default_storage.listdir("")[1], [])
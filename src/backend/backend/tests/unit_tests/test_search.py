@@ -0,0 +1,23 @@
+from django.test import TestCase
+from backend.search import ExerciseSearchIndex, edit_distance
+
+
+class ExerciseSearchIndexTest(TestCase):
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance("bench", "bench", 1), 0)
+        self.assertEqual(edit_distance("bnech", "bench", 1), 1)
+        self.assertEqual(edit_distance("bench", "benches", 2), 2)
+        self.assertEqual(edit_distance("bench", "squat", 2), 3)
+
+    def test_search_index(self):
+        index = ExerciseSearchIndex([
+            (1, "Push-up", "Chest", "Push yourself up from the floor.", "chest"),
+            (2, "Pull-up", "Lats", "Pull yourself up to the bar.", "back"),
+        ])
+
+        # Equal matches are sorted on the name
+        self.assertEqual(index.search("up"), [2, 1])
+        self.assertEqual(index.search("psuh"), [1])
+        self.assertEqual(index.search("up", muscle_category="back"), [2])
+        self.assertEqual(index.search("floor bar"), [])
+        self.assertEqual(index.search("!"), [])
@@ -3,7 +3,8 @@ from django.urls import resolve
 
 from backend.views.chat import (
     ChatRoomRetrieveView, ChatRoomListView, ChatRoomCreateView, ChatRoomDeleteView,
-    ListParticipantsInChatRoomView, ListMessagesInChatRoomView, ListWorkoutMessagesInChatRoomView
+    ListParticipantsInChatRoomView, ListMessagesInChatRoomView, ListWorkoutMessagesInChatRoomView,
+    ChatRoomTimelineView
 )
 
 class ChatUrlsTest(TestCase):
@@ -34,4 +35,7 @@ class ChatUrlsTest(TestCase):
     def test_gym_url_to_list_workout_messages_in_chat_room_endpoint(self):
         view = resolve('/chat/1/workout_messages/')
         self.assertEqual(view.func.view_class, ListWorkoutMessagesInChatRoomView)
-        
\ No newline at end of file
+    
+    def test_gym_url_to_chat_room_timeline_endpoint(self):
+        view = resolve('/chat/1/timeline/')
+        self.assertEqual(view.func.view_class, ChatRoomTimelineView)
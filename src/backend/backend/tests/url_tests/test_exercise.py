@@ -1,6 +1,6 @@
 from django.test import TestCase
 from django.urls import resolve
-from backend.views.exercise import ExerciseListView, ExerciseDetailView
+from backend.views.exercise import ExerciseListView, ExerciseDetailView, ExerciseSearchView, ExerciseCatalogChangesView
 
 class ExerciseUrlsTest(TestCase):
     def test_gym_url_to_list_exercises_endpoint(self):
@@ -9,4 +9,12 @@ class ExerciseUrlsTest(TestCase):
         
     def test_gym_url_to_get_exercise_detail_endpoint(self):
         view = resolve('/exercise/1/')
-        self.assertEqual(view.func.view_class, ExerciseDetailView)
\ No newline at end of file
+        self.assertEqual(view.func.view_class, ExerciseDetailView)
+
+    def test_gym_url_to_search_exercises_endpoint(self):
+        view = resolve('/exercise/search/')
+        self.assertEqual(view.func.view_class, ExerciseSearchView)
+
+    def test_gym_url_to_exercise_catalog_changes_endpoint(self):
+        view = resolve('/exercise/changes/')
+        self.assertEqual(view.func.view_class, ExerciseCatalogChangesView)
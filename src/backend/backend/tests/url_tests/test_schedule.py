@@ -3,7 +3,9 @@ from django.urls import resolve
 from backend.views.schedule import (
     CreateScheduledWorkoutView, ScheduledWorkoutListView, SchedulesWorkoutDeleteView,
     CreatePersonalTrainerScheduledWorkoutView, PersonalTrainerScheduledWorkoutListView,
-    PersonalTrainerScheduledWorkoutDeleteView
+    PersonalTrainerScheduledWorkoutDeleteView, CreateRecurringScheduledWorkoutView, CreatePersonalTrainerRecurringScheduledWorkoutView,
+    RecurringScheduledWorkoutListView, RecurringScheduledWorkoutDeleteView, CreateRecurringScheduledWorkoutExceptionView, CalendarFeedView, ResetCalendarFeedView,
+    CalendarFeedDownloadView, BulkCreatePersonalTrainerScheduledWorkoutView
 )
 
 class ScheduleUrlsTest(TestCase):
@@ -29,4 +31,40 @@ class ScheduleUrlsTest(TestCase):
 
     def test_gym_url_to_list_pt_scheduled_workouts_endpoint(self):
         view = resolve('/schedule/pt_workout/')
-        self.assertEqual(view.func.view_class, PersonalTrainerScheduledWorkoutListView)
\ No newline at end of file
+        self.assertEqual(view.func.view_class, PersonalTrainerScheduledWorkoutListView)
+
+    def test_gym_url_to_create_recurring_workout_endpoint(self):
+        view = resolve('/schedule/recurring_workout/create/')
+        self.assertEqual(view.func.view_class, CreateRecurringScheduledWorkoutView)
+
+    def test_gym_url_to_create_pt_recurring_workout_endpoint(self):
+        view = resolve('/schedule/pt_recurring_workout/create/')
+        self.assertEqual(view.func.view_class, CreatePersonalTrainerRecurringScheduledWorkoutView)
+
+    def test_gym_url_to_list_recurring_workouts_endpoint(self):
+        view = resolve('/schedule/recurring_workout/')
+        self.assertEqual(view.func.view_class, RecurringScheduledWorkoutListView)
+
+    def test_gym_url_to_delete_recurring_workout_endpoint(self):
+        view = resolve('/schedule/recurring_workout/delete/1/')
+        self.assertEqual(view.func.view_class, RecurringScheduledWorkoutDeleteView)
+
+    def test_gym_url_to_create_recurring_workout_exception_endpoint(self):
+        view = resolve('/schedule/recurring_workout/1/exception/')
+        self.assertEqual(view.func.view_class, CreateRecurringScheduledWorkoutExceptionView)
+
+    def test_gym_url_to_calendar_feed_endpoint(self):
+        view = resolve('/schedule/calendar/')
+        self.assertEqual(view.func.view_class, CalendarFeedView)
+
+    def test_gym_url_to_reset_calendar_feed_endpoint(self):
+        view = resolve('/schedule/calendar/reset/')
+        self.assertEqual(view.func.view_class, ResetCalendarFeedView)
+
+    def test_gym_url_to_download_calendar_feed_endpoint(self):
+        view = resolve('/schedule/calendar/abc-123_x.ics')
+        self.assertEqual(view.func.view_class, CalendarFeedDownloadView)
+
+    def test_gym_url_to_bulk_create_pt_scheduled_workouts_endpoint(self):
+        view = resolve('/schedule/pt_workout/bulk_create/')
+        self.assertEqual(view.func.view_class, BulkCreatePersonalTrainerScheduledWorkoutView)
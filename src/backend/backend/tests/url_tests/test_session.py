@@ -1,7 +1,7 @@
 from django.test import TestCase
 from django.urls import resolve
 from backend.views.session import (
-    WorkoutSessionListView, CreateWorkoutSessionView, CreateExerciseSessionView, CreateSetView
+    WorkoutSessionListView, CreateWorkoutSessionView, CreateExerciseSessionView, CreateSetView, LogWorkoutSessionView, SyncWorkoutSessionsView, TrainingRollupListView, ExerciseAnalyticsView, PersonalRecordListView, ExportWorkoutSessionsView, ImportTrainingLogView
 )
 
 class SessionUrlsTest(TestCase):
@@ -20,4 +20,31 @@ class SessionUrlsTest(TestCase):
     def test_gym_url_to_create_set_endpoint(self):
         view = resolve('/session/set/create/')
         self.assertEqual(view.func.view_class, CreateSetView)
-    
\ No newline at end of file
+
+    def test_gym_url_to_log_workout_session_endpoint(self):
+        view = resolve('/session/workout/log/')
+        self.assertEqual(view.func.view_class, LogWorkoutSessionView)
+
+    def test_gym_url_to_sync_workout_sessions_endpoint(self):
+        view = resolve('/session/sync/')
+        self.assertEqual(view.func.view_class, SyncWorkoutSessionsView)
+
+    def test_gym_url_to_list_training_rollups_endpoint(self):
+        view = resolve('/session/analytics/rollups/')
+        self.assertEqual(view.func.view_class, TrainingRollupListView)
+
+    def test_gym_url_to_exercise_analytics_endpoint(self):
+        view = resolve('/session/analytics/exercise/1/')
+        self.assertEqual(view.func.view_class, ExerciseAnalyticsView)
+
+    def test_gym_url_to_list_personal_records_endpoint(self):
+        view = resolve('/session/records/')
+        self.assertEqual(view.func.view_class, PersonalRecordListView)
+
+    def test_gym_url_to_export_workout_sessions_endpoint(self):
+        view = resolve('/session/workout/export/')
+        self.assertEqual(view.func.view_class, ExportWorkoutSessionsView)
+
+    def test_gym_url_to_import_training_log_endpoint(self):
+        view = resolve('/session/import/')
+        self.assertEqual(view.func.view_class, ImportTrainingLogView)
@@ -2,7 +2,7 @@ from django.test import TestCase
 from django.urls import resolve
 from backend.views.trainer import (
     PersonalTrainerListView, UpdatePersonalTrainerView, PersonalTrainerDetailView, ClientsListView,
-    ListScheduledWorkoutsOfClientView, ListWorkoutSessionsOfClientsView, ListWorkoutsOfClientsListView
+    ListScheduledWorkoutsOfClientView, ListWorkoutSessionsOfClientsView, ListWorkoutsOfClientsListView, ExportWorkoutSessionsOfClientView, TrainerDashboardView, TrainerAdherenceView
 )
 
 class TrainerUrlsTest(TestCase):
@@ -22,6 +22,14 @@ class TrainerUrlsTest(TestCase):
         view = resolve("/trainer/clients/")
         self.assertEqual(view.func.view_class, ClientsListView)
     
+    def test_gym_url_to_trainer_dashboard_endpoint(self):
+        view = resolve("/trainer/dashboard/")
+        self.assertEqual(view.func.view_class, TrainerDashboardView)
+    
+    def test_gym_url_to_trainer_adherence_endpoint(self):
+        view = resolve("/trainer/adherence/")
+        self.assertEqual(view.func.view_class, TrainerAdherenceView)
+    
     def test_gym_url_to_list_scheduled_workouts_of_client_endpoint(self):
         view = resolve("/trainer/client/1/scheduled_workouts/")
         self.assertEqual(view.func.view_class, ListScheduledWorkoutsOfClientView)
@@ -29,6 +37,11 @@ class TrainerUrlsTest(TestCase):
     def test_gym_url_to_list_workout_sessions_of_client_endpoint(self):
         view = resolve("/trainer/client/1/workout_sessions/")
         self.assertEqual(view.func.view_class, ListWorkoutSessionsOfClientsView)
+
+
+    def test_gym_url_to_export_workout_sessions_of_client_endpoint(self):
+        view = resolve("/trainer/client/1/workout_sessions/export/")
+        self.assertEqual(view.func.view_class, ExportWorkoutSessionsOfClientView)
         
     def test_gym_url_to_list_workouts_of_client_endpoint(self):
         view = resolve("/trainer/client/1/workouts/")
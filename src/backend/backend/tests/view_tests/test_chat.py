@@ -4,6 +4,8 @@ from backend.models import ChatRoom, Message, WorkoutMessage, Workout
 from backend.serializers import ChatRoomSerializer, DefaultUserSerializer, MessageSerializer, WorkoutMessageSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
+import base64
+import json
 
 
 class TestChatRoomCreateView(APITestCase):
@@ -246,6 +248,86 @@ class TestListMessagesInChatRoomView(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         
+    def test_list_messages_paginated_latest_page(self):
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(self.url, {"limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # The latest messages are returned in chronological order
+        serializer = MessageSerializer([self.second_message, self.third_message], many=True)
+        self.assertEqual(response.data["results"], serializer.data)
+        self.assertIsNotNone(response.data["before"])
+        self.assertFalse(response.data["has_more_after"])
+    
+    def test_list_messages_paginated_before_cursor(self):
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(self.url, {"limit": 2})
+        response = self.client.get(self.url, {"limit": 2, "before": response.data["before"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        serializer = MessageSerializer([self.message], many=True)
+        self.assertEqual(response.data["results"], serializer.data)
+        
+        # There are no older messages left
+        self.assertIsNone(response.data["before"])
+        self.assertTrue(response.data["has_more_after"])
+    
+    def test_list_messages_paginated_after_cursor(self):
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(self.url, {"limit": 50})
+        after = response.data["after"]
+        
+        # Catch up on the messages sent since the last page
+        new_message = Message.objects.create(sender=self.second_user, content="new message", chat_room=self.chat_room)
+        
+        response = self.client.get(self.url, {"after": after})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        serializer = MessageSerializer([new_message], many=True)
+        self.assertEqual(response.data["results"], serializer.data)
+        self.assertFalse(response.data["has_more_after"])
+        
+        # Nothing new has been sent, so the cursor stays the same
+        after = response.data["after"]
+        response = self.client.get(self.url, {"after": after})
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["after"], after)
+    
+    def test_list_messages_paginated_with_invalid_cursor(self):
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(self.url, {"before": "not a cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_list_messages_after_leaving_chat_room(self):
+        self.client.force_authenticate(user=self.user)
+        
+        # Cache the membership of the user
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Leaving the chat room must invalidate the cached membership
+        self.chat_room.participants.remove(self.user)
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_list_messages_after_joining_chat_room(self):
+        user = User.objects.create_user(username="someUser", password="password")
+        self.client.force_authenticate(user=user)
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # Joining from the user side of the relation must also invalidate the cached membership
+        user.chatroom_set.add(self.chat_room)
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
     def test_list_messages_of_non_existent_chat_room(self):
         url = reverse("chat_room-messages", kwargs={"pk": 9999})
         
@@ -306,4 +388,108 @@ class ListWorkoutMessagesInChatRoomView(APITestCase):
 
     def test_unauthenticated_user_do_not_have_access(self):
         response = self.client.get(self.url)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class TestChatRoomTimelineView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.second_user = User.objects.create_user(username="secondTestUser", password="password")
+        
+        self.chat_room = ChatRoom.objects.create(name="test chat room")
+        self.chat_room.participants.set([self.user, self.second_user])
+        
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.workout.owners.set([self.user])
+        
+        self.message = Message.objects.create(sender=self.user, content="first message", chat_room=self.chat_room)
+        self.workout_message = WorkoutMessage.objects.create(workout=self.workout, chat_room=self.chat_room, sender=self.user)
+        self.second_message = Message.objects.create(sender=self.second_user, content="last message", chat_room=self.chat_room)
+        
+        self.url = reverse("chat_room-timeline", kwargs={"pk": self.chat_room.id})
+    
+    def test_timeline_basic(self):
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Messages and workout messages are merged in the order they were sent
+        expected = [
+            {"type": "message", **MessageSerializer(self.message).data},
+            {"type": "workout", **WorkoutMessageSerializer(self.workout_message).data},
+            {"type": "message", **MessageSerializer(self.second_message).data},
+        ]
+        self.assertEqual(response.data["results"], expected)
+        self.assertIsNone(response.data["before"])
+    
+    def test_timeline_paginated_with_cursors(self):
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(self.url, {"limit": 2})
+        self.assertEqual([item["type"] for item in response.data["results"]], ["workout", "message"])
+        after = response.data["after"]
+        
+        response = self.client.get(self.url, {"limit": 2, "before": response.data["before"]})
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.message.id])
+        self.assertIsNone(response.data["before"])
+        
+        new_workout_message = WorkoutMessage.objects.create(workout=self.workout, chat_room=self.chat_room, sender=self.second_user)
+        
+        response = self.client.get(self.url, {"after": after})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["id"], new_workout_message.id)
+        self.assertEqual(response.data["results"][0]["type"], "workout")
+    
+    def test_timeline_paginated_with_invalid_cursor(self):
+        self.client.force_authenticate(user=self.user)
+        
+        def cursor(*values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+        
+        # The kind has to be one of the kinds of the timeline
+        for invalid in (cursor("2024-01-01T00:00:00+00:00", 5, 1), cursor("2024-01-01T00:00:00+00:00", "unknown", 1), cursor(5, "message", 1), "not a cursor"):
+            for param in ("after", "before"):
+                response = self.client.get(self.url, {param: invalid})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (param, invalid))
+        
+        # Cursors without a time zone are read in the current time zone
+        response = self.client.get(self.url, {"after": cursor("2000-01-01T00:00:00", "message", 0)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 3)
+    
+    def test_timeline_query_count_does_not_grow_with_workout_messages(self):
+        self.client.force_authenticate(user=self.user)
+        
+        # Cache the membership of the user
+        self.client.get(self.url)
+        
+        for i in range(20):
+            workout = Workout.objects.create(name=f"workout {i}", author=self.user)
+            workout.owners.set([self.user, self.second_user])
+            WorkoutMessage.objects.create(workout=workout, chat_room=self.chat_room, sender=self.user)
+        
+        # Messages, workout messages, and the owners and exercises of the workouts
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(len(response.data["results"]), 23)
+    
+    def test_timeline_of_others_chat_room(self):
+        user = User.objects.create_user(username="someUser", password="password")
+        
+        self.client.force_authenticate(user=user)
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_timeline_of_non_existent_chat_room(self):
+        url = reverse("chat_room-timeline", kwargs={"pk": 9999})
+        
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
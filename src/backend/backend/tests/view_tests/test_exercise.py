@@ -1,9 +1,15 @@
 from django.urls import reverse
 from rest_framework import status
-from backend.models import Exercise
+from backend.models import Exercise, ExerciseCatalog
 from backend.serializers import ExerciseSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from io import BytesIO
+import tempfile
 
 class TestExerciseDetailView(APITestCase):
     def setUp(self):
@@ -66,4 +72,218 @@ class ExerciseListViewTest(APITestCase):
         
         # Make sure that the queryset returned contains all exercises
         self.assertEqual(len(response.data), len(self.exercises))
-        self.assertEqual(response.data, serializer.data)
\ No newline at end of file
+        self.assertEqual(response.data, serializer.data)
+
+
+class TestExerciseSearchView(APITestCase):
+    def setUp(self):
+        # The version of the catalog is kept in the cache, and exercise ids are reused between tests
+        cache.clear()
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+
+        self.bench_press = Exercise.objects.create(name="Bench Press", description="Lie on a bench and press the bar up.", muscle_group="Pectorals", muscle_category="chest")
+        self.incline_press = Exercise.objects.create(name="Incline Dumbbell Press", description="Press the dumbbells on an incline.", muscle_group="Upper chest", muscle_category="chest")
+        self.squat = Exercise.objects.create(name="Barbell Squat", description="Squat with the bar on your back.", muscle_group="Quadriceps", muscle_category="legs")
+        self.row = Exercise.objects.create(name="Dumbbell Row", description="Support yourself on a bench with one hand.", muscle_group="Lats", muscle_category="back")
+        self.shoulder_press = Exercise.objects.create(name="Shoulder Press", description="Press the weight over your head.", muscle_group="Deltoids", muscle_category="shoulders")
+
+        self.url = reverse("exercise-search")
+
+    def search(self, **params):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [exercise["name"] for exercise in response.data]
+
+    def test_search_exercises_basic(self):
+        # Matches in the name come before matches in the description
+        self.assertEqual(self.search(q="bench"), ["Bench Press", "Dumbbell Row"])
+
+        # Every word has to match
+        self.assertEqual(self.search(q="dumbbell press"), ["Incline Dumbbell Press"])
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {"q": "squat"})
+        self.assertEqual(response.data, [{"id": self.squat.id, "name": "Barbell Squat", "muscle_category": "legs", "muscle_group": "Quadriceps", "image": None, "image_variants": {}}])
+
+    def test_search_exercises_by_prefix(self):
+        self.assertEqual(self.search(q="pre"), ["Bench Press", "Incline Dumbbell Press", "Shoulder Press"])
+        self.assertEqual(self.search(q="quad"), ["Barbell Squat"])
+
+    def test_search_exercises_with_typos(self):
+        self.assertEqual(self.search(q="bnech prss"), ["Bench Press"])
+        self.assertEqual(self.search(q="Sqaut"), ["Barbell Squat"])
+        self.assertEqual(self.search(q="deltiods"), ["Shoulder Press"])
+
+        # Short words have to be spelled correctly
+        self.assertEqual(self.search(q="rwo"), [])
+
+    def test_search_exercises_with_muscle_category(self):
+        self.assertEqual(self.search(q="press", muscle_category="shoulders"), ["Shoulder Press"])
+        self.assertEqual(self.search(q="press", limit=2), ["Bench Press", "Incline Dumbbell Press"])
+
+    def test_search_index_is_rebuilt_on_changes(self):
+        self.assertEqual(self.search(q="kettlebell"), [])
+
+        # The version of the catalog is refreshed once the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            kettlebell_swing = Exercise.objects.create(name="Kettlebell Swing", description="Swing the kettlebell.", muscle_group="Glutes", muscle_category="legs")
+        self.assertEqual(self.search(q="kettlebell"), ["Kettlebell Swing"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            kettlebell_swing.name = "Russian Swing"
+            kettlebell_swing.description = "Swing the weight."
+            kettlebell_swing.save()
+        self.assertEqual(self.search(q="kettlebell"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.squat.delete()
+        self.assertEqual(self.search(q="squat"), [])
+
+    def test_search_exercises_uses_index_in_memory(self):
+        self.search(q="press")
+
+        # Only the exercises in the results are read
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.search(q="press")), 3)
+
+    def test_invalid_search(self):
+        self.client.force_authenticate(user=self.user)
+
+        for params in ({}, {"q": " "}, {"q": "press", "muscle_category": "neck"}, {"q": "press", "limit": "a"}, {"q": "press", "limit": 0}, {"q": "press", "limit": 51}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(self.url, {"q": "press"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestExerciseCatalogCaching(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        self.second_exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs", muscle_category="legs")
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_exercise_list_is_not_modified(self):
+        response = self.client.get(reverse("exercise-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], f'"{ExerciseCatalog.current_version()}"')
+
+        # Unchanged catalogs are answered from the cache
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(reverse("exercise-list"), HTTP_IF_NONE_MATCH=response["ETag"])
+            cached = self.client.get(reverse("exercise-list"))
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+        self.assertEqual(cached.data, response.data)
+
+    def test_exercise_list_changes_with_the_catalog(self):
+        etag = self.client.get(reverse("exercise-list"))["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exercise.name = "Diamond push-up"
+            self.exercise.save()
+
+        response = self.client.get(reverse("exercise-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual([exercise["name"] for exercise in response.data], ["Diamond push-up", "Squat"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second_exercise.delete()
+
+        response = self.client.get(reverse("exercise-list"))
+        self.assertEqual([exercise["name"] for exercise in response.data], ["Diamond push-up"])
+
+    def test_exercise_detail_is_not_modified(self):
+        url = reverse("get-exercise", kwargs={"pk": self.exercise.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["name"], "Push-up")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(reverse("get-exercise", kwargs={"pk": 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_catalog_changes(self):
+        version = ExerciseCatalog.current_version()
+        deleted_id = self.second_exercise.id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exercise.description = "Keep your back straight."
+            self.exercise.save()
+            self.second_exercise.delete()
+            new_exercise = Exercise.objects.create(name="Deadlift", description="Lift the bar.", muscle_group="Lower back", muscle_category="back")
+
+        response = self.client.get(reverse("exercise-changes"), {"since": version})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], ExerciseCatalog.current_version())
+        self.assertEqual([exercise["id"] for exercise in response.data["changed"]], [self.exercise.id, new_exercise.id])
+        self.assertEqual(response.data["deleted"], [deleted_id])
+
+        # Asking again from the new version returns nothing, without reading the database
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("exercise-changes"), {"since": response.data["version"]})
+        self.assertEqual((response.data["changed"], response.data["deleted"]), ([], []))
+
+        # An app without a copy of the catalog gets every exercise
+        response = self.client.get(reverse("exercise-changes"), {"since": 0})
+        self.assertEqual(len(response.data["changed"]), 2)
+
+    def test_invalid_catalog_changes(self):
+        for params in ({}, {"since": "a"}, {"since": -1}, {"since": ExerciseCatalog.current_version() + 1}):
+            response = self.client.get(reverse("exercise-changes"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(reverse("exercise-changes"), {"since": 0})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestExerciseImageVariants(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        image = BytesIO()
+        Image.new("RGB", (1600, 1200)).save(image, "JPEG")
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.exercise = Exercise.objects.create(
+            name="Push-up", description="A classic exercise.", muscle_group="Chest", image=SimpleUploadedFile("push_up.jpg", image.getvalue(), content_type="image/jpeg")
+        )
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_exercise_list_has_variant_urls(self):
+        response = self.client.get(reverse("exercise-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        variants = response.data[0]["image_variants"]
+        self.assertEqual(set(variants), {"thumbnail", "large"})
+        self.assertEqual(variants["thumbnail"], f"http://testserver/media/{self.exercise.image_variants['thumbnail']}")
+        self.assertTrue(variants["large"].endswith("-large.webp"))
+
+    def test_search_results_have_variant_urls(self):
+        response = self.client.get(reverse("exercise-search"), {"q": "push"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["image_variants"]["thumbnail"], f"http://testserver/media/{self.exercise.image_variants['thumbnail']}")
@@ -1,11 +1,12 @@
 from django.urls import reverse
 from rest_framework import status
-from backend.models import Notification, ChatRoom, Workout
+from backend.models import Notification, ChatRoom, Workout, Exercise
 from backend.serializers import NotificationSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
+from backend.tests.helpers import ConstantQueryCountMixin, create_workouts
 
-class TestNotificationListView(APITestCase):
+class TestNotificationListView(ConstantQueryCountMixin, APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
         self.second_user = User.objects.create_user(username="secondTestUser", password="password")
@@ -49,6 +50,23 @@ class TestNotificationListView(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) 
 
+    def test_notification_list_constant_number_of_queries(self):
+        user = User.objects.create_user(username="manyNotificationsUser", password="password")
+        self.chat_room.participants.add(user)
+        exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+
+        def create_notifications(count):
+            workouts = create_workouts(count, self.user, [self.user], [exercise])
+            return Notification.objects.bulk_create([
+                Notification(user=user, sender=self.user.username, chat_room_id=self.chat_room.id, chat_room_name=self.chat_room.name, workout_message=workout)
+                for workout in workouts
+            ])
+
+        self.client.force_authenticate(user=user)
+
+        # One query for the notifications and their workouts, and one for each of the prefetched owners and exercises
+        self.assertConstantQueryCount(self.url, create_notifications, expected_count=3)
+
 class TestNotificationDeleteView(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
@@ -1,11 +1,21 @@
 from django.urls import reverse
 from rest_framework import status
-from backend.models import Workout, ScheduledWorkout, PersonalTrainerProfile, UserProfile, PersonalTrainerScheduledWorkout
+from backend.models import Workout, ScheduledWorkout, PersonalTrainerProfile, UserProfile, PersonalTrainerScheduledWorkout, RecurringScheduledWorkout, RecurringScheduledWorkoutException, CalendarFeed
 from backend.serializers import  ScheduledWorkoutSerializer, PersonalTrainerScheduledWorkoutSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from django.utils.timezone import now
-from datetime import timedelta
+from django.utils.timezone import make_aware
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from backend.utils import get_schedule_version
+from backend.tests.helpers import read_streaming_content
+from django.test import AsyncClient
+from unittest import mock
+from asgiref.sync import sync_to_async
+from datetime import datetime, timedelta
+import warnings
 
 class TestCreateScheduledWorkoutView(APITestCase):
     def setUp(self):
@@ -73,6 +83,113 @@ class TestScheduledWorkoutsListView(APITestCase):
         self.assertEqual(len(response.data), len(self.scheduled_workouts))
         self.assertEqual(response.data, serializer.data)
         
+    def test_list_scheduled_workouts_with_recurring_workouts(self):
+        start = make_aware(datetime(2025, 1, 6, 7))
+        stored = ScheduledWorkout.objects.create(workout_template=self.workout, scheduled_date=start + timedelta(days=1, hours=5), user=self.user)
+        rule = RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.second_workout, start=start, frequency="weekly", weekdays="MO,TH")
+
+        # Recurring workouts that a personal trainer scheduled are listed with the other workouts of the personal trainer
+        trainer = User.objects.create_user(username="testTrainer", password="password")
+        RecurringScheduledWorkout.objects.create(user=self.user, pt=trainer, workout_template=self.workout, start=start, frequency="daily")
+
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"start": "2025-01-06", "end": "2025-01-12"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(scheduled_workout["id"], scheduled_workout["recurrence"], scheduled_workout["scheduled_date"]) for scheduled_workout in response.data],
+            [
+                (None, rule.id, "2025-01-06T07:00:00Z"),
+                (stored.id, None, "2025-01-07T12:00:00Z"),
+                (None, rule.id, "2025-01-09T07:00:00Z"),
+            ],
+        )
+        self.assertEqual(response.data[0]["workout_title"], "second test workout")
+        self.assertEqual(response.data[0]["occurrence"], "2025-01-06T07:00:00Z")
+
+    def test_list_scheduled_workouts_constant_number_of_queries(self):
+        start = make_aware(datetime(2025, 1, 1, 7))
+        self.client.force_authenticate(user=self.user)
+
+        # The saved scheduled workouts, the recurring workouts and their exceptions
+        for days in (1, 300):
+            rule = RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, start=start, frequency="daily")
+            RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=start, cancelled=True)
+
+            end = start + timedelta(days=days)
+            with self.assertNumQueries(3):
+                response = self.client.get(self.url, {"start": start.isoformat(), "end": end.isoformat()})
+            self.assertEqual(len(response.data), days - 1)
+
+            rule.delete()
+
+    def test_list_scheduled_workouts_of_a_month(self):
+        month = make_aware(datetime(2025, 3, 1, 9))
+        in_month = ScheduledWorkout.objects.bulk_create([
+            ScheduledWorkout(user=self.user, workout_template=self.workout, scheduled_date=month + timedelta(days=days)) for days in range(0, 31, 3)
+        ])
+
+        # A long history before and after the month is not read
+        ScheduledWorkout.objects.bulk_create([
+            ScheduledWorkout(user=self.user, workout_template=self.second_workout, scheduled_date=month + timedelta(days=days)) for days in range(-1000, 400, 7) if not 0 <= days < 31
+        ])
+
+        self.client.force_authenticate(user=self.user)
+
+        # The scheduled workouts with their workouts, and the recurring workouts
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"start": "2025-03-01", "end": "2025-03-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([scheduled_workout["id"] for scheduled_workout in response.data], [scheduled_workout.id for scheduled_workout in in_month])
+        self.assertEqual({scheduled_workout["workout_title"] for scheduled_workout in response.data}, {"test workout"})
+
+    def test_list_scheduled_workouts_in_the_past(self):
+        stored = ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=make_aware(datetime(2019, 6, 1, 12)))
+        rule = RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.second_workout, start=make_aware(datetime(2019, 1, 7, 7)), frequency="weekly")
+
+        self.client.force_authenticate(user=self.user)
+
+        # Every saved scheduled workout before the end, and the occurrences in the weeks before it
+        response = self.client.get(self.url, {"end": "2020-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["id"], stored.id)
+
+        occurrences = [scheduled_workout["scheduled_date"] for scheduled_workout in response.data if scheduled_workout["recurrence"] == rule.id]
+        self.assertEqual(len(occurrences), 12)
+        self.assertEqual((occurrences[0], occurrences[-1]), ("2019-10-14T07:00:00Z", "2019-12-30T07:00:00Z"))
+        self.assertEqual(len(response.data), 13)
+
+    def test_list_scheduled_workouts_over_a_long_range(self):
+        first = ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=make_aware(datetime(2024, 2, 1, 12)))
+        last = ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=make_aware(datetime(2025, 11, 1, 12)))
+        rule = RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.second_workout, start=make_aware(datetime(2024, 1, 1, 7)), frequency="weekly")
+
+        self.client.force_authenticate(user=self.user)
+
+        # The saved scheduled workouts of the whole range, and the occurrences of the first 366 days of it
+        response = self.client.get(self.url, {"start": "2024-01-01", "end": "2025-12-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([scheduled_workout["id"] for scheduled_workout in response.data if scheduled_workout["id"] is not None], [first.id, last.id])
+
+        occurrences = [scheduled_workout["scheduled_date"] for scheduled_workout in response.data if scheduled_workout["recurrence"] == rule.id]
+        self.assertEqual(len(occurrences), 53)
+        self.assertEqual(occurrences[-1], "2024-12-30T07:00:00Z")
+
+    def test_list_scheduled_workouts_with_empty_range(self):
+        RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, start=make_aware(datetime(2025, 1, 1, 7)), frequency="daily")
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"start": "2025-02-01", "end": "2025-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_list_scheduled_workouts_with_invalid_range(self):
+        self.client.force_authenticate(user=self.user)
+
+        for params in ({"start": "tomorrow"}, {"end": "2025-13-01"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
     def test_user_without_scheduled_workouts(self):
         second_user = User.objects.create_user(username="secondTestUser", password="password")
         self.client.force_authenticate(user=second_user)
@@ -193,6 +310,93 @@ class TestCreatePersonalTrainerScheduleWorkoutView(APITestCase):
         response = self.client.post(self.url, data=data, format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         
+class TestBulkCreatePersonalTrainerScheduledWorkoutView(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.trainer = User.objects.create_user(username="testTrainer", password="password")
+        self.trainer_profile = PersonalTrainerProfile.objects.create(user=self.trainer)
+
+        self.clients = self.create_clients(3)
+        self.workout = Workout.objects.create(name="group class", author=self.trainer)
+        self.scheduled_date = now() + timedelta(days=1)
+        self.url = reverse("pt_scheduled_workout-bulk_create")
+
+    def create_clients(self, count, personal_trainer=None):
+        offset = User.objects.count()
+        clients = User.objects.bulk_create([User(username=f"client{offset + index}") for index in range(count)])
+        UserProfile.objects.bulk_create([UserProfile(user=client, personal_trainer=personal_trainer or self.trainer_profile) for client in clients])
+        return clients
+
+    def schedules(self, clients):
+        return [{"client": client.id, "scheduled_date": self.scheduled_date + timedelta(hours=index)} for index, client in enumerate(clients)]
+
+    def test_bulk_create_personal_trainer_scheduled_workouts_basic(self):
+        self.client.force_authenticate(user=self.trainer)
+        versions = [get_schedule_version(client.id) for client in self.clients]
+
+        response = self.client.post(self.url, {"workout_template": self.workout.id, "schedules": self.schedules(self.clients)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual([scheduled_workout["client"] for scheduled_workout in response.data], [client.id for client in self.clients])
+        self.assertEqual(response.data[2]["workout_title"], "group class")
+
+        scheduled_workouts = PersonalTrainerScheduledWorkout.objects.order_by("id")
+        self.assertEqual([scheduled_workout.id for scheduled_workout in scheduled_workouts], [scheduled_workout["id"] for scheduled_workout in response.data])
+        self.assertTrue(all(scheduled_workout.pt == self.trainer for scheduled_workout in scheduled_workouts))
+        self.assertEqual(scheduled_workouts[1].scheduled_date, self.scheduled_date + timedelta(hours=1))
+
+        # The calendar feeds of the clients have changed
+        self.assertTrue(all(get_schedule_version(client.id) != version for client, version in zip(self.clients, versions)))
+
+    def test_bulk_create_constant_number_of_queries(self):
+        self.client.force_authenticate(user=self.trainer)
+
+        def post(clients):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, {"workout_template": self.workout.id, "schedules": self.schedules(clients)}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.assertEqual(post(self.clients), post(self.create_clients(50)))
+        self.assertEqual(PersonalTrainerScheduledWorkout.objects.count(), 53)
+
+    def test_bulk_create_with_client_of_other_trainer(self):
+        other_trainer = User.objects.create_user(username="otherTrainer", password="password")
+        other_clients = self.create_clients(1, PersonalTrainerProfile.objects.create(user=other_trainer))
+        self.client.force_authenticate(user=self.trainer)
+
+        # Nothing is scheduled when one of the clients is not a client of the personal trainer
+        response = self.client.post(self.url, {"workout_template": self.workout.id, "schedules": self.schedules([*self.clients, *other_clients, self.trainer])}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data["schedules"]), {3, 4})
+        self.assertFalse(PersonalTrainerScheduledWorkout.objects.exists())
+
+    def test_invalid_bulk_create(self):
+        self.client.force_authenticate(user=self.trainer)
+
+        for data in (
+            {"workout_template": self.workout.id, "schedules": []},
+            {"workout_template": self.workout.id, "schedules": self.schedules(self.clients) * 200},
+            {"workout_template": self.workout.id, "schedules": [{"client": self.clients[0].id, "scheduled_date": "tomorrow"}]},
+            {"workout_template": 0, "schedules": self.schedules(self.clients)},
+        ):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertFalse(PersonalTrainerScheduledWorkout.objects.exists())
+
+    def test_user_cannot_bulk_create(self):
+        self.client.force_authenticate(user=self.clients[0])
+
+        response = self.client.post(self.url, {"workout_template": self.workout.id, "schedules": self.schedules(self.clients)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PersonalTrainerScheduledWorkout.objects.exists())
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.post(self.url, {"workout_template": self.workout.id, "schedules": self.schedules(self.clients)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
 class TestPersonalTrainerScheduledWorkoutListView(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
@@ -233,6 +437,55 @@ class TestPersonalTrainerScheduledWorkoutListView(APITestCase):
         self.assertEqual(len(response.data), len(self.user_scheduled_workouts))
         self.assertEqual(response.data, serializer.data)
         
+    def test_list_personal_trainer_recurring_workouts(self):
+        start = now() + timedelta(days=1)
+        rule = RecurringScheduledWorkout.objects.create(user=self.user, pt=self.trainer, workout_template=self.workout, start=start, frequency="weekly", count=2)
+
+        # Recurring workouts that the user scheduled themselves are not included
+        RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, start=start, frequency="daily")
+
+        for user in (self.user, self.trainer):
+            self.client.force_authenticate(user=user)
+
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            occurrences = [scheduled_workout for scheduled_workout in response.data if scheduled_workout["recurrence"] is not None]
+            self.assertEqual(len(occurrences), 2)
+            self.assertEqual(occurrences[1]["client"], self.user.id)
+            self.assertEqual(occurrences[1]["pt"], self.trainer.id)
+            self.assertEqual(occurrences[1]["recurrence"], rule.id)
+
+    def test_list_personal_trainer_scheduled_workouts_of_a_month(self):
+        month = make_aware(datetime(2025, 3, 1, 9))
+        in_month = PersonalTrainerScheduledWorkout.objects.bulk_create([
+            PersonalTrainerScheduledWorkout(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=month + timedelta(days=days)) for days in range(0, 31, 3)
+        ])
+        PersonalTrainerScheduledWorkout.objects.bulk_create([
+            PersonalTrainerScheduledWorkout(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=month + timedelta(days=days))
+            for days in range(-1000, 400, 7) if not 0 <= days < 31
+        ])
+
+        # The trainer has one more query, since checking that they are not a user reads the missing user profile
+        for user, queries in ((self.user, 2), (self.trainer, 3)):
+            self.client.force_authenticate(user=user)
+
+            with self.assertNumQueries(queries):
+                response = self.client.get(self.url, {"start": "2025-03-01", "end": "2025-03-31"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([scheduled_workout["id"] for scheduled_workout in response.data], [scheduled_workout.id for scheduled_workout in in_month])
+
+    def test_list_personal_trainer_scheduled_workouts_in_the_past(self):
+        stored = PersonalTrainerScheduledWorkout.objects.create(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=make_aware(datetime(2019, 6, 1, 12)))
+        RecurringScheduledWorkout.objects.create(user=self.user, pt=self.trainer, workout_template=self.workout, start=make_aware(datetime(2019, 12, 1, 7)), frequency="daily")
+
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.get(self.url, {"end": "2019-12-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["id"], stored.id)
+        self.assertEqual(len(response.data), 32)
+
     def test_list_personal_trainer_scheduled_workouts_trainer(self):
         self.client.force_authenticate(user=self.trainer)
         
@@ -303,3 +556,345 @@ class TestPersonalTrainerScheduledWorkoutDeleteView(APITestCase):
         
         self.assertIn(self.personal_trainer_scheduled_workout, PersonalTrainerScheduledWorkout.objects.all())
         
+
+
+class TestCreateRecurringScheduledWorkoutView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.start = now() + timedelta(days=1)
+        self.url = reverse("recurring_workout-create")
+
+    def test_create_recurring_workout_basic(self):
+        self.client.force_authenticate(user=self.user)
+
+        data = {"workout_template": self.workout.id, "start": self.start, "frequency": "weekly", "weekdays": "mo,fr", "count": 10}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        rule = RecurringScheduledWorkout.objects.get(id=response.data["id"])
+        self.assertEqual(rule.user, self.user)
+        self.assertIsNone(rule.pt)
+        self.assertEqual(rule.weekdays, "MO,FR")
+        self.assertEqual(rule.interval, 1)
+        self.assertEqual(response.data["workout_title"], "test workout")
+
+    def test_create_invalid_recurring_workout(self):
+        self.client.force_authenticate(user=self.user)
+
+        base = {"workout_template": self.workout.id, "start": self.start}
+        for data in (
+            {"frequency": "monthly"},
+            {"frequency": "weekly", "weekdays": "MO,XX"},
+            {"frequency": "daily", "weekdays": "MO"},
+            {"frequency": "daily", "interval": 0},
+            {"frequency": "daily", "count": 3, "until": self.start + timedelta(days=5)},
+            {"frequency": "daily", "until": self.start - timedelta(days=5)},
+        ):
+            response = self.client.post(self.url, {**base, **data}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
+        self.assertFalse(RecurringScheduledWorkout.objects.exists())
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.post(self.url, {"workout_template": self.workout.id, "start": self.start, "frequency": "daily"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestCreatePersonalTrainerRecurringScheduledWorkoutView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.user_profile = UserProfile.objects.create(user=self.user)
+
+        self.trainer = User.objects.create_user(username="testTrainer", password="password")
+        self.trainer_profile = PersonalTrainerProfile.objects.create(user=self.trainer)
+
+        self.user_profile.personal_trainer = self.trainer_profile
+        self.user_profile.save()
+
+        self.workout = Workout.objects.create(name="test workout", author=self.trainer)
+        self.data = {"user": self.user.id, "workout_template": self.workout.id, "start": now() + timedelta(days=1), "frequency": "weekly", "weekdays": "TU"}
+        self.url = reverse("pt_recurring_workout-create")
+
+    def test_create_personal_trainer_recurring_workout_basic(self):
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        rule = RecurringScheduledWorkout.objects.get(id=response.data["id"])
+        self.assertEqual(rule.user, self.user)
+        self.assertEqual(rule.pt, self.trainer)
+
+    def test_create_personal_trainer_recurring_workout_for_other_client(self):
+        other_user = User.objects.create_user(username="otherUser", password="password")
+        UserProfile.objects.create(user=other_user)
+
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.post(self.url, {**self.data, "user": other_user.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_cannot_create_personal_trainer_recurring_workout(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RecurringScheduledWorkout.objects.exists())
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestRecurringScheduledWorkoutViews(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.trainer = User.objects.create_user(username="testTrainer", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.other_workout = Workout.objects.create(name="other workout", author=self.user)
+
+        self.start = make_aware(datetime(2025, 1, 6, 7))
+        self.rule = RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, start=self.start, frequency="daily")
+        self.pt_rule = RecurringScheduledWorkout.objects.create(user=self.user, pt=self.trainer, workout_template=self.workout, start=self.start, frequency="weekly")
+
+    def test_list_recurring_workouts(self):
+        RecurringScheduledWorkoutException.objects.create(recurring_workout=self.rule, occurrence=self.start, cancelled=True)
+
+        for user, expected in ((self.user, [self.rule.id, self.pt_rule.id]), (self.trainer, [self.pt_rule.id])):
+            self.client.force_authenticate(user=user)
+
+            response = self.client.get(reverse("recurring_workouts-list"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([rule["id"] for rule in response.data], expected)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("recurring_workouts-list"))
+        self.assertEqual(response.data[0]["exceptions"][0]["cancelled"], True)
+
+    def test_cancel_and_move_occurrences(self):
+        url = reverse("recurring_workout-exception", kwargs={"pk": self.rule.id})
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(url, {"occurrence": self.start, "cancelled": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        moved = self.start + timedelta(days=1)
+        response = self.client.post(url, {"occurrence": moved, "scheduled_date": moved + timedelta(hours=10), "workout_template": self.other_workout.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(reverse("scheduled_workouts-list"), {"start": "2025-01-06", "end": "2025-01-08"})
+        self.assertEqual(
+            [(scheduled_workout["scheduled_date"], scheduled_workout["workout_title"]) for scheduled_workout in response.data],
+            [("2025-01-07T17:00:00Z", "other workout"), ("2025-01-08T07:00:00Z", "test workout")],
+        )
+
+        # A new exception for the same occurrence replaces the previous one
+        response = self.client.post(url, {"occurrence": self.start}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.rule.exceptions.count(), 2)
+        self.assertFalse(self.rule.exceptions.get(occurrence=self.start).cancelled)
+
+    def test_invalid_exceptions(self):
+        url = reverse("recurring_workout-exception", kwargs={"pk": self.rule.id})
+        self.client.force_authenticate(user=self.user)
+
+        for data in (
+            {"occurrence": self.start + timedelta(hours=1), "cancelled": True},
+            {"occurrence": self.start - timedelta(days=1), "cancelled": True},
+            {"occurrence": self.start, "scheduled_date": self.start + timedelta(days=60)},
+        ):
+            response = self.client.post(url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
+        self.assertFalse(RecurringScheduledWorkoutException.objects.exists())
+
+    def test_only_personal_trainer_can_change_their_recurring_workouts(self):
+        url = reverse("recurring_workout-exception", kwargs={"pk": self.pt_rule.id})
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(url, {"occurrence": self.start, "cancelled": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.delete(reverse("recurring_workout-delete", kwargs={"pk": self.pt_rule.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.trainer)
+        response = self.client.post(url, {"occurrence": self.start, "cancelled": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.delete(reverse("recurring_workout-delete", kwargs={"pk": self.pt_rule.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(RecurringScheduledWorkout.objects.filter(id=self.pt_rule.id).exists())
+
+    def test_delete_recurring_workout(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.delete(reverse("recurring_workout-delete", kwargs={"pk": self.rule.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(RecurringScheduledWorkout.objects.filter(id=self.rule.id).exists())
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(reverse("recurring_workouts-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(reverse("recurring_workout-exception", kwargs={"pk": self.rule.id}), {"occurrence": self.start}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestCalendarFeedViews(APITestCase):
+    def setUp(self):
+        # The schedule versions are kept in the cache, and user ids are reused between tests
+        cache.clear()
+
+        self.trainer = User.objects.create_user(username="testTrainer", password="password")
+        self.trainer_profile = PersonalTrainerProfile.objects.create(user=self.trainer)
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+        UserProfile.objects.create(user=self.user, personal_trainer=self.trainer_profile)
+
+        self.workout = Workout.objects.create(name="Legs, glutes; core", author=self.user)
+        self.tomorrow = now().replace(microsecond=0) + timedelta(days=1)
+
+        self.feed = CalendarFeed.objects.create(user=self.user)
+        self.trainer_feed = CalendarFeed.objects.create(user=self.trainer)
+
+    def get_feed(self, feed, **headers):
+        return self.client.get(reverse("calendar-feed", kwargs={"token": feed.token}), **headers)
+
+    def test_get_calendar_feed_address(self):
+        other_user = User.objects.create_user(username="otherUser", password="password")
+        self.client.force_authenticate(user=other_user)
+
+        response = self.client.get(reverse("calendar"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["url"].endswith(f"/schedule/calendar/{response.data['token']}.ics"))
+
+        # The same address is returned every time
+        self.assertEqual(self.client.get(reverse("calendar")).data["token"], response.data["token"])
+        self.assertEqual(CalendarFeed.objects.get(user=other_user).token, response.data["token"])
+
+    def test_reset_calendar_feed(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(reverse("calendar-reset"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data["token"], self.feed.token)
+
+        self.assertEqual(self.get_feed(self.feed).status_code, status.HTTP_404_NOT_FOUND)
+        self.feed.refresh_from_db()
+        self.assertEqual(self.get_feed(self.feed).status_code, status.HTTP_200_OK)
+
+    def test_calendar_feed_content(self):
+        scheduled_workout = ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=self.tomorrow)
+        pt_scheduled_workout = PersonalTrainerScheduledWorkout.objects.create(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=self.tomorrow)
+        rule = RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, start=self.tomorrow, frequency="daily", count=2)
+
+        # Outside the range of the feed
+        ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=self.tomorrow + timedelta(days=400))
+
+        response = self.get_feed(self.feed)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+
+        content = read_streaming_content(response).decode()
+        lines = content.split("\r\n")
+        self.assertEqual(lines[0], "BEGIN:VCALENDAR")
+        self.assertEqual(lines[-2:], ["END:VCALENDAR", ""])
+        self.assertEqual(lines.count("BEGIN:VEVENT"), 4)
+
+        self.assertIn(f"UID:scheduled-{scheduled_workout.id}@igym", lines)
+        self.assertIn(f"UID:pt-scheduled-{pt_scheduled_workout.id}@igym", lines)
+        self.assertIn(f"UID:recurring-{rule.id}-{self.tomorrow.strftime('%Y%m%dT%H%M%SZ')}@igym", lines)
+        self.assertIn(f"DTSTART:{self.tomorrow.strftime('%Y%m%dT%H%M%SZ')}", lines)
+        self.assertIn("SUMMARY:Legs\\, glutes\\; core", lines)
+        self.assertIn("DESCRIPTION:With testTrainer", lines)
+
+        # The personal trainer sees the workouts they scheduled, with the client in the description
+        content = read_streaming_content(self.get_feed(self.trainer_feed)).decode()
+        self.assertEqual(content.count("BEGIN:VEVENT"), 1)
+        self.assertIn("DESCRIPTION:With testUser", content)
+
+    def test_calendar_feed_is_read_in_chunks(self):
+        ScheduledWorkout.objects.bulk_create([
+            ScheduledWorkout(user=self.user, workout_template=self.workout, scheduled_date=self.tomorrow + timedelta(days=days % 3)) for days in range(10)
+        ])
+
+        # The token, then every chunk of scheduled workouts with one query, the workouts scheduled by a personal trainer and the recurring workouts
+        with mock.patch("backend.ical.CALENDAR_CHUNK_SIZE", 4), self.assertNumQueries(1 + 3 + 1 + 1):
+            content = read_streaming_content(self.get_feed(self.feed)).decode()
+
+        uids = [line for line in content.split("\r\n") if line.startswith("UID:scheduled-")]
+        self.assertEqual(len(uids), 10)
+        self.assertEqual(len(set(uids)), 10)
+
+    async def test_calendar_feed_is_streamed_under_asgi(self):
+        await sync_to_async(ScheduledWorkout.objects.create)(user=self.user, workout_template=self.workout, scheduled_date=self.tomorrow)
+
+        response = await AsyncClient().get(reverse("calendar-feed", kwargs={"token": self.feed.token}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # A synchronous iterator would be read into memory by the ASGI server first, with a warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            content = b"".join([part async for part in response]).decode()
+
+        self.assertEqual(content.count("BEGIN:VEVENT"), 1)
+        self.assertTrue(content.endswith("END:VCALENDAR\r\n"))
+
+    def test_unchanged_calendar_feed_is_not_modified(self):
+        ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=self.tomorrow)
+
+        response = self.get_feed(self.feed)
+        etag = response["ETag"]
+
+        # Only the token is read
+        with self.assertNumQueries(1):
+            response = self.get_feed(self.feed, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        # Another range is another feed
+        response = self.client.get(reverse("calendar-feed", kwargs={"token": self.feed.token}), {"start": "2025-01-01", "end": "2025-02-01"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        trainer_etag = self.get_feed(self.trainer_feed)["ETag"]
+
+        # Every change to the schedule is a new version, for the client and for the personal trainer
+        changes = [
+            lambda: ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=self.tomorrow),
+            lambda: PersonalTrainerScheduledWorkout.objects.create(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=self.tomorrow),
+            lambda: RecurringScheduledWorkout.objects.create(user=self.user, pt=self.trainer, workout_template=self.workout, start=self.tomorrow, frequency="daily"),
+            lambda: RecurringScheduledWorkoutException.objects.create(recurring_workout=RecurringScheduledWorkout.objects.get(), occurrence=self.tomorrow, cancelled=True),
+            lambda: Workout.objects.filter(id=self.workout.id).first().save(),
+            lambda: ScheduledWorkout.objects.filter(user=self.user).first().delete(),
+        ]
+        for change in changes:
+            change()
+
+            response = self.get_feed(self.feed, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+        response = self.get_feed(self.trainer_feed, HTTP_IF_NONE_MATCH=trainer_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        trainer_etag = response["ETag"]
+
+        # Scheduled workouts that the personal trainer does not see do not change their feed
+        ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=self.tomorrow)
+        self.assertEqual(self.get_feed(self.trainer_feed, HTTP_IF_NONE_MATCH=trainer_etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalid_calendar_feeds(self):
+        response = self.client.get(reverse("calendar-feed", kwargs={"token": "unknown"}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(reverse("calendar-feed", kwargs={"token": self.feed.token}), {"start": "2020-01-01", "end": "2025-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(reverse("calendar"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(reverse("calendar-reset"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
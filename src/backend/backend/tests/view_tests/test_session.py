@@ -1,10 +1,23 @@
 from django.urls import reverse
 from rest_framework import status
-from backend.models import Workout, WorkoutSession, ExerciseSession, Exercise, Set
-from backend.serializers import  WorkoutSessionSerializer
+from backend.models import Workout, WorkoutSession, ExerciseSession, Exercise, Set, SyncedOperation, TrainingRollup, PersonalRecord
+from backend.serializers import  WorkoutSessionSerializer, TrainingRollupSerializer, PersonalRecordSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
+from backend.tests.helpers import ConstantQueryCountMixin, create_workout_sessions, read_streaming_content
+from django.utils.timezone import now
 from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import AccessToken
+from unittest import mock
+import csv
+import json
+import warnings
 
 class TestCreateWorkoutSessionView(APITestCase):
     def setUp(self):
@@ -199,6 +212,22 @@ class TestCreateSet(APITestCase):
         self.assertEqual(set.exercise_session, self.exercise_session)
         self.assertEqual(set.repetitions, self.repetitions)
         self.assertEqual(set.weight, self.weight)
+
+    def test_create_set_updates_personal_record(self):
+        self.client.force_authenticate(user=self.user)
+
+        data = {
+            "exercise_session": self.exercise_session.id,
+            "repetitions": self.repetitions,
+            "weight": self.weight
+        }
+
+        response = self.client.post(self.url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        record = PersonalRecord.objects.get(user=self.user, exercise=self.exercise)
+        self.assertEqual(record.max_weight, self.weight)
+        self.assertEqual(record.max_weight_repetitions, self.repetitions)
     
     def test_unauthenticated_user_do_not_have_access(self):
         response = self.client.get(self.url)
@@ -219,7 +248,482 @@ class TestCreateSet(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(Set.objects.count(), 0)
         
-class TestListWorkoutSessionsView(APITestCase):
+class TestLogWorkoutSessionView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        self.second_exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs")
+        self.workout.exercises.set([self.exercise, self.second_exercise])
+
+        # Exercise that is not a part of the workout
+        self.other_exercise = Exercise.objects.create(name="Deadlift", description="A lower body exercise.", muscle_group="Legs")
+
+        self.url = reverse("workout_session-log")
+        self.data = {
+            "workout": self.workout.id,
+            "calories_burned": 120.5,
+            "duration": timedelta(hours=1),
+            "exercise_sessions": [
+                {"exercise": self.exercise.id, "sets": [{"repetitions": 10, "weight": 50}, {"repetitions": 8, "weight": 55}]},
+                {"exercise": self.second_exercise.id, "sets": [{"repetitions": 5, "weight": 100}]},
+            ],
+        }
+
+    def test_log_workout_session_basic(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        workout_session = WorkoutSession.objects.get(id=response.data["id"])
+        self.assertEqual(workout_session.user, self.user)
+        self.assertEqual(workout_session.workout, self.workout)
+
+        exercise_sessions = list(workout_session.exercise_sessions.order_by("id"))
+        self.assertEqual([exercise_session.exercise for exercise_session in exercise_sessions], [self.exercise, self.second_exercise])
+        self.assertEqual([set.repetitions for set in exercise_sessions[0].sets.order_by("id")], [10, 8])
+        self.assertEqual([set.repetitions for set in exercise_sessions[1].sets.order_by("id")], [5])
+
+        # The response has the same format as the workout session list
+        self.assertEqual(response.data, WorkoutSessionSerializer(workout_session).data)
+
+    def test_log_workout_session_number_of_queries(self):
+        self.client.force_authenticate(user=self.user)
+
+        # Add more exercise sessions and sets, the number of queries should stay the same
+        self.data["exercise_sessions"] *= 10
+
+        # Workout lookup and exercise check, then the savepoint, the three inserts and the release,
+        # ten queries for updating the training rollups, six for the personal records, and three for reading back the created tree
+        with self.assertNumQueries(26):
+            response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(ExerciseSession.objects.count(), 20)
+        self.assertEqual(Set.objects.count(), 30)
+
+    def test_log_workout_session_updates_training_rollups(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        total = TrainingRollup.objects.get(user=self.user, period="week", muscle_category=TrainingRollup.ALL_MUSCLE_CATEGORIES)
+        self.assertEqual(total.volume, 10 * 50 + 8 * 55 + 5 * 100)
+        self.assertEqual(total.set_count, 3)
+        self.assertEqual(total.session_count, 1)
+        self.assertEqual(total.duration, timedelta(hours=1))
+
+    def test_log_workout_session_updates_personal_records(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        record = PersonalRecord.objects.get(user=self.user, exercise=self.exercise)
+        self.assertEqual(record.max_weight, 55)
+        self.assertEqual(record.max_weight_repetitions, 8)
+        self.assertEqual(PersonalRecord.objects.get(user=self.user, exercise=self.second_exercise).max_weight, 100)
+
+    def test_log_workout_session_with_non_belonging_exercise(self):
+        self.client.force_authenticate(user=self.user)
+
+        self.data["exercise_sessions"].append({"exercise": self.other_exercise.id, "sets": [{"repetitions": 10, "weight": 50}]})
+
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Nothing is saved when a part of the session is invalid
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+        self.assertEqual(ExerciseSession.objects.count(), 0)
+        self.assertEqual(Set.objects.count(), 0)
+
+    def test_log_workout_session_with_invalid_set(self):
+        self.client.force_authenticate(user=self.user)
+
+        self.data["exercise_sessions"][1]["sets"].append({"repetitions": 5, "weight": -10})
+
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+        self.assertEqual(Set.objects.count(), 0)
+
+    def test_log_workout_session_with_negative_duration(self):
+        self.client.force_authenticate(user=self.user)
+
+        self.data["duration"] = timedelta(hours=-1)
+
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestSyncWorkoutSessionsView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.second_user = User.objects.create_user(username="secondTestUser", password="password")
+
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        self.other_exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs")
+        self.workout.exercises.set([self.exercise])
+
+        self.url = reverse("workout_session-sync")
+
+        # A workout session logged offline, referencing each other by key
+        self.operations = [
+            {"key": "session-1", "type": "workout_session", "data": {"workout": self.workout.id, "duration": "01:00:00"}},
+            {"key": "exercise-1", "type": "exercise_session", "data": {"exercise": self.exercise.id, "workout_session_key": "session-1"}},
+            {"key": "set-1", "type": "set", "data": {"exercise_session_key": "exercise-1", "repetitions": 10, "weight": 50}},
+            {"key": "set-2", "type": "set", "data": {"exercise_session_key": "exercise-1", "repetitions": 8, "weight": 55}},
+        ]
+
+    def test_sync_basic(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(self.url, data={"operations": self.operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        workout_session = WorkoutSession.objects.get(user=self.user)
+        exercise_session = ExerciseSession.objects.get(workout_session=workout_session)
+        sets = list(Set.objects.filter(exercise_session=exercise_session).order_by("id"))
+
+        # The response maps the keys to the ids on the server
+        self.assertEqual(response.data["ids"], {
+            "session-1": workout_session.id,
+            "exercise-1": exercise_session.id,
+            "set-1": sets[0].id,
+            "set-2": sets[1].id,
+        })
+        self.assertEqual(response.data["created"], ["session-1", "exercise-1", "set-1", "set-2"])
+        self.assertEqual(response.data["duplicates"], [])
+        self.assertEqual(SyncedOperation.objects.filter(user=self.user).count(), 4)
+
+    def test_sync_same_batch_twice_does_not_create_duplicates(self):
+        self.client.force_authenticate(user=self.user)
+
+        first_response = self.client.post(self.url, data={"operations": self.operations}, format="json")
+
+        # The app retries since it never received the first response
+        response = self.client.post(self.url, data={"operations": self.operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data["ids"], first_response.data["ids"])
+        self.assertEqual(response.data["created"], [])
+        self.assertEqual(sorted(response.data["duplicates"]), ["exercise-1", "session-1", "set-1", "set-2"])
+
+        self.assertEqual(WorkoutSession.objects.count(), 1)
+        self.assertEqual(ExerciseSession.objects.count(), 1)
+        self.assertEqual(Set.objects.count(), 2)
+
+    def test_sync_references_previously_synced_operations(self):
+        self.client.force_authenticate(user=self.user)
+
+        self.client.post(self.url, data={"operations": self.operations[:2]}, format="json")
+
+        # The set references an exercise session that was synced in an earlier batch
+        response = self.client.post(self.url, data={"operations": self.operations[2:]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], ["set-1", "set-2"])
+        self.assertEqual(Set.objects.filter(exercise_session__workout_session__user=self.user).count(), 2)
+
+    def test_sync_number_of_queries_does_not_depend_on_batch_size(self):
+        self.client.force_authenticate(user=self.user)
+
+        operations = self.operations + [
+            {"key": f"set-{i}", "type": "set", "data": {"exercise_session_key": "exercise-1", "repetitions": 10, "weight": 50}}
+            for i in range(3, 100)
+        ]
+
+        # Synced keys, existing workouts and the exercises of the workouts, then the savepoint, four inserts and the release,
+        # ten queries for updating the training rollups and six for the personal records
+        with self.assertNumQueries(25):
+            response = self.client.post(self.url, data={"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Set.objects.count(), 99)
+
+    def test_sync_with_non_belonging_exercise(self):
+        self.client.force_authenticate(user=self.user)
+
+        self.operations[1]["data"]["exercise"] = self.other_exercise.id
+
+        response = self.client.post(self.url, data={"operations": self.operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("exercise-1", response.data["operations"])
+
+        # Nothing in the batch is applied
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+        self.assertEqual(SyncedOperation.objects.count(), 0)
+
+    def test_sync_with_unknown_key(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(self.url, data={"operations": self.operations[2:]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("set-1", response.data["operations"])
+        self.assertEqual(Set.objects.count(), 0)
+
+    def test_sync_to_other_users_workout_session(self):
+        workout_session = WorkoutSession.objects.create(user=self.second_user, workout=self.workout)
+
+        self.client.force_authenticate(user=self.user)
+
+        operations = [{"key": "exercise-1", "type": "exercise_session", "data": {"exercise": self.exercise.id, "workout_session": workout_session.id}}]
+
+        response = self.client.post(self.url, data={"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ExerciseSession.objects.count(), 0)
+
+    def test_keys_are_per_user(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.url, data={"operations": self.operations}, format="json")
+
+        # The same keys from another user are new operations
+        self.client.force_authenticate(user=self.second_user)
+        response = self.client.post(self.url, data={"operations": self.operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["created"]), 4)
+        self.assertEqual(WorkoutSession.objects.filter(user=self.second_user).count(), 1)
+
+    def test_sync_with_invalid_set(self):
+        self.client.force_authenticate(user=self.user)
+
+        self.operations[2]["data"]["weight"] = -10
+
+        response = self.client.post(self.url, data={"operations": self.operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.post(self.url, data={"operations": self.operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestTrainingRollupListView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.second_user = User.objects.create_user(username="secondTestUser", password="password")
+
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs", muscle_category="legs")
+        self.workout.exercises.set([self.exercise])
+
+        self.workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout, duration=timedelta(hours=1))
+        exercise_session = ExerciseSession.objects.create(exercise=self.exercise, workout_session=self.workout_session)
+        Set.objects.create(exercise_session=exercise_session, repetitions=5, weight=100)
+
+        # Workout session of another user, should never be returned
+        second_workout_session = WorkoutSession.objects.create(user=self.second_user, workout=self.workout)
+        second_exercise_session = ExerciseSession.objects.create(exercise=self.exercise, workout_session=second_workout_session)
+        Set.objects.create(exercise_session=second_exercise_session, repetitions=5, weight=100)
+
+        self.day = self.workout_session.start_time.date()
+        self.url = reverse("training_rollup-list")
+
+    def test_list_training_rollups_basic(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Weekly rollups by default, one for the muscle category and one for all categories
+        rollups = TrainingRollup.objects.filter(user=self.user, period="week").order_by("period_start", "muscle_category")
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data, TrainingRollupSerializer(rollups, many=True).data)
+
+    def test_list_daily_training_rollups_of_muscle_category(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"period": "day", "muscle_category": "legs"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["period_start"], self.day.isoformat())
+        self.assertEqual(response.data[0]["set_count"], 1)
+        self.assertEqual(response.data[0]["session_count"], 1)
+
+    def test_list_training_rollups_in_date_range(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"period": "day", "start": (self.day + timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 0)
+
+        response = self.client.get(self.url, {"period": "day", "start": self.day.isoformat(), "end": self.day.isoformat()})
+        self.assertEqual(len(response.data), 2)
+
+    def test_list_training_rollups_uses_one_query(self):
+        self.client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"start": self.day.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_training_rollups_with_invalid_period(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"period": "month"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestExerciseAnalyticsView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.second_user = User.objects.create_user(username="secondTestUser", password="password")
+
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs", muscle_category="legs")
+        self.workout.exercises.set([self.exercise])
+
+        # Three workout sessions, one week apart
+        self.start_time = now() - timedelta(days=14)
+        for week, sets in enumerate([[(5, 100), (5, 100)], [(5, 105)], [(1, 120), (10, 80)]]):
+            self.create_workout_session(self.user, self.start_time + timedelta(weeks=week), sets)
+
+        # Sets of another user should not be included
+        self.create_workout_session(self.second_user, self.start_time, [(1, 300)])
+
+        self.url = reverse("exercise-analytics", kwargs={"pk": self.exercise.id})
+
+    def create_workout_session(self, user, start_time, sets):
+        workout_session = WorkoutSession.objects.create(user=user, workout=self.workout)
+        WorkoutSession.objects.filter(id=workout_session.id).update(start_time=start_time)
+
+        exercise_session = ExerciseSession.objects.create(exercise=self.exercise, workout_session=workout_session)
+        for repetitions, weight in sets:
+            Set.objects.create(exercise_session=exercise_session, repetitions=repetitions, weight=weight)
+
+    def test_exercise_analytics_basic(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data["set_count"], 5)
+        self.assertEqual(response.data["session_count"], 3)
+
+        # Epley is highest for 5 repetitions of 105, 105 * (1 + 5 / 30), Brzycki for the single repetition of 120
+        self.assertEqual(response.data["estimated_one_rep_max"], {"epley": 122.5, "brzycki": 120.0})
+
+        sessions = response.data["sessions"]
+        self.assertEqual([session["volume"] for session in sessions], [1000.0, 525.0, 920.0])
+        self.assertEqual([session["set_count"] for session in sessions], [2, 1, 2])
+        self.assertEqual([session["best_weight"] for session in sessions], [100.0, 105.0, 120.0])
+        self.assertEqual([session["estimated_one_rep_max"] for session in sessions], [116.67, 122.5, 120.0])
+
+        # The default window of 28 days includes all three sessions
+        self.assertEqual([session["rolling_volume"] for session in sessions], [1000.0, 1525.0, 2445.0])
+
+    def test_exercise_analytics_progression(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+
+        # The best estimates of the sessions are 116.67, 122.5 and 120, the slope is about 1.67 per week
+        self.assertAlmostEqual(response.data["progression_per_week"], 1.67, places=1)
+
+    def test_exercise_analytics_with_window(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"window": 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Each session is exactly one week after the previous one, which is outside of the window
+        self.assertEqual([session["rolling_volume"] for session in response.data["sessions"]], [1000.0, 525.0, 920.0])
+
+    def test_exercise_analytics_with_invalid_window(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"window": "month"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {"window": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_exercise_analytics_without_history(self):
+        user = User.objects.create_user(username="newUser", password="password")
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["set_count"], 0)
+        self.assertEqual(response.data["estimated_one_rep_max"], {"epley": None, "brzycki": None})
+        self.assertIsNone(response.data["progression_per_week"])
+        self.assertEqual(response.data["sessions"], [])
+
+    def test_exercise_analytics_uses_two_queries(self):
+        self.client.force_authenticate(user=self.user)
+
+        # One for the exercise and one for the sets
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_exercise_analytics_of_non_existent_exercise(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(reverse("exercise-analytics", kwargs={"pk": 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestPersonalRecordListView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs")
+        self.second_exercise = Exercise.objects.create(name="Bench Press", description="A classic chest exercise.", muscle_group="Chest")
+        self.workout.exercises.set([self.exercise, self.second_exercise])
+
+        workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout)
+        for exercise, weight in ((self.exercise, 100), (self.second_exercise, 60)):
+            exercise_session = ExerciseSession.objects.create(exercise=exercise, workout_session=workout_session)
+            Set.objects.create(exercise_session=exercise_session, repetitions=5, weight=weight)
+
+        self.url = reverse("personal_record-list")
+
+    def test_list_personal_records_basic(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        records = PersonalRecord.objects.filter(user=self.user).order_by("exercise_id")
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data, PersonalRecordSerializer(records, many=True).data)
+
+    def test_list_personal_records_of_exercise(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"exercise": self.second_exercise.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["max_weight"], "60.00")
+
+    def test_list_other_users_personal_records(self):
+        second_user = User.objects.create_user(username="secondTestUser", password="password")
+        self.client.force_authenticate(user=second_user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 0)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestListWorkoutSessionsView(ConstantQueryCountMixin, APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
         self.workout = Workout.objects.create(name="test workout", author=self.user)
@@ -271,3 +775,313 @@ class TestListWorkoutSessionsView(APITestCase):
     def test_unauthenticated_user_do_not_have_access(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_workout_sessions_constant_number_of_queries(self):
+        user = User.objects.create_user(username="manySessionsUser", password="password")
+        second_exercise = Exercise.objects.create(name="Squat", description="A lower body exercise.", muscle_group="Legs")
+        self.client.force_authenticate(user=user)
+
+        # One query for the workout sessions, one for the exercise sessions and one for the sets
+        self.assertConstantQueryCount(
+            self.url,
+            lambda count: create_workout_sessions(count, user, self.workout, [self.exercise, second_exercise]),
+            expected_count=3,
+        )
+
+    def test_list_workout_sessions_paginated(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"limit": 1, "offset": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data["count"], len(self.workout_sessions))
+        self.assertEqual(response.data["results"], WorkoutSessionSerializer([self.second_workout_session], many=True).data)
+        self.assertIsNone(response.data["next"])
+
+    def test_list_workout_sessions_in_date_range(self):
+        WorkoutSession.objects.filter(id=self.workout_session.id).update(start_time=now() - timedelta(days=10))
+        self.workout_session.refresh_from_db()
+
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"start": (now() - timedelta(days=1)).date().isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([session["id"] for session in response.data], [self.second_workout_session.id])
+
+        # A date as the end includes the whole day
+        response = self.client.get(self.url, {"end": self.workout_session.start_time.date().isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([session["id"] for session in response.data], [self.workout_session.id])
+
+    def test_list_workout_sessions_invalid_date(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"start": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TestExportWorkoutSessionsView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        self.workout.exercises.set([self.exercise])
+
+        self.workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout, calories_burned=120.5, duration=timedelta(hours=1))
+        self.exercise_session = ExerciseSession.objects.create(exercise=self.exercise, workout_session=self.workout_session)
+        self.first_set = Set.objects.create(exercise_session=self.exercise_session, repetitions=10, weight=50)
+        self.second_set = Set.objects.create(exercise_session=self.exercise_session, repetitions=8, weight=55)
+
+        # A workout session without any exercises is still part of the history
+        self.empty_workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout)
+
+        self.url = reverse("workout_session-export")
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, read_streaming_content(response).decode()
+
+    def test_export_csv_by_default(self):
+        self.client.force_authenticate(user=self.user)
+
+        response, content = self.export()
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="testUser-training-history.csv"', response["Content-Disposition"])
+
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([row["set_id"] for row in rows], [str(self.first_set.id), str(self.second_set.id), ""])
+        self.assertEqual(rows[0]["workout"], "test workout")
+        self.assertEqual(rows[0]["exercise"], "Push-up")
+        self.assertEqual(rows[1]["repetitions"], "8")
+        self.assertEqual(rows[1]["weight"], "55.00")
+        self.assertEqual(rows[2]["workout_session_id"], str(self.empty_workout_session.id))
+        self.assertEqual(rows[2]["exercise_session_id"], "")
+
+    def test_export_ndjson(self):
+        self.client.force_authenticate(user=self.user)
+
+        response, content = self.export(type="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        sessions = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([session["id"] for session in sessions], [self.workout_session.id, self.empty_workout_session.id])
+        self.assertEqual(sessions[0]["calories_burned"], "120.50")
+        self.assertEqual(len(sessions[0]["exercise_sessions"]), 1)
+        self.assertEqual(sessions[0]["exercise_sessions"][0]["exercise"], "Push-up")
+        self.assertEqual(
+            sessions[0]["exercise_sessions"][0]["sets"],
+            [
+                {"id": self.first_set.id, "repetitions": 10, "weight": "50.00"},
+                {"id": self.second_set.id, "repetitions": 8, "weight": "55.00"},
+            ],
+        )
+        self.assertEqual(sessions[1]["exercise_sessions"], [])
+
+    def test_export_only_contains_own_workout_sessions(self):
+        other_user = User.objects.create_user(username="otherUser", password="password")
+        WorkoutSession.objects.create(user=other_user, workout=self.workout)
+
+        self.client.force_authenticate(user=self.user)
+
+        _, content = self.export(type="ndjson")
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_export_without_history(self):
+        user = User.objects.create_user(username="newUser", password="password")
+        self.client.force_authenticate(user=user)
+
+        _, content = self.export()
+        self.assertEqual(content.splitlines(), [",".join([
+            "workout_session_id", "start_time", "workout", "duration", "calories_burned",
+            "exercise_session_id", "exercise", "set_id", "repetitions", "weight",
+        ])])
+
+        _, content = self.export(type="ndjson")
+        self.assertEqual(content, "")
+
+    def test_export_invalid_type(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"type": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_is_read_in_chunks(self):
+        create_workout_sessions(200, self.user, self.workout, [self.exercise], sets=3)
+        self.client.force_authenticate(user=self.user)
+
+        # Every chunk of workout sessions is read with one query, and a chunk that is not full is the last one
+        with mock.patch("backend.exports.EXPORT_CHUNK_SIZE", 100), self.assertNumQueries(3):
+            _, content = self.export()
+        self.assertEqual(len(content.splitlines()), 1 + 3 + 200 * 3)
+
+        with mock.patch("backend.exports.EXPORT_CHUNK_SIZE", 100):
+            _, content = self.export(type="ndjson")
+        sessions = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(sessions), 202)
+        self.assertEqual(len({session["id"] for session in sessions}), 202)
+        self.assertTrue(all(len(session["exercise_sessions"][0]["sets"]) == 3 for session in sessions[2:]))
+
+    async def test_export_is_streamed_under_asgi(self):
+        response = await AsyncClient().get(self.url, {"type": "ndjson"}, headers={"Authorization": f"Bearer {AccessToken.for_user(self.user)}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The ASGI server reads the response asynchronously, a synchronous iterator would be read into memory first with a warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            content = b"".join([part async for part in response])
+
+        self.assertEqual([json.loads(line)["id"] for line in content.decode().splitlines()], [self.workout_session.id, self.empty_workout_session.id])
+
+    def test_unauthenticated_user_cannot_export(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class TestImportTrainingLogView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.bench_press = Exercise.objects.create(name="Bench Press", description="Press the bar.", muscle_group="Chest", muscle_category="chest")
+        self.squat = Exercise.objects.create(name="Squat", description="Squat with the bar.", muscle_group="Legs", muscle_category="legs")
+        self.workout = Workout.objects.create(name="Push day", author=self.user)
+        self.workout.owners.add(self.user)
+
+        self.url = reverse("training_log-import")
+
+    def upload(self, name, content, **params):
+        url = self.url + ("?" + "&".join(f"{key}={value}" for key, value in params.items()) if params else "")
+        return self.client.post(url, {"file": SimpleUploadedFile(name, content.encode())}, format="multipart")
+
+    def test_import_csv(self):
+        self.client.force_authenticate(user=self.user)
+
+        content = (
+            "start_time,workout,duration,calories_burned,exercise,repetitions,weight\n"
+            "2024-01-01T10:00:00Z,push day,1:00:00,300,Bench Press,10,60\n"
+            "2024-01-01T10:00:00Z,push day,1:00:00,300,bench press,8,70\n"
+            "2024-01-01T10:00:00Z,push day,1:00:00,300,Squat,5,100\n"
+            "2024-01-03,Leg day,,,Squat,5,110\n"
+        )
+        response = self.upload("log.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["workout_sessions"], 2)
+        self.assertEqual(response.data["exercise_sessions"], 3)
+        self.assertEqual(response.data["sets"], 4)
+        self.assertEqual(response.data["errors"], [])
+
+        workout_sessions = list(WorkoutSession.objects.filter(user=self.user).order_by("start_time"))
+        self.assertEqual([workout_session.start_time.isoformat() for workout_session in workout_sessions], ["2024-01-01T10:00:00+00:00", "2024-01-03T00:00:00+00:00"])
+        self.assertEqual(workout_sessions[0].workout, self.workout)
+        self.assertEqual(workout_sessions[0].duration, timedelta(hours=1))
+        self.assertEqual(workout_sessions[0].calories_burned, Decimal("300.00"))
+
+        # Workouts that the user does not have are created with the imported exercises
+        self.assertEqual(workout_sessions[1].workout.name, "Leg day")
+        self.assertEqual(workout_sessions[1].workout.author, self.user)
+        self.assertEqual(list(workout_sessions[1].workout.exercises.all()), [self.squat])
+        self.assertEqual(set(self.workout.exercises.all()), {self.bench_press, self.squat})
+
+        # The imported sets are included in the personal records and training rollups
+        record = PersonalRecord.objects.get(user=self.user, exercise=self.squat)
+        self.assertEqual(record.max_weight, Decimal("110.00"))
+        rollup = TrainingRollup.objects.get(user=self.user, period="day", period_start=workout_sessions[0].start_time.date(), muscle_category="all")
+        self.assertEqual(rollup.set_count, 3)
+        self.assertEqual(rollup.volume, Decimal("1660.00"))
+
+    def test_import_reports_error_rows_and_imports_the_rest(self):
+        self.client.force_authenticate(user=self.user)
+
+        content = (
+            "start_time,workout,exercise,repetitions,weight\n"
+            "2024-01-01T10:00:00Z,Push day,Bench Press,10,60\n"
+            "2024-01-01T10:00:00Z,Push day,Unknown lift,10,60\n"
+            "2024-01-01T10:00:00Z,Push day,Bench Press,ten,60\n"
+            "2024-01-01T10:00:00Z,Push day,Bench Press,10,-5\n"
+            "yesterday,Push day,Bench Press,10,60\n"
+            "yesterday,Push day,Squat,10,60\n"
+            "2024-01-02T10:00:00Z,Push day,Squat,5,100\n"
+        )
+        response = self.upload("log.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["workout_sessions"], 2)
+        self.assertEqual(response.data["sets"], 2)
+        self.assertEqual(response.data["error_count"], 5)
+        self.assertEqual(
+            response.data["errors"],
+            [
+                {"line": 3, "error": "Unknown exercise: Unknown lift"},
+                {"line": 4, "error": "repetitions must be an integer"},
+                {"line": 5, "error": "weight must be between 0 and 999.99"},
+                {"line": 6, "error": "start_time must be a date or a datetime"},
+                {"line": 7, "error": "The workout session of this row could not be imported"},
+            ],
+        )
+
+    def test_import_ndjson_export_round_trip(self):
+        workout_session = WorkoutSession.objects.create(user=self.user, workout=self.workout, calories_burned=120.5, duration=timedelta(minutes=45))
+        exercise_session = ExerciseSession.objects.create(exercise=self.bench_press, workout_session=workout_session)
+        Set.objects.create(exercise_session=exercise_session, repetitions=10, weight=50)
+        Set.objects.create(exercise_session=exercise_session, repetitions=8, weight=55)
+
+        other_user = User.objects.create_user(username="otherUser", password="password")
+        self.client.force_authenticate(user=self.user)
+        export = read_streaming_content(self.client.get(reverse("workout_session-export"), {"type": "ndjson"})).decode()
+
+        self.client.force_authenticate(user=other_user)
+        response = self.upload("history.ndjson", export + "not json\n")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["workout_sessions"], 1)
+        self.assertEqual(response.data["sets"], 2)
+        self.assertEqual(response.data["errors"], [{"line": 2, "error": "Invalid JSON"}])
+
+        imported = WorkoutSession.objects.get(user=other_user)
+        # The export has the start time in milliseconds
+        self.assertAlmostEqual(imported.start_time, workout_session.start_time, delta=timedelta(milliseconds=1))
+        self.assertEqual(imported.duration, timedelta(minutes=45))
+        self.assertEqual(imported.calories_burned, Decimal("120.50"))
+        self.assertEqual(list(Set.objects.filter(exercise_session__workout_session=imported).order_by("id").values_list("repetitions", "weight")), [(10, Decimal("50.00")), (8, Decimal("55.00"))])
+
+    def test_import_type_parameter_overrides_file_name(self):
+        self.client.force_authenticate(user=self.user)
+
+        content = '{"start_time": "2024-01-01", "exercise_sessions": [{"exercise": "Squat", "sets": [{"repetitions": 5, "weight": 100}]}]}\n'
+        response = self.upload("log.txt", content, type="ndjson")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["sets"], 1)
+        self.assertEqual(WorkoutSession.objects.get(user=self.user).workout.name, "Imported workout")
+
+    def test_import_with_missing_columns(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.upload("log.csv", "workout,repetitions\nPush day,10\n")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(WorkoutSession.objects.exists())
+
+    def test_import_invalid_type(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.upload("log.csv", "start_time,exercise\n", type="xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_without_file(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(self.url, {}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_number_of_queries_does_not_grow_with_the_number_of_rows(self):
+        self.client.force_authenticate(user=self.user)
+
+        def import_rows(count, day):
+            rows = "".join(f"2024-01-{day:02d}T{hour % 24:02d}:{hour // 24:02d}:00Z,Push day,Bench Press,10,{50 + hour % 10}\n" for hour in range(count))
+            with CaptureQueriesContext(connection) as context:
+                response = self.upload("log.csv", "start_time,workout,exercise,repetitions,weight\n" + rows)
+            self.assertEqual(response.data["sets"], count)
+            return len(context.captured_queries)
+
+        # Small enough for SQLite to insert the rows of every table in one query
+        self.assertEqual(import_rows(1, 1), import_rows(150, 2))
+
+    def test_unauthenticated_user_cannot_import(self):
+        response = self.upload("log.csv", "start_time,exercise\n")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
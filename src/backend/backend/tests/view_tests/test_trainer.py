@@ -1,11 +1,19 @@
 from django.urls import reverse
 from rest_framework import status
-from backend.models import Workout, WorkoutSession, ExerciseSession, Exercise, Set, UserProfile, PersonalTrainerProfile, ScheduledWorkout
+from backend.models import Workout, WorkoutSession, ExerciseSession, Exercise, Set, UserProfile, PersonalTrainerProfile, ScheduledWorkout, TrainingRollup, PersonalTrainerScheduledWorkout, RecurringScheduledWorkout, RecurringScheduledWorkoutException
 from backend.serializers import  WorkoutSessionSerializer, PersonalTrainerSerializer, UserSerializer, ScheduledWorkoutSerializer, WorkoutSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
+from backend.analytics import rebuild_rollups, week_start
+from django.core.cache import cache
+from django.utils.timezone import localdate, make_aware
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import datetime, time
+from backend.tests.helpers import ConstantQueryCountMixin, create_workouts, create_workout_sessions, read_streaming_content
 from django.utils.timezone import now
 from datetime import timedelta
+import json
 
 class TestListPersonalTrainerView(APITestCase):
     def setUp(self):
@@ -189,6 +197,305 @@ class TestListClientsView(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         
+class TestTrainerDashboardView(ConstantQueryCountMixin, APITestCase):
+    def setUp(self):
+        self.trainer = User.objects.create_user(username="testTrainer", password="password")
+        self.trainer_profile = PersonalTrainerProfile.objects.create(user=self.trainer)
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.user_profile = UserProfile.objects.create(user=self.user, personal_trainer=self.trainer_profile)
+
+        self.idle_user = User.objects.create_user(username="idleUser", password="password")
+        UserProfile.objects.create(user=self.idle_user, personal_trainer=self.trainer_profile)
+
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        self.workout.exercises.set([self.exercise])
+
+        self.url = reverse("trainer-dashboard")
+
+    def log_workout_session(self, user, days_ago, weight):
+        workout_session = WorkoutSession.objects.create(user=user, workout=self.workout)
+        exercise_session = ExerciseSession.objects.create(exercise=self.exercise, workout_session=workout_session)
+        Set.objects.create(exercise_session=exercise_session, repetitions=10, weight=weight)
+
+        # start_time is set to the current time on insert, so the rollups are rebuilt after moving the workout session back in time
+        WorkoutSession.objects.filter(id=workout_session.id).update(start_time=now() - timedelta(days=days_ago))
+        rebuild_rollups(user.id, now().date() - timedelta(days=days_ago), now().date() + timedelta(days=1))
+        return workout_session
+
+    def test_dashboard(self):
+        self.log_workout_session(self.user, 20, 40)
+        self.log_workout_session(self.user, 3, 50)
+        last_session = self.log_workout_session(self.user, 0, 60)
+        self.log_workout_session(self.user, 40, 100)
+
+        ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=now() - timedelta(days=1))
+        later = ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=now() + timedelta(days=5))
+        next_scheduled_workout = ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=now() + timedelta(days=2))
+
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([client["username"] for client in response.data], ["testUser", "idleUser"])
+
+        client = response.data[0]
+        self.assertEqual(client["last_session"]["id"], last_session.id)
+        self.assertEqual(client["last_session"]["workout_title"], "test workout")
+        self.assertEqual(client["next_scheduled_workout"]["type"], "scheduled")
+        self.assertEqual(client["next_scheduled_workout"]["id"], next_scheduled_workout.id)
+        self.assertEqual(client["next_scheduled_workout"]["workout_title"], "test workout")
+        self.assertIsNone(client["next_scheduled_workout"]["recurrence"])
+        self.assertEqual(client["sessions_last_7_days"], 2)
+        self.assertEqual(client["sessions_last_30_days"], 3)
+        self.assertEqual(client["volume_last_7_days"], "1100.00")
+        self.assertEqual(client["volume_last_30_days"], "1500.00")
+
+        idle_client = response.data[1]
+        self.assertIsNone(idle_client["last_session"])
+        self.assertIsNone(idle_client["next_scheduled_workout"])
+        self.assertEqual(idle_client["sessions_last_30_days"], 0)
+        self.assertEqual(idle_client["volume_last_30_days"], "0.00")
+
+    def test_next_scheduled_workout_includes_trainer_scheduled_workouts(self):
+        ScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, scheduled_date=now() + timedelta(days=3))
+        PersonalTrainerScheduledWorkout.objects.create(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=now() - timedelta(days=1))
+        session = PersonalTrainerScheduledWorkout.objects.create(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=now() + timedelta(days=2))
+
+        self.client.force_authenticate(user=self.trainer)
+
+        next_scheduled_workout = self.client.get(self.url).data[0]["next_scheduled_workout"]
+        self.assertEqual(next_scheduled_workout["type"], "pt_scheduled")
+        self.assertEqual(next_scheduled_workout["id"], session.id)
+        self.assertEqual(next_scheduled_workout["pt"], self.trainer.id)
+
+    def test_next_scheduled_workout_includes_recurring_workouts(self):
+        PersonalTrainerScheduledWorkout.objects.create(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=now() + timedelta(days=3))
+
+        # The first occurrence in the future is the next one, the earlier ones are in the past
+        start = now() - timedelta(days=2, hours=-1)
+        rule = RecurringScheduledWorkout.objects.create(user=self.user, pt=self.trainer, workout_template=self.workout, start=start, frequency="daily", interval=2)
+
+        self.client.force_authenticate(user=self.trainer)
+
+        next_scheduled_workout = self.client.get(self.url).data[0]["next_scheduled_workout"]
+        self.assertEqual(next_scheduled_workout["type"], "pt_scheduled")
+        self.assertIsNone(next_scheduled_workout["id"])
+        self.assertEqual(next_scheduled_workout["recurrence"], rule.id)
+        self.assertEqual(next_scheduled_workout["scheduled_date"], (start + timedelta(days=2)).isoformat().replace("+00:00", "Z"))
+
+    def test_dashboard_only_contains_own_clients(self):
+        other_trainer = User.objects.create_user(username="otherTrainer", password="password")
+        other_trainer_profile = PersonalTrainerProfile.objects.create(user=other_trainer)
+        self.user_profile.personal_trainer = other_trainer_profile
+        self.user_profile.save()
+
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.get(self.url)
+        self.assertEqual([client["id"] for client in response.data], [self.idle_user.id])
+
+    def test_dashboard_constant_number_of_queries(self):
+        trainer = User.objects.create_user(username="busyTrainer", password="password")
+        trainer_profile = PersonalTrainerProfile.objects.create(user=trainer)
+
+        def create_clients(count):
+            clients = User.objects.bulk_create([User(username=f"client {i}") for i in range(count)])
+            UserProfile.objects.bulk_create([UserProfile(user=client, personal_trainer=trainer_profile) for client in clients])
+            for client in clients:
+                create_workout_sessions(1, client, self.workout, [self.exercise])
+            ScheduledWorkout.objects.bulk_create([
+                ScheduledWorkout(user=client, workout_template=self.workout, scheduled_date=now() + timedelta(days=1)) for client in clients
+            ])
+            TrainingRollup.objects.bulk_create([
+                TrainingRollup(user=client, period="day", period_start=now().date(), muscle_category="all", session_count=1) for client in clients
+            ])
+            return clients
+
+        self.client.force_authenticate(user=trainer)
+
+        # The clients, their last workout sessions, their next scheduled workouts and workouts scheduled by the trainer,
+        # their recurring workouts and their totals. The trainer profile is already loaded on the authenticated user in the test
+        self.assertConstantQueryCount(self.url, create_clients, expected_count=6)
+
+    def test_user_that_is_not_a_trainer_cannot_see_dashboard(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class TestTrainerAdherenceView(APITestCase):
+    def setUp(self):
+        # Client ids are reused between tests, so cached reports of other tests have to be removed
+        cache.clear()
+
+        self.trainer = User.objects.create_user(username="testTrainer", password="password")
+        self.trainer_profile = PersonalTrainerProfile.objects.create(user=self.trainer)
+
+        self.user = User.objects.create_user(username="testUser", password="password")
+        UserProfile.objects.create(user=self.user, personal_trainer=self.trainer_profile)
+
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.other_workout = Workout.objects.create(name="other workout", author=self.user)
+
+        # Monday three weeks ago at noon, so both weeks in the reports are over and can be cached on any day of the week
+        self.first_week = week_start(localdate()) - timedelta(weeks=3)
+        self.monday = make_aware(datetime.combine(self.first_week, time(12)))
+
+        self.url = reverse("trainer-adherence")
+
+    def log_workout_session(self, workout, start_time):
+        workout_session = WorkoutSession.objects.create(user=self.user, workout=workout)
+        WorkoutSession.objects.filter(id=workout_session.id).update(start_time=start_time)
+        return workout_session
+
+    def schedule(self, scheduled_date, workout=None):
+        return ScheduledWorkout.objects.create(user=self.user, workout_template=workout or self.workout, scheduled_date=scheduled_date)
+
+    def get_report(self, **params):
+        self.client.force_authenticate(user=self.trainer)
+        response = self.client.get(self.url, {"start": self.first_week.isoformat(), "end": (self.first_week + timedelta(weeks=1)).isoformat(), **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_adherence(self):
+        # Completed two hours later
+        self.schedule(self.monday)
+        self.log_workout_session(self.workout, self.monday + timedelta(hours=2))
+
+        # A workout session of another workout does not count
+        missed = self.schedule(self.monday + timedelta(days=2))
+        self.log_workout_session(self.other_workout, self.monday + timedelta(days=2))
+
+        # A workout scheduled by the personal trainer completed 23 hours later
+        PersonalTrainerScheduledWorkout.objects.create(client=self.user, pt=self.trainer, workout_template=self.workout, scheduled_date=self.monday + timedelta(days=4))
+        self.log_workout_session(self.workout, self.monday + timedelta(days=4, hours=23))
+
+        # One workout session only completes one of two scheduled workouts
+        self.schedule(self.monday + timedelta(days=7))
+        self.schedule(self.monday + timedelta(days=7, hours=1))
+        self.log_workout_session(self.workout, self.monday + timedelta(days=7, minutes=30))
+
+        report = self.get_report()
+        self.assertEqual(len(report), 1)
+
+        client = report[0]
+        self.assertEqual(client["client"], self.user.id)
+        self.assertEqual((client["scheduled"], client["completed"], client["missed"]), (5, 3, 2))
+        self.assertEqual(client["adherence"], 0.6)
+
+        first_week, second_week = client["weeks"]
+        self.assertEqual(first_week["week_start"], self.first_week)
+        self.assertEqual((first_week["scheduled"], first_week["completed"]), (3, 2))
+        self.assertEqual(first_week["missed_workouts"], [
+            {"type": "scheduled", "id": missed.id, "workout_template": self.workout.id, "scheduled_date": missed.scheduled_date},
+        ])
+        self.assertEqual((second_week["scheduled"], second_week["completed"]), (2, 1))
+
+        # With a shorter tolerance the workout completed 23 hours later is missed
+        client = self.get_report(tolerance=12)[0]
+        self.assertEqual((client["scheduled"], client["completed"]), (5, 2))
+
+    def test_adherence_with_recurring_workouts(self):
+        # Every other day of the two weeks, with the first occurrence cancelled and the second moved by two days
+        rule = RecurringScheduledWorkout.objects.create(user=self.user, workout_template=self.workout, start=self.monday, frequency="weekly", weekdays="MO,WE,FR,SU")
+        RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=self.monday, cancelled=True)
+        RecurringScheduledWorkoutException.objects.create(recurring_workout=rule, occurrence=self.monday + timedelta(days=2), scheduled_date=self.monday + timedelta(days=3))
+
+        self.log_workout_session(self.workout, self.monday + timedelta(days=3, hours=1))
+        self.log_workout_session(self.workout, self.monday + timedelta(days=4))
+
+        client = self.get_report()[0]
+        self.assertEqual((client["scheduled"], client["completed"], client["missed"]), (7, 2, 5))
+
+        first_week = client["weeks"][0]
+        self.assertEqual(first_week["missed_workouts"], [
+            {"type": "recurring", "id": rule.id, "occurrence": self.monday + timedelta(days=6), "workout_template": self.workout.id, "scheduled_date": self.monday + timedelta(days=6)},
+        ])
+
+        # Changing the rule clears the cached weeks
+        rule.weekdays = "FR"
+        rule.save()
+        client = self.get_report()[0]
+        self.assertEqual((client["scheduled"], client["completed"]), (2, 1))
+
+    def test_upcoming_scheduled_workouts_are_not_missed(self):
+        # Still within the tolerance, and always in the current week
+        self.schedule(now())
+
+        self.client.force_authenticate(user=self.trainer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        client = response.data[0]
+        self.assertEqual(len(client["weeks"]), 4)
+        self.assertEqual((client["scheduled"], client["missed"], client["upcoming"]), (0, 0, 1))
+        self.assertIsNone(client["adherence"])
+
+    def test_past_weeks_are_cached_until_a_write(self):
+        self.schedule(self.monday)
+        workout_session = self.log_workout_session(self.workout, self.monday - timedelta(weeks=4))
+        self.assertEqual(self.get_report()[0]["completed"], 0)
+
+        # Only the clients are read once the weeks are cached
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_report()[0]["completed"], 0)
+
+        # Moving the workout session to the scheduled date clears the weeks around it
+        workout_session.refresh_from_db()
+        workout_session.start_time = self.monday + timedelta(hours=1)
+        workout_session.save()
+        self.assertEqual(self.get_report()[0]["completed"], 1)
+
+        # So does scheduling another workout
+        self.schedule(self.monday + timedelta(days=8))
+        client = self.get_report()[0]
+        self.assertEqual((client["completed"], client["missed"]), (1, 1))
+
+        # And deleting a workout session
+        workout_session.delete()
+        client = self.get_report()[0]
+        self.assertEqual((client["completed"], client["missed"]), (0, 2))
+
+    def test_adherence_constant_number_of_queries(self):
+        def get_report(count):
+            clients = User.objects.bulk_create([User(username=f"client {count} {i}") for i in range(count)])
+            UserProfile.objects.bulk_create([UserProfile(user=client, personal_trainer=self.trainer_profile) for client in clients])
+            ScheduledWorkout.objects.bulk_create([ScheduledWorkout(user=client, workout_template=self.workout, scheduled_date=self.monday) for client in clients])
+            WorkoutSession.objects.bulk_create([WorkoutSession(user=client, workout=self.workout) for client in clients])
+
+            with CaptureQueriesContext(connection) as context:
+                report = self.get_report(tolerance=1)
+            self.assertEqual(len(report), User.objects.filter(profile__personal_trainer=self.trainer_profile).count())
+            return len(context.captured_queries)
+
+        # The clients, the scheduled workouts, the workouts scheduled by a personal trainer, the recurring workouts and the workout sessions
+        self.assertEqual(get_report(1), 5)
+        cache.clear()
+        self.assertEqual(get_report(300), 5)
+
+    def test_invalid_parameters(self):
+        self.client.force_authenticate(user=self.trainer)
+
+        for params in ({"tolerance": "a"}, {"tolerance": "100"}, {"tolerance": "-1"}, {"tolerance": "99999999999999999999"}, {"start": "2024-02-01", "end": "2024-01-01"}, {"start": "2020-01-01", "end": "2024-01-01"}, {"start": "now"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_user_that_is_not_a_trainer_cannot_see_adherence(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unauthenticated_user_do_not_have_access(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
 class TestListScheduledWorkoutsOfClients(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testClient", password="password")
@@ -259,7 +566,7 @@ class TestListScheduledWorkoutsOfClients(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         
-class TestListWorkoutSessionsOfClientsView(APITestCase):
+class TestListWorkoutSessionsOfClientsView(ConstantQueryCountMixin, APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
         self.user_profile = UserProfile.objects.create(user=self.user)
@@ -287,6 +594,23 @@ class TestListWorkoutSessionsOfClientsView(APITestCase):
         self.url = reverse("client-workout_sessions-list", kwargs={"pk": self.user.id})
         
         self.client_workout_sessions = [self.workout_session, self.second_workout_session]
+
+    def test_list_workout_sessions_of_client_constant_number_of_queries(self):
+        client = User.objects.create_user(username="manySessionsClient", password="password")
+        UserProfile.objects.create(user=client, personal_trainer=self.trainer_profile)
+        url = reverse("client-workout_sessions-list", kwargs={"pk": client.id})
+
+        self.client.force_authenticate(user=self.trainer)
+
+        self.assertConstantQueryCount(url, lambda count: create_workout_sessions(count, client, self.workout, [self.exercise]))
+
+    def test_list_workout_sessions_of_client_paginated(self):
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.get(self.url, {"limit": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], len(self.client_workout_sessions))
+        self.assertEqual(response.data["results"], WorkoutSessionSerializer([self.workout_session], many=True).data)
     
     def test_list_workout_sessions_of_client_basic(self):
         self.client.force_authenticate(user=self.trainer)
@@ -331,7 +655,64 @@ class TestListWorkoutSessionsOfClientsView(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         
-class TestListWorkoutsOfClientsListView(APITestCase):
+class TestExportWorkoutSessionsOfClientView(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testUser", password="password")
+        self.user_profile = UserProfile.objects.create(user=self.user)
+
+        self.trainer = User.objects.create_user(username="testTrainer", password="password")
+        self.trainer_profile = PersonalTrainerProfile.objects.create(user=self.trainer)
+
+        self.user_profile.personal_trainer = self.trainer_profile
+        self.user_profile.save()
+
+        self.workout = Workout.objects.create(name="test workout", author=self.user)
+        self.exercise = Exercise.objects.create(name="Push-up", description="A classic exercise.", muscle_group="Chest")
+        self.workout.exercises.set([self.exercise])
+        create_workout_sessions(2, self.user, self.workout, [self.exercise])
+
+        self.url = reverse("client-workout_sessions-export", kwargs={"pk": self.user.id})
+
+    def test_export_workout_sessions_of_client(self):
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.get(self.url, {"type": "ndjson"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('filename="testUser-training-history.ndjson"', response["Content-Disposition"])
+
+        sessions = [json.loads(line) for line in read_streaming_content(response).decode().splitlines()]
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual([len(session["exercise_sessions"][0]["sets"]) for session in sessions], [2, 2])
+
+    def test_export_workout_sessions_of_client_with_wrong_trainer(self):
+        second_trainer = User.objects.create_user(username="secondTrainer", password="password")
+        PersonalTrainerProfile.objects.create(user=second_trainer)
+
+        self.client.force_authenticate(user=second_trainer)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_cannot_export_workout_sessions_of_other_user(self):
+        user = User.objects.create_user("someUser", password="password")
+        UserProfile.objects.create(user=user)
+
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_workout_sessions_of_non_existent_client(self):
+        self.client.force_authenticate(user=self.trainer)
+
+        response = self.client.get(reverse("client-workout_sessions-export", kwargs={"pk": 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unauthenticated_user_cannot_export(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class TestListWorkoutsOfClientsListView(ConstantQueryCountMixin, APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
         self.user_profile = UserProfile.objects.create(user=self.user)
@@ -407,4 +788,16 @@ class TestListWorkoutsOfClientsListView(APITestCase):
     def test_unauthenticated_user_do_not_have_access(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_workouts_of_client_constant_number_of_queries(self):
+        client = User.objects.create_user(username="manyWorkoutsClient", password="password")
+        UserProfile.objects.create(user=client, personal_trainer=self.trainer_profile)
+        url = reverse("client-workouts-list", kwargs={"pk": client.id})
+
+        self.client.force_authenticate(user=self.trainer)
+
+        self.assertConstantQueryCount(
+            url,
+            lambda count: create_workouts(count, client, [client], [self.first_exercise, self.second_exercise, self.third_exercise]),
+        )
         
@@ -4,6 +4,8 @@ from backend.models import UserProfile, PersonalTrainerProfile
 from backend.serializers import DefaultUserSerializer, UserSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from backend.tests.helpers import image_bytes, use_temporary_media_root
 
 class TestListUserView(APITestCase):
     def setUp(self):
@@ -169,6 +171,27 @@ class TestUpdateUserView(APITestCase):
         self.assertEqual(original_user.height, 180)
         self.assertEqual(original_user.weight, 75)
     
+    def test_update_profile_picture(self):
+        use_temporary_media_root(self)
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.patch(self.url, data={"profile.profile_picture": SimpleUploadedFile("me.png", image_bytes((400, 300)))}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["profile"]["profile_picture_variants"]), {"thumbnail", "large"})
+
+    def test_update_unreadable_profile_picture(self):
+        use_temporary_media_root(self)
+        self.client.force_authenticate(user=self.user)
+
+        # The upload is a JPEG file that is cut off, which can only be found when it is decoded to make the variants
+        data = image_bytes((800, 600), image_format="JPEG")
+        truncated = SimpleUploadedFile("me.jpg", data[:len(data) // 2], content_type="image/jpeg")
+
+        response = self.client.patch(self.url, data={"profile.profile_picture": truncated}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("profile_picture", response.data)
+        self.assertFalse(UserProfile.objects.get(id=self.user_profile.id).profile_picture)
+
     def test_update_password(self):
         self.client.force_authenticate(user=self.user)
         
@@ -4,6 +4,7 @@ from backend.models import UserProfile, PersonalTrainerProfile, Exercise, Workou
 from backend.serializers import WorkoutSerializer, ExerciseSerializer
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
+from backend.tests.helpers import ConstantQueryCountMixin, create_workouts
 
 class CreateWorkoutViewTest(APITestCase):
     def setUp(self):
@@ -122,7 +123,7 @@ class TestUpdateWorkout(APITestCase):
         response = self.client.put(self.url, data=data, format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         
-class TestListWorkout(APITestCase):
+class TestListWorkout(ConstantQueryCountMixin, APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testUser", password="password")
         self.second_user = User.objects.create_user(username="secondTestUser", password="password")
@@ -219,6 +220,17 @@ class TestListWorkout(APITestCase):
         
         self.assertEqual(len(response.data), len(self.second_user_workouts))
         self.assertEqual(response.data, serializer.data)
+
+    def test_list_workout_constant_number_of_queries(self):
+        user = User.objects.create_user(username="manyWorkoutsUser", password="password")
+        self.client.force_authenticate(user=user)
+
+        # The owners and exercises of all the workouts are prefetched, so the number of queries does not depend on the number of workouts
+        self.assertConstantQueryCount(
+            self.url,
+            lambda count: create_workouts(count, self.user, [user, self.second_user], [self.first_exercise, self.second_exercise]),
+            expected_count=3,
+        )
         
 class TestWorkoutDetail(APITestCase):
     def setUp(self):
@@ -1,7 +1,8 @@
 from django.urls import path
 from backend.views.chat import (
     ChatRoomRetrieveView, ChatRoomListView, ChatRoomCreateView, ChatRoomDeleteView,
-    ListParticipantsInChatRoomView, ListMessagesInChatRoomView, ListWorkoutMessagesInChatRoomView
+    ListParticipantsInChatRoomView, ListMessagesInChatRoomView, ListWorkoutMessagesInChatRoomView,
+    ChatRoomTimelineView
 )
 
 urlpatterns = [
@@ -12,4 +13,5 @@ urlpatterns = [
     path("<int:pk>/participants/", ListParticipantsInChatRoomView.as_view(), name="chat_room-participants"),
     path("<int:pk>/messages/", ListMessagesInChatRoomView.as_view(), name="chat_room-messages"),
     path("<int:pk>/workout_messages/", ListWorkoutMessagesInChatRoomView.as_view(), name="chat_room-workout_messages"),
+    path("<int:pk>/timeline/", ChatRoomTimelineView.as_view(), name="chat_room-timeline"),
 ]
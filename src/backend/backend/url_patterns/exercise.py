@@ -1,7 +1,9 @@
 from django.urls import path
-from backend.views.exercise import ExerciseListView, ExerciseDetailView
+from backend.views.exercise import ExerciseListView, ExerciseDetailView, ExerciseSearchView, ExerciseCatalogChangesView
 
 urlpatterns = [
     path("", ExerciseListView.as_view(), name="exercise-list"),
+    path("changes/", ExerciseCatalogChangesView.as_view(), name="exercise-changes"),
+    path("search/", ExerciseSearchView.as_view(), name="exercise-search"),
     path("<int:pk>/", ExerciseDetailView.as_view(), name="get-exercise"),
 ]
@@ -2,7 +2,9 @@ from django.urls import path
 from backend.views.schedule import (
     CreateScheduledWorkoutView, ScheduledWorkoutListView, SchedulesWorkoutDeleteView,
     CreatePersonalTrainerScheduledWorkoutView, PersonalTrainerScheduledWorkoutListView,
-    PersonalTrainerScheduledWorkoutDeleteView
+    PersonalTrainerScheduledWorkoutDeleteView, CreateRecurringScheduledWorkoutView, CreatePersonalTrainerRecurringScheduledWorkoutView,
+    RecurringScheduledWorkoutListView, RecurringScheduledWorkoutDeleteView, CreateRecurringScheduledWorkoutExceptionView, CalendarFeedView, ResetCalendarFeedView,
+    CalendarFeedDownloadView, BulkCreatePersonalTrainerScheduledWorkoutView
 )
 
 urlpatterns = [
@@ -10,6 +12,15 @@ urlpatterns = [
     path("workout/delete/<int:pk>/", SchedulesWorkoutDeleteView.as_view(), name="scheduled_workout-delete"),
     path("workout/", ScheduledWorkoutListView.as_view(), name="scheduled_workouts-list"),
     path("pt_workout/create/", CreatePersonalTrainerScheduledWorkoutView.as_view(), name="pt_scheduled_workout-create"),
+    path("pt_workout/bulk_create/", BulkCreatePersonalTrainerScheduledWorkoutView.as_view(), name="pt_scheduled_workout-bulk_create"),
     path("pt_workout/delete/<int:pk>/", PersonalTrainerScheduledWorkoutDeleteView.as_view(), name="pt_scheduled_workout-delete"),
     path("pt_workout/", PersonalTrainerScheduledWorkoutListView.as_view(), name="pt_scheduled_workouts-list"),
+    path("recurring_workout/create/", CreateRecurringScheduledWorkoutView.as_view(), name="recurring_workout-create"),
+    path("pt_recurring_workout/create/", CreatePersonalTrainerRecurringScheduledWorkoutView.as_view(), name="pt_recurring_workout-create"),
+    path("recurring_workout/delete/<int:pk>/", RecurringScheduledWorkoutDeleteView.as_view(), name="recurring_workout-delete"),
+    path("recurring_workout/<int:pk>/exception/", CreateRecurringScheduledWorkoutExceptionView.as_view(), name="recurring_workout-exception"),
+    path("recurring_workout/", RecurringScheduledWorkoutListView.as_view(), name="recurring_workouts-list"),
+    path("calendar/", CalendarFeedView.as_view(), name="calendar"),
+    path("calendar/reset/", ResetCalendarFeedView.as_view(), name="calendar-reset"),
+    path("calendar/<str:token>.ics", CalendarFeedDownloadView.as_view(), name="calendar-feed"),
 ]
@@ -1,11 +1,18 @@
 from django.urls import path
 from backend.views.session import (
-    WorkoutSessionListView, CreateWorkoutSessionView, CreateExerciseSessionView, CreateSetView
+    WorkoutSessionListView, CreateWorkoutSessionView, CreateExerciseSessionView, CreateSetView, LogWorkoutSessionView, SyncWorkoutSessionsView, TrainingRollupListView, ExerciseAnalyticsView, PersonalRecordListView, ExportWorkoutSessionsView, ImportTrainingLogView
 )
 
 urlpatterns = [
     path("workout/create/", CreateWorkoutSessionView.as_view(), name="workout_session-create"),
     path("exercise/create/", CreateExerciseSessionView.as_view(), name="exercise_session-create"),
     path("set/create/", CreateSetView.as_view(), name="set-create"),
+    path("workout/log/", LogWorkoutSessionView.as_view(), name="workout_session-log"),
+    path("sync/", SyncWorkoutSessionsView.as_view(), name="workout_session-sync"),
+    path("analytics/rollups/", TrainingRollupListView.as_view(), name="training_rollup-list"),
+    path("analytics/exercise/<int:pk>/", ExerciseAnalyticsView.as_view(), name="exercise-analytics"),
+    path("records/", PersonalRecordListView.as_view(), name="personal_record-list"),
+    path("workout/export/", ExportWorkoutSessionsView.as_view(), name="workout_session-export"),
+    path("import/", ImportTrainingLogView.as_view(), name="training_log-import"),
     path("workout/", WorkoutSessionListView.as_view(), name="workout_session-list"),
 ]
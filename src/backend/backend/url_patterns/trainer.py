@@ -1,7 +1,7 @@
 from django.urls import path
 from backend.views.trainer import (
     PersonalTrainerListView, UpdatePersonalTrainerView, PersonalTrainerDetailView, ClientsListView,
-    ListScheduledWorkoutsOfClientView, ListWorkoutSessionsOfClientsView, ListWorkoutsOfClientsListView
+    ListScheduledWorkoutsOfClientView, ListWorkoutSessionsOfClientsView, ListWorkoutsOfClientsListView, ExportWorkoutSessionsOfClientView, TrainerDashboardView, TrainerAdherenceView
 )
 
 urlpatterns = [
@@ -9,7 +9,10 @@ urlpatterns = [
     path("update/<int:pk>/", UpdatePersonalTrainerView.as_view(), name="personal_trainer-update"),
     path("<int:pk>/", PersonalTrainerDetailView.as_view(), name="personal_trainer-detail"),
     path("clients/", ClientsListView.as_view(), name="clients-list"),
+    path("dashboard/", TrainerDashboardView.as_view(), name="trainer-dashboard"),
+    path("adherence/", TrainerAdherenceView.as_view(), name="trainer-adherence"),
     path("client/<int:pk>/scheduled_workouts/", ListScheduledWorkoutsOfClientView.as_view(), name="client-scheduled_workouts-list"),
     path("client/<int:pk>/workout_sessions/", ListWorkoutSessionsOfClientsView.as_view(), name="client-workout_sessions-list"),
+    path("client/<int:pk>/workout_sessions/export/", ExportWorkoutSessionsOfClientView.as_view(), name="client-workout_sessions-export"),
     path("client/<int:pk>/workouts/", ListWorkoutsOfClientsListView.as_view(), name="client-workouts-list"),
 ]
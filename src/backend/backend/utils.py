@@ -1,6 +1,9 @@
-from django.utils.timezone import now
-from datetime import timedelta
-from .models import FailedLoginAttempt
+from django.utils.timezone import now, is_naive, make_aware
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from uuid import uuid4
+from .models import FailedLoginAttempt, ChatRoom, ExerciseCatalog
 from rest_framework.exceptions import ValidationError
 import re
 
@@ -27,7 +30,117 @@ def get_client_ip_address(request):
         return x_forwarded_for.split(",")[0]
     return request.META.get("REMOTE_ADDR", "127.0.0.1")
 
+# Chat room memberships are cached per version of the chat room. The version is replaced whenever the participants change (see signals.py),
+# which invalidates every cached membership of the chat room at once
+CHAT_ROOM_PARTICIPANT_CACHE_TIMEOUT = 60 * 60 * 24
 
+def get_chat_room_version(chat_room_id):
+    key = f"chat_room_version:{chat_room_id}"
+    version = cache.get(key)
+    
+    if version is None:
+        version = bump_chat_room_version(chat_room_id)
+    
+    return version
+
+def bump_chat_room_version(chat_room_id):
+    version = uuid4().hex
+    cache.set(f"chat_room_version:{chat_room_id}", version, CHAT_ROOM_PARTICIPANT_CACHE_TIMEOUT)
+    return version
 
+def chat_room_participant_cache_key(chat_room_id, user_id):
+    return f"chat_room_participant:{chat_room_id}:{get_chat_room_version(chat_room_id)}:{user_id}"
+
+def is_chat_room_participant(chat_room_id, user_id):
+    key = chat_room_participant_cache_key(chat_room_id, user_id)
+    is_participant = cache.get(key)
     
+    if is_participant is None:
+        is_participant = ChatRoom.participants.through.objects.filter(chatroom_id=chat_room_id, user_id=user_id).exists()
+        cache.set(key, is_participant, CHAT_ROOM_PARTICIPANT_CACHE_TIMEOUT)
     
+    return is_participant
+
+# Used when the membership is already known from another query
+def set_chat_room_participant(chat_room_id, user_id, is_participant):
+    cache.set(chat_room_participant_cache_key(chat_room_id, user_id), is_participant, CHAT_ROOM_PARTICIPANT_CACHE_TIMEOUT)
+
+# The scheduled workouts of a user are versioned like the chat rooms, the version is replaced whenever a scheduled workout that is shown
+# to the user is written (see signals.py). Used as the ETag of the calendar feed, so polls of an unchanged feed do not read the scheduled workouts
+SCHEDULE_VERSION_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+def get_schedule_version(user_id):
+    version = cache.get(f"schedule_version:{user_id}")
+
+    if version is None:
+        version = bump_schedule_versions([user_id])[user_id]
+
+    return version
+
+def bump_schedule_versions(user_ids):
+    versions = {user_id: uuid4().hex for user_id in set(user_ids) if user_id is not None}
+    cache.set_many({f"schedule_version:{user_id}": version for user_id, version in versions.items()}, SCHEDULE_VERSION_CACHE_TIMEOUT)
+    return versions
+
+# The version of the exercise catalog is kept in the cache, so that unchanged catalog responses and the search index can be checked
+# without reading the database. It is refreshed when a change to an exercise has been committed (see signals.py),
+# and expires in case a process stopped before refreshing it
+EXERCISE_CATALOG_VERSION_CACHE_TIMEOUT = 60 * 5
+
+def get_exercise_catalog_version():
+    version = cache.get("exercise_catalog_version")
+
+    if version is None:
+        version = ExerciseCatalog.current_version()
+
+        # A newer version that was refreshed in the meantime is not replaced
+        cache.add("exercise_catalog_version", version, EXERCISE_CATALOG_VERSION_CACHE_TIMEOUT)
+
+    return version
+
+# Always reads the latest committed version, so refreshes that run out of order still leave the latest version in the cache
+def refresh_exercise_catalog_version():
+    version = ExerciseCatalog.current_version()
+    cache.set("exercise_catalog_version", version, EXERCISE_CATALOG_VERSION_CACHE_TIMEOUT)
+    return version
+
+# Parse a date or datetime query parameter. A date is the start of that day, or the start of the next day when end_of_day is set
+def parse_date_parameter(value, name, end_of_day=False):
+    try:
+        # parse_datetime also accepts plain dates, so dates have to be checked first
+        date = parse_date(value)
+        if date is not None:
+            if end_of_day:
+                date += timedelta(days=1)
+            parsed = datetime.combine(date, time.min)
+        else:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError
+    except ValueError:
+        raise ValidationError(f"{name} must be a date or a datetime")
+
+    return make_aware(parsed) if is_naive(parsed) else parsed
+
+# The ?start= and ?end= query parameters as datetimes, both are optional and None when they are not given.
+# Start is inclusive and end is exclusive, except when end is a date, in which case the whole day is included
+def parse_date_range(params):
+    start = params.get("start")
+    end = params.get("end")
+
+    return (
+        parse_date_parameter(start, "start") if start else None,
+        parse_date_parameter(end, "end", end_of_day=True) if end else None,
+    )
+
+# Filter a queryset on a range from parse_date_range
+def filter_by_range(queryset, field, start, end):
+    if start is not None:
+        queryset = queryset.filter(**{f"{field}__gte": start})
+    if end is not None:
+        queryset = queryset.filter(**{f"{field}__lt": end})
+    return queryset
+
+# Filter a queryset on the ?start= and ?end= query parameters, see parse_date_range
+def filter_by_date_range(queryset, params, field):
+    return filter_by_range(queryset, field, *parse_date_range(params))
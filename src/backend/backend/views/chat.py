@@ -1,9 +1,12 @@
 from backend.models import ChatRoom, Message, WorkoutMessage
-from backend.serializers import ChatRoomSerializer, DefaultUserSerializer, MessageSerializer, WorkoutMessageSerializer
+from backend.serializers import ChatRoomSerializer, DefaultUserSerializer, MessageSerializer, WorkoutMessageSerializer, WorkoutSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics, serializers, status
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.contrib.auth.models import User
+from backend.utils import is_chat_room_participant
+from backend.pagination import MessageCursorPagination, TimelineCursorPagination
 
 class ChatRoomCreateView(generics.CreateAPIView):
     serializer_class = ChatRoomSerializer
@@ -55,28 +58,29 @@ class ListParticipantsInChatRoomView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         chat_room_id = self.kwargs["pk"]
-        chat_room_object = get_object_or_404(ChatRoom, id=chat_room_id)
         
         # The user have to be a part of the chat room in order to get the participants
-        if not chat_room_object.participants.filter(id=user.id).exists():
-                    raise serializers.ValidationError("Cannot request participants of a chat room that you are not a part of")
+        if not is_chat_room_participant(chat_room_id, user.id):
+            get_object_or_404(ChatRoom, id=chat_room_id)
+            raise serializers.ValidationError("Cannot request participants of a chat room that you are not a part of")
         
-        return chat_room_object.participants.all()
+        return User.objects.filter(chatroom=chat_room_id)
 
 class ListMessagesInChatRoomView(generics.ListAPIView):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MessageCursorPagination
     
     def get_queryset(self):
         user = self.request.user
         chat_room_id = self.kwargs["pk"]
-        chat_room_object = get_object_or_404(ChatRoom, id=chat_room_id)
         
         # The user have to be a part of the chat room in order to get the messages
-        if not chat_room_object.participants.filter(id=user.id).exists():
-                    raise serializers.ValidationError("Cannot request messages of a chat room that you are not a part of")
+        if not is_chat_room_participant(chat_room_id, user.id):
+            get_object_or_404(ChatRoom, id=chat_room_id)
+            raise serializers.ValidationError("Cannot request messages of a chat room that you are not a part of")
         
-        return Message.objects.filter(chat_room=chat_room_id)
+        return Message.objects.filter(chat_room=chat_room_id).order_by("date_sent", "id")
 
 class ListWorkoutMessagesInChatRoomView(generics.ListAPIView):
     serializer_class = WorkoutMessageSerializer
@@ -85,10 +89,38 @@ class ListWorkoutMessagesInChatRoomView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         chat_room_id = self.kwargs["pk"]
-        chat_room_object = get_object_or_404(ChatRoom, id=chat_room_id)
 
-        if not chat_room_object.participants.filter(id=user.id).exists():
+        # A chat room that does not exist is reported as not found
+        if not is_chat_room_participant(chat_room_id, user.id):
+            get_object_or_404(ChatRoom, id=chat_room_id)
             raise serializers.ValidationError("Cannot request workout messages of a chat room that you are not a part of")
         
-        return WorkoutMessage.objects.filter(chat_room=chat_room_id)
+        queryset = WorkoutMessage.objects.filter(chat_room=chat_room_id).select_related("workout")
+        return WorkoutSerializer.prefetch_related(queryset, prefix="workout__")
     
+
+class ChatRoomTimelineView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = TimelineCursorPagination
+    
+    # Messages and workout messages of a chat room merged into one timeline, ordered by when they were sent
+    def get(self, request, *args, **kwargs):
+        user = self.request.user
+        chat_room_id = self.kwargs["pk"]
+        
+        if not is_chat_room_participant(chat_room_id, user.id):
+            get_object_or_404(ChatRoom, id=chat_room_id)
+            raise serializers.ValidationError("Cannot request the timeline of a chat room that you are not a part of")
+        
+        # The workouts of a page are fetched in one batch, instead of two queries for the owners and exercises of every workout
+        querysets = {
+            "message": Message.objects.filter(chat_room=chat_room_id),
+            "workout": WorkoutSerializer.prefetch_related(WorkoutMessage.objects.filter(chat_room=chat_room_id).select_related("workout"), prefix="workout__"),
+        }
+        
+        page = self.paginator.paginate_querysets(querysets, request)
+        
+        serializer_classes = {"message": MessageSerializer, "workout": WorkoutMessageSerializer}
+        data = [{"type": kind, **serializer_classes[kind](item).data} for kind, item in page]
+        
+        return self.get_paginated_response(data)
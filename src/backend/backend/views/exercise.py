@@ -1,8 +1,12 @@
 from backend.models import Exercise
-from backend.serializers import ExerciseSerializer
+from backend.serializers import ExerciseSerializer, ExerciseSearchResultSerializer
+from backend.search import DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS, search_exercises
+from backend.catalog import build_exercise_detail, build_exercise_list, catalog_changes, catalog_response
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import generics
+from rest_framework import generics, serializers
 
+# The catalog responses are cached per version of the catalog, with the version as ETag. See catalog.py
 class ExerciseDetailView(generics.RetrieveAPIView):
     serializer_class = ExerciseSerializer
     permission_classes = [IsAuthenticated]
@@ -10,10 +14,58 @@ class ExerciseDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return Exercise.objects.all()
 
+    def retrieve(self, request, *args, **kwargs):
+        return catalog_response(request, f"detail:{self.kwargs['pk']}", lambda: build_exercise_detail(request, self.kwargs["pk"]))
+
 class ExerciseListView(generics.ListAPIView):
     serializer_class = ExerciseSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return Exercise.objects.all()
-    
+
+    def list(self, request, *args, **kwargs):
+        return catalog_response(request, "list", lambda: build_exercise_list(request))
+
+# The exercises that changed since ?since=, the version of the catalog the app has from the ETag or a previous response.
+# Responds with the changed exercises, the ids of the deleted exercises and the version to use the next time
+class ExerciseCatalogChangesView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            since = int(request.query_params["since"])
+        except (KeyError, ValueError):
+            raise serializers.ValidationError("Since must be a version of the catalog")
+
+        if since < 0:
+            raise serializers.ValidationError("Since must be a version of the catalog")
+
+        return Response(catalog_changes(request, since))
+
+# Searches the exercise catalog for ?q=, matching words exactly, as prefixes and with typos in the name, muscle group and description.
+# Best matches first, supports ?muscle_category= and ?limit= (20 by default). See search.py
+class ExerciseSearchView(generics.ListAPIView):
+    serializer_class = ExerciseSearchResultSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        params = self.request.query_params
+
+        text = params.get("q", "").strip()
+        if not text:
+            raise serializers.ValidationError("q is required")
+
+        muscle_category = params.get("muscle_category") or None
+        if muscle_category is not None and muscle_category not in dict(Exercise.MUSCLE_CATEGORIES):
+            raise serializers.ValidationError("Unknown muscle category")
+
+        try:
+            limit = int(params.get("limit", DEFAULT_SEARCH_RESULTS))
+        except ValueError:
+            raise serializers.ValidationError("Limit must be an integer")
+
+        if limit < 1 or limit > MAX_SEARCH_RESULTS:
+            raise serializers.ValidationError(f"Limit must be between 1 and {MAX_SEARCH_RESULTS}")
+
+        return search_exercises(text, muscle_category, limit)
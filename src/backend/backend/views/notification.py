@@ -1,5 +1,5 @@
 from backend.models import Notification
-from backend.serializers import NotificationSerializer
+from backend.serializers import NotificationSerializer, WorkoutSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics
 
@@ -10,7 +10,8 @@ class NotificationListView(generics.ListAPIView):
      # Get all notifications related to the current user
      def get_queryset(self):
          user = self.request.user
-         return Notification.objects.filter(user=user).order_by("-date_sent")
+         queryset = Notification.objects.filter(user=user).select_related("workout_message").order_by("-date_sent")
+         return WorkoutSerializer.prefetch_related(queryset, prefix="workout_message__")
      
 class NotificationDeleteView(generics.DestroyAPIView):
      serializer_class = NotificationSerializer
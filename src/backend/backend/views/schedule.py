@@ -1,7 +1,18 @@
-from backend.models import PersonalTrainerScheduledWorkout, ScheduledWorkout
-from backend.serializers import ScheduledWorkoutSerializer, PersonalTrainerScheduledWorkoutSerializer
-from rest_framework.permissions import IsAuthenticated
-from rest_framework import generics, serializers
+from backend.models import PersonalTrainerScheduledWorkout, ScheduledWorkout, RecurringScheduledWorkout, CalendarFeed, generate_calendar_token
+from backend.serializers import (
+    ScheduledWorkoutSerializer, PersonalTrainerScheduledWorkoutSerializer, RecurringScheduledWorkoutSerializer,
+    PersonalTrainerRecurringScheduledWorkoutSerializer, RecurringScheduledWorkoutExceptionSerializer, CalendarFeedSerializer,
+    BulkPersonalTrainerScheduledWorkoutSerializer
+)
+from backend.ical import calendar_feed_response
+from backend.recurrence import expand, recurrence_window, rules_in_range
+from backend.utils import filter_by_range, parse_date_range
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import generics, serializers, status
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.db.models import Q
 
 class CreateScheduledWorkoutView(generics.CreateAPIView):
      serializer_class = ScheduledWorkoutSerializer
@@ -18,12 +29,35 @@ class SchedulesWorkoutDeleteView(generics.DestroyAPIView):
         user = self.request.user
         return ScheduledWorkout.objects.filter(user=user)
 
+# The occurrences of recurring workouts as scheduled workouts that are not saved, sorted on the scheduled date together with the saved ones
+def with_occurrences(scheduled_workouts, occurrences, create_occurrence):
+    for rule, occurrence, scheduled_date, workout_template in occurrences:
+        scheduled_workout = create_occurrence(rule, scheduled_date, workout_template)
+        scheduled_workout.recurrence_id = rule.id
+        scheduled_workout.occurrence = occurrence
+        scheduled_workouts.append(scheduled_workout)
+
+    return sorted(scheduled_workouts, key=lambda scheduled_workout: scheduled_workout.scheduled_date)
+
 class ScheduledWorkoutListView(generics.ListAPIView):
     serializer_class = ScheduledWorkoutSerializer
     permission_classes = [IsAuthenticated]
      
+    # Supports ?start= and ?end= on the scheduled date. The recurring workouts are expanded in the same range,
+    # which is completed and limited by recurrence_window since they can repeat forever
     def get_queryset(self):
-        return ScheduledWorkout.objects.filter(user=self.request.user)
+        user = self.request.user
+        start, end = parse_date_range(self.request.query_params)
+        recurrence_start, recurrence_end = recurrence_window(start, end)
+
+        scheduled_workouts = list(filter_by_range(ScheduledWorkout.objects.filter(user=user), "scheduled_date", start, end).select_related("workout_template"))
+        rules = rules_in_range(RecurringScheduledWorkout.objects.filter(user=user, pt__isnull=True), recurrence_start, recurrence_end)
+
+        return with_occurrences(
+            scheduled_workouts,
+            expand(rules, recurrence_start, recurrence_end),
+            lambda rule, scheduled_date, workout_template: ScheduledWorkout(user_id=rule.user_id, workout_template=workout_template, scheduled_date=scheduled_date),
+        )
 
 class CreatePersonalTrainerScheduledWorkoutView(generics.CreateAPIView):
     serializer_class = PersonalTrainerScheduledWorkoutSerializer
@@ -47,20 +81,49 @@ class CreatePersonalTrainerScheduledWorkoutView(generics.CreateAPIView):
         
         serializer.save(pt=self.request.user)
 
+# Schedules one workout for many clients of the personal trainer at once, given as a list of clients and dates.
+# Either every workout is scheduled or none are, and the response has the scheduled workouts in the order of the list
+class BulkCreatePersonalTrainerScheduledWorkoutView(generics.GenericAPIView):
+    serializer_class = BulkPersonalTrainerScheduledWorkoutSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        scheduled_workouts = serializer.save()
+
+        return Response(PersonalTrainerScheduledWorkoutSerializer(scheduled_workouts, many=True).data, status=status.HTTP_201_CREATED)
+
 class PersonalTrainerScheduledWorkoutListView(generics.ListAPIView):
     serializer_class = PersonalTrainerScheduledWorkoutSerializer
     permission_classes = [IsAuthenticated]
      
-    # Fetch all PersonalTrainerScheduledWorkout objects where the current user is involved
+    # Fetch all PersonalTrainerScheduledWorkout objects where the current user is involved, together with the occurrences
+    # of the recurring workouts scheduled by a personal trainer. Supports ?start= and ?end= like ScheduledWorkoutListView
     def get_queryset(self):
         user = self.request.user
+        start, end = parse_date_range(self.request.query_params)
+        recurrence_start, recurrence_end = recurrence_window(start, end)
         
         # Check if the user is a normal user or a personal trainer
         if hasattr(user, "profile"):
-            return PersonalTrainerScheduledWorkout.objects.filter(client=user)
+            queryset = PersonalTrainerScheduledWorkout.objects.filter(client=user)
+            rules = RecurringScheduledWorkout.objects.filter(user=user, pt__isnull=False)
         
         elif hasattr(user, "trainer_profile"):
-            return PersonalTrainerScheduledWorkout.objects.filter(pt=user)
+            queryset = PersonalTrainerScheduledWorkout.objects.filter(pt=user)
+            rules = RecurringScheduledWorkout.objects.filter(pt=user)
+
+        else:
+            return []
+
+        return with_occurrences(
+            list(filter_by_range(queryset, "scheduled_date", start, end).select_related("workout_template")),
+            expand(rules_in_range(rules, recurrence_start, recurrence_end), recurrence_start, recurrence_end),
+            lambda rule, scheduled_date, workout_template: PersonalTrainerScheduledWorkout(
+                client_id=rule.user_id, pt_id=rule.pt_id, workout_template=workout_template, scheduled_date=scheduled_date
+            ),
+        )
 
 class PersonalTrainerScheduledWorkoutDeleteView(generics.DestroyAPIView):
     serializer_class = PersonalTrainerScheduledWorkoutSerializer
@@ -71,3 +134,100 @@ class PersonalTrainerScheduledWorkoutDeleteView(generics.DestroyAPIView):
         # Only the pt can delete pt scheduled workout sessions
         return PersonalTrainerScheduledWorkout.objects.filter(pt=user)
 
+class CreateRecurringScheduledWorkoutView(generics.CreateAPIView):
+    serializer_class = RecurringScheduledWorkoutSerializer
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+# Same checks as for the workouts that a personal trainer schedules one at a time
+class CreatePersonalTrainerRecurringScheduledWorkoutView(generics.CreateAPIView):
+    serializer_class = PersonalTrainerRecurringScheduledWorkoutSerializer
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        trainer = self.request.user
+
+        if not hasattr(trainer, "trainer_profile"):
+            raise serializers.ValidationError("PT is not a personal trainer")
+
+        client = serializer.validated_data.get("user")
+
+        if not hasattr(client, "profile"):
+            raise serializers.ValidationError("Client is not a user")
+
+        if not client.profile.personal_trainer == trainer.trainer_profile:
+            raise serializers.ValidationError("Client does not have this pt as its personal trainer")
+
+        serializer.save(pt=trainer)
+
+# The recurring workouts that the user has scheduled, that their personal trainer has scheduled for them, or that they have scheduled as a personal trainer
+class RecurringScheduledWorkoutListView(generics.ListAPIView):
+    serializer_class = RecurringScheduledWorkoutSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        return (
+            RecurringScheduledWorkout.objects.filter(Q(user=user) | Q(pt=user))
+            .select_related("workout_template")
+            .prefetch_related("exceptions")
+            .order_by("start", "id")
+        )
+
+# Recurring workouts scheduled by a personal trainer can only be changed by the personal trainer
+def editable_recurring_workouts(user):
+    return RecurringScheduledWorkout.objects.filter(Q(user=user, pt__isnull=True) | Q(pt=user))
+
+class RecurringScheduledWorkoutDeleteView(generics.DestroyAPIView):
+    serializer_class = RecurringScheduledWorkoutSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return editable_recurring_workouts(self.request.user)
+
+# Cancels, moves or changes the workout of one occurrence of a recurring workout
+class CreateRecurringScheduledWorkoutExceptionView(generics.CreateAPIView):
+    serializer_class = RecurringScheduledWorkoutExceptionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["recurring_workout"] = get_object_or_404(editable_recurring_workouts(self.request.user), id=self.kwargs["pk"])
+        return context
+
+# The address of the calendar feed of the user, created the first time it is requested
+class CalendarFeedView(generics.RetrieveAPIView):
+    serializer_class = CalendarFeedSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        feed, _ = CalendarFeed.objects.get_or_create(user=self.request.user)
+        return feed
+
+# Replaces the token of the calendar feed, so the old address stops working
+class ResetCalendarFeedView(generics.GenericAPIView):
+    serializer_class = CalendarFeedSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+        if not created:
+            feed.token = generate_calendar_token()
+            feed.save(update_fields=["token"])
+
+        return Response(self.get_serializer(feed).data)
+
+# The scheduled workouts of the user as an iCalendar file for calendar apps, authenticated by the token in the address instead of a JWT.
+# Supports ?start= and ?end=, see ical.py
+class CalendarFeedDownloadView(generics.GenericAPIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        user_id = CalendarFeed.objects.filter(token=token).values_list("user_id", flat=True).first()
+        if user_id is None:
+            raise Http404
+
+        return calendar_feed_response(request, user_id)
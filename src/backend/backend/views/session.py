@@ -1,7 +1,16 @@
-from backend.models import WorkoutSession
-from backend.serializers import WorkoutSessionSerializer, ExerciseSessionSerializer, SetSerializer
+from backend.models import WorkoutSession, TrainingRollup, Exercise, PersonalRecord
+from backend.serializers import WorkoutSessionSerializer, ExerciseSessionSerializer, SetSerializer, WorkoutSessionLogSerializer, WorkoutSessionSyncSerializer, TrainingRollupSerializer, PersonalRecordSerializer
 from rest_framework.permissions import IsAuthenticated
+from backend.pagination import WorkoutSessionPagination
+from backend.utils import filter_by_date_range
+from backend.analytics import exercise_progression, load_exercise_history
+from backend.exports import training_history_response
+from backend.imports import guess_import_type, import_training_log
+from io import TextIOWrapper
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, serializers
+from rest_framework.response import Response
+from django.db import transaction
 
 
 class CreateWorkoutSessionView(generics.CreateAPIView):
@@ -33,11 +42,115 @@ class CreateSetView(generics.CreateAPIView):
     serializer_class = SetSerializer
     permission_classes = [IsAuthenticated]
 
+    # The training rollups and personal records are updated when the set is saved, and have to be committed together with it
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+# Logs a whole workout session with its exercise sessions and sets in one request, instead of one request per exercise session and set
+class LogWorkoutSessionView(generics.CreateAPIView):
+    serializer_class = WorkoutSessionLogSerializer
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+# Applies a batch of workout sessions, exercise sessions and sets that were logged while the app was offline.
+# Responds with the ids of the objects of every operation in the batch, so the app can replace its local ids
+class SyncWorkoutSessionsView(generics.GenericAPIView):
+    serializer_class = WorkoutSessionSyncSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
 class WorkoutSessionListView(generics.ListAPIView):
     serializer_class = WorkoutSessionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = WorkoutSessionPagination
     
+    # Supports ?start= and ?end= on the start time, and ?limit= and ?offset= for pagination
+    def get_queryset(self):
+        queryset = filter_by_date_range(WorkoutSession.objects.filter(user=self.request.user), self.request.query_params, "start_time")
+        return WorkoutSessionSerializer.prefetch_related(queryset.order_by("start_time", "id"))
+
+# Training totals of the user per day or week and muscle category, read from the rollups in one query.
+# Supports ?period=day|week (week by default), ?muscle_category= and ?start= and ?end= on the start of the period
+class TrainingRollupListView(generics.ListAPIView):
+    serializer_class = TrainingRollupSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        period = params.get("period", "week")
+
+        if period not in dict(TrainingRollup.PERIODS):
+            raise serializers.ValidationError("Period must be day or week")
+
+        queryset = TrainingRollup.objects.filter(user=self.request.user, period=period)
+        if "muscle_category" in params:
+            queryset = queryset.filter(muscle_category=params["muscle_category"])
+
+        return filter_by_date_range(queryset, params, "period_start").order_by("period_start", "muscle_category")
+
+# Estimated one repetition max, volume and progression of the user for an exercise, computed from the sets in one query.
+# Supports ?window= for the number of days in the rolling volume, 28 by default
+class ExerciseAnalyticsView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        exercise = get_object_or_404(Exercise, id=pk)
+
+        try:
+            window_days = int(request.query_params.get("window", 28))
+        except ValueError:
+            raise serializers.ValidationError("Window must be an integer")
+
+        if window_days < 1:
+            raise serializers.ValidationError("Window must be positive")
+
+        progression = exercise_progression(load_exercise_history(request.user.id, exercise.id), window_days)
+        return Response({"exercise": exercise.id, "window": window_days, **progression})
+
+# Personal records of the user for every exercise they have lifted weights in, supports ?exercise= for a single exercise
+class PersonalRecordListView(generics.ListAPIView):
+    serializer_class = PersonalRecordSerializer
+    permission_classes = [IsAuthenticated]
+
     def get_queryset(self):
-        return WorkoutSession.objects.filter(user=self.request.user)
+        queryset = PersonalRecord.objects.filter(user=self.request.user).order_by("exercise_id")
+
+        exercise_id = self.request.query_params.get("exercise")
+        if exercise_id is not None:
+            if not exercise_id.isdigit():
+                raise serializers.ValidationError("Exercise must be an id")
+            queryset = queryset.filter(exercise_id=exercise_id)
+
+        return queryset
+
+# Streams the full training history of the user as a file download, one row per set.
+# Supports ?type=csv|ndjson, csv by default
+class ExportWorkoutSessionsView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return training_history_response(request, request.user)
+
+# Imports a training log exported from another app, uploaded as a file in the field "file".
+# Supports ?type=csv|ndjson, otherwise the type is taken from the file name. See imports.py for the format.
+# Rows that cannot be imported are listed in the response with their line, the rest of the file is still imported
+class ImportTrainingLogView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise serializers.ValidationError("A file is required")
 
+        import_type = request.query_params.get("type") or guess_import_type(upload.name)
 
+        # Bytes that are not valid UTF-8 are replaced, so the rows they are in are reported instead of stopping the import
+        lines = TextIOWrapper(upload.file, encoding="utf-8-sig", errors="replace", newline="")
+        return Response(import_training_log(request.user, lines, import_type))
@@ -1,9 +1,21 @@
 from django.contrib.auth.models import User
-from backend.models import ScheduledWorkout, WorkoutSession, Workout
-from backend.serializers import PersonalTrainerSerializer, ScheduledWorkoutSerializer, UserSerializer, WorkoutSessionSerializer, WorkoutSerializer
+from backend.models import ScheduledWorkout, PersonalTrainerScheduledWorkout, RecurringScheduledWorkout, WorkoutSession, Workout, TrainingRollup
+from backend.serializers import PersonalTrainerSerializer, ScheduledWorkoutSerializer, UserSerializer, WorkoutSessionSerializer, WorkoutSerializer, TrainerDashboardClientSerializer
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils.timezone import localdate, now
+from datetime import timedelta
+from decimal import Decimal
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics, serializers
 from django.shortcuts import get_object_or_404
+from backend.pagination import WorkoutSessionPagination
+from backend.utils import filter_by_date_range
+from backend.exports import training_history_response
+from backend.adherence import DEFAULT_ADHERENCE_TOLERANCE, MAX_ADHERENCE_TOLERANCE, compute_adherence
+from backend.analytics import week_start
+from backend.recurrence import DEFAULT_RECURRENCE_WINDOW, expand, rules_in_range
+from backend.utils import parse_date_parameter
+from rest_framework.response import Response
 
 class PersonalTrainerListView(generics.ListAPIView):
     serializer_class = PersonalTrainerSerializer
@@ -36,6 +48,152 @@ class ClientsListView(generics.ListAPIView):
         #  Retrieve all user profiles where personal_trainer is the current user's trainer profile
         return User.objects.filter(profile__personal_trainer__user=trainer)
 
+# Overview of every client of the trainer: their last workout session, next scheduled workout, and the number of workout sessions
+# and volume of the last 7 and 30 days (today included). The next scheduled workout is the first of the workouts the client scheduled,
+# the workouts scheduled by a personal trainer and the occurrences of recurring workouts.
+# Uses seven queries no matter how many clients the trainer has, and up to two more for the exceptions of recurring workouts
+class TrainerDashboardView(generics.ListAPIView):
+    serializer_class = TrainerDashboardClientSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        trainer = self.request.user
+
+        if not hasattr(trainer, "trainer_profile"):
+            raise serializers.ValidationError("You are not a personal trainer")
+
+        # The ids of the last workout session and next scheduled workouts are found with the (user, date) indexes.
+        # The objects are then loaded with the clients as a subquery, instead of a list of ids that grows with the number of clients
+        current_time = now()
+        clients_queryset = User.objects.filter(profile__personal_trainer=trainer.trainer_profile).annotate(
+            last_session_id=Subquery(WorkoutSession.objects.filter(user=OuterRef("pk")).order_by("-start_time", "-id").values("id")[:1]),
+            next_scheduled_workout_id=Subquery(
+                ScheduledWorkout.objects.filter(user=OuterRef("pk"), scheduled_date__gte=current_time).order_by("scheduled_date", "id").values("id")[:1]
+            ),
+            next_pt_scheduled_workout_id=Subquery(
+                PersonalTrainerScheduledWorkout.objects.filter(client=OuterRef("pk"), scheduled_date__gte=current_time).order_by("scheduled_date", "id").values("id")[:1]
+            ),
+        )
+        clients = list(clients_queryset.order_by("id"))
+
+        last_sessions = {
+            workout_session.id: workout_session
+            for workout_session in WorkoutSession.objects.select_related("workout").filter(id__in=clients_queryset.values("last_session_id"))
+        }
+        next_scheduled_workouts = {
+            scheduled_workout.id: scheduled_workout
+            for scheduled_workout in ScheduledWorkout.objects.select_related("workout_template").filter(id__in=clients_queryset.values("next_scheduled_workout_id"))
+        }
+        next_pt_scheduled_workouts = {
+            scheduled_workout.id: scheduled_workout
+            for scheduled_workout in PersonalTrainerScheduledWorkout.objects.select_related("workout_template").filter(
+                id__in=clients_queryset.values("next_pt_scheduled_workout_id")
+            )
+        }
+
+        # The first occurrence of the recurring workouts of every client, in the same range as the lists of scheduled workouts use by default.
+        # The occurrences are sorted on the scheduled date, and are not saved like in the lists
+        end = current_time + DEFAULT_RECURRENCE_WINDOW
+        rules = rules_in_range(RecurringScheduledWorkout.objects.filter(user__profile__personal_trainer=trainer.trainer_profile), current_time, end)
+        next_occurrences = {}
+        for rule, occurrence, scheduled_date, workout_template in expand(rules, current_time, end):
+            if rule.user_id in next_occurrences:
+                continue
+
+            if rule.pt_id is None:
+                scheduled_workout = ScheduledWorkout(user_id=rule.user_id, workout_template=workout_template, scheduled_date=scheduled_date)
+            else:
+                scheduled_workout = PersonalTrainerScheduledWorkout(client_id=rule.user_id, pt_id=rule.pt_id, workout_template=workout_template, scheduled_date=scheduled_date)
+            scheduled_workout.recurrence_id = rule.id
+            scheduled_workout.occurrence = occurrence
+            next_occurrences[rule.user_id] = scheduled_workout
+
+        # The totals are summed from the daily training rollups, instead of from the sets
+        today = localdate()
+        last_week = today - timedelta(days=6)
+        totals = {
+            row["user_id"]: row
+            for row in TrainingRollup.objects.filter(
+                user__profile__personal_trainer=trainer.trainer_profile,
+                period="day",
+                muscle_category=TrainingRollup.ALL_MUSCLE_CATEGORIES,
+                period_start__gte=today - timedelta(days=29),
+                period_start__lte=today,
+            )
+            .values("user_id")
+            .annotate(
+                sessions_last_7_days=Sum("session_count", filter=Q(period_start__gte=last_week)),
+                sessions_last_30_days=Sum("session_count"),
+                volume_last_7_days=Sum("volume", filter=Q(period_start__gte=last_week)),
+                volume_last_30_days=Sum("volume"),
+            )
+            .order_by()
+        }
+
+        for client in clients:
+            client.last_session = last_sessions.get(client.last_session_id)
+            client.next_scheduled_workout = min(
+                (
+                    scheduled_workout
+                    for scheduled_workout in (
+                        next_scheduled_workouts.get(client.next_scheduled_workout_id),
+                        next_pt_scheduled_workouts.get(client.next_pt_scheduled_workout_id),
+                        next_occurrences.get(client.id),
+                    )
+                    if scheduled_workout is not None
+                ),
+                key=lambda scheduled_workout: scheduled_workout.scheduled_date,
+                default=None,
+            )
+
+            client_totals = totals.get(client.id, {})
+            client.sessions_last_7_days = client_totals.get("sessions_last_7_days") or 0
+            client.sessions_last_30_days = client_totals.get("sessions_last_30_days") or 0
+            client.volume_last_7_days = client_totals.get("volume_last_7_days") or Decimal("0.00")
+            client.volume_last_30_days = client_totals.get("volume_last_30_days") or Decimal("0.00")
+
+        return clients
+
+# Longest range of an adherence report
+MAX_ADHERENCE_WEEKS = 53
+
+# How well every client of the trainer has kept to their scheduled workouts and the workouts scheduled by a personal trainer, per week.
+# Supports ?start= and ?end= for the range, which is extended to whole weeks and is the last four weeks by default,
+# and ?tolerance= for the number of hours a workout session can be before or after the scheduled date, 24 by default
+class TrainerAdherenceView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        trainer = request.user
+
+        if not hasattr(trainer, "trainer_profile"):
+            raise serializers.ValidationError("You are not a personal trainer")
+
+        params = request.query_params
+        last_week = week_start(parse_date_parameter(params["end"], "end").date() if params.get("end") else localdate())
+        first_week = week_start(parse_date_parameter(params["start"], "start").date()) if params.get("start") else last_week - timedelta(weeks=3)
+
+        if first_week > last_week:
+            raise serializers.ValidationError("Start must be before end")
+        if (last_week - first_week).days // 7 >= MAX_ADHERENCE_WEEKS:
+            raise serializers.ValidationError(f"The range can be at most {MAX_ADHERENCE_WEEKS} weeks")
+
+        tolerance = DEFAULT_ADHERENCE_TOLERANCE
+        if params.get("tolerance"):
+            try:
+                hours = int(params["tolerance"])
+            except ValueError:
+                raise serializers.ValidationError("Tolerance must be an integer")
+
+            # Checked before making the timedelta, which overflows for very large numbers
+            max_hours = int(MAX_ADHERENCE_TOLERANCE.total_seconds()) // 3600
+            if not 0 <= hours <= max_hours:
+                raise serializers.ValidationError(f"Tolerance must be between 0 and {max_hours} hours")
+            tolerance = timedelta(hours=hours)
+
+        clients = User.objects.filter(profile__personal_trainer=trainer.trainer_profile).order_by("id")
+        return Response(compute_adherence(list(clients), first_week, last_week, tolerance))
+
 class ListScheduledWorkoutsOfClientView(generics.ListAPIView):
     serializer_class = ScheduledWorkoutSerializer
     permission_classes = [IsAuthenticated]
@@ -55,6 +213,7 @@ class ListScheduledWorkoutsOfClientView(generics.ListAPIView):
 class ListWorkoutSessionsOfClientsView(generics.ListAPIView):
     serializer_class = WorkoutSessionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = WorkoutSessionPagination
     
     def get_queryset(self):
         client_id = self.kwargs["pk"]
@@ -65,7 +224,23 @@ class ListWorkoutSessionsOfClientsView(generics.ListAPIView):
         if not hasattr(trainer, "trainer_profile") or not client.profile.personal_trainer == trainer.trainer_profile:
             raise serializers.ValidationError("You are not the personal trainer for this user")
 
-        return WorkoutSession.objects.filter(user=client)   
+        # Same filtering and pagination as the workout sessions of the user
+        queryset = filter_by_date_range(WorkoutSession.objects.filter(user=client), self.request.query_params, "start_time")
+        return WorkoutSessionSerializer.prefetch_related(queryset.order_by("start_time", "id"))
+
+# Same export as the user gets of their own training history
+class ExportWorkoutSessionsOfClientView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        client = get_object_or_404(User, id=pk)
+
+        trainer = request.user
+
+        if not hasattr(trainer, "trainer_profile") or not client.profile.personal_trainer == trainer.trainer_profile:
+            raise serializers.ValidationError("You are not the personal trainer for this user")
+
+        return training_history_response(request, client)
 
 class ListWorkoutsOfClientsListView(generics.ListAPIView):
     serializer_class = WorkoutSerializer
@@ -80,5 +255,5 @@ class ListWorkoutsOfClientsListView(generics.ListAPIView):
         if not hasattr(trainer, "trainer_profile") or not client.profile.personal_trainer == trainer.trainer_profile:
             raise serializers.ValidationError("You are not the personal trainer for this user")
         
-        return Workout.objects.filter(owners=client)
+        return WorkoutSerializer.prefetch_related(Workout.objects.filter(owners=client))
 
@@ -35,7 +35,7 @@ class WorkoutListView(generics.ListAPIView):
     # Get all workouts related to the current user
     def get_queryset(self):
         user = self.request.user
-        return Workout.objects.filter(owners=user)
+        return WorkoutSerializer.prefetch_related(Workout.objects.filter(owners=user))
     
     
 class WorkoutDetailView(generics.RetrieveAPIView):
@@ -42,7 +42,7 @@ export const CustomerDashboard: React.FC = () => {
     const [chatRoomVisible, setChatRoomVisible] = useState(false);
     const [showAllPreviousSessions, setShowAllPreviousSessions] = useState(false);
     const [workoutIdToDelete, setWorkoutIdToDelete] = useState<number | null>(null); 
-    const socketsRef = useRef<Map<number, WebSocket>>(new Map());
+    const socketRef = useRef<WebSocket | null>(null);
     const navigate = useNavigate();
     const { user } = useAuth();
 
@@ -134,25 +134,19 @@ export const CustomerDashboard: React.FC = () => {
       
     }, [navigate]);
 
-  // Connect to WebSocket, listen for notifications from chat rooms
+  // Connect to the notification WebSocket of the user, notifications from all chat rooms are delivered to it
   useEffect(() => {
-    if (chatRooms.length === 0) return; 
+    let isComponentMounted = true;
 
-    const roomIds = chatRooms.map((room) => room.id); // Room IDs which User is participant of
+    const connect = async () => {
+      const socket = await apiClient.createNotificationSocket();
 
-    roomIds.forEach(async (idRoom) => {
-      const existingSocket = socketsRef.current.get(idRoom);
-      if (existingSocket) { // Close existing WebSocket connection, for the same chat room
-        existingSocket.close();
-      }
-
-      if (!idRoom || typeof idRoom !== "number") {
-        console.warn("Invalid room id:", idRoom);
+      // Don't set up the socket if the component was unmounted
+      if (!isComponentMounted) {
+        socket.close();
         return;
       }
-
-      const socket = await apiClient.createSocket(idRoom); // Create a new WebSocket connection
-      socketsRef.current.set(idRoom, socket);
+      socketRef.current = socket;
 
       socket.onmessage = (event) => {{ 
         const notification = JSON.parse(event.data); 
@@ -176,17 +170,18 @@ export const CustomerDashboard: React.FC = () => {
         }
       }};
 
-      socket.onclose = () => { 
-        socketsRef.current.delete(idRoom);
+      socket.onclose = () => {
+        socketRef.current = null;
       };
-    });
+    };
+
+    connect();
 
-    return () => { // Close all WebSockets when the user exits the dashboard
-        socketsRef.current.forEach((socket) => {
-          socket.close();
-        });
+    return () => { // Close the WebSocket when the user exits the dashboard
+      isComponentMounted = false;
+      socketRef.current?.close();
     };
-  }, [chatRooms]);
+  }, []);
 
  	useEffect(() => {
         // Sort notifications by date sent, only show the most recent from each chat room
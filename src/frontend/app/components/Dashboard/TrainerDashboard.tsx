@@ -32,7 +32,7 @@ export const TrainerDashboard: React.FC = () => {
     const [ptScheduledWorkouts, setPtScheduledWorkouts] = useState<any[]>([]);
     const [showAll, setShowAll] = useState(false);
     const [workoutIdToDelete, setWorkoutIdToDelete] = useState<number | null>(null); 
-    const socketsRef = useRef<Map<number, WebSocket>>(new Map());
+    const socketRef = useRef<WebSocket | null>(null);
     const navigate = useNavigate();
     const { user } = useAuth(); // Get user info from AuthContext
 
@@ -131,25 +131,19 @@ export const TrainerDashboard: React.FC = () => {
         fetchPtScheduledWorkouts();
       }, [navigate]);
 
-  // Connect to WebSocket, listen for notifications from chat rooms
+  // Connect to the notification WebSocket of the user, notifications from all chat rooms are delivered to it
   useEffect(() => {
-    if (chatRooms.length === 0) return; 
+    let isComponentMounted = true;
 
-    const roomIds = chatRooms.map((room) => room.id); // Room IDs which User is participant of
+    const connect = async () => {
+      const socket = await apiClient.createNotificationSocket();
 
-    roomIds.forEach(async (idRoom) => {
-      const existingSocket = socketsRef.current.get(idRoom);
-      if (existingSocket) { // Close existing WebSocket connection, for the same chat room
-        existingSocket.close();
-      }
-
-      if (!idRoom || typeof idRoom !== "number") {
-        console.warn("Invalid room id:", idRoom);
+      // Don't set up the socket if the component was unmounted
+      if (!isComponentMounted) {
+        socket.close();
         return;
       }
-
-      const socket = await apiClient.createSocket(idRoom); // Create a new WebSocket connection
-      socketsRef.current.set(idRoom, socket);
+      socketRef.current = socket;
 
       socket.onmessage = (event) => {{ 
         const notification = JSON.parse(event.data); 
@@ -173,17 +167,18 @@ export const TrainerDashboard: React.FC = () => {
         }
       }};
 
-      socket.onclose = () => { 
-        socketsRef.current.delete(idRoom);
+      socket.onclose = () => {
+        socketRef.current = null;
       };
-    });
+    };
 
-        return () => { // Close all WebSockets when the user exits the dashboard
-            socketsRef.current.forEach((socket) => {
-        socket.close();
-      });
-        };
-  }, [chatRooms]);
+    connect();
+
+    return () => { // Close the WebSocket when the user exits the dashboard
+      isComponentMounted = false;
+      socketRef.current?.close();
+    };
+  }, []);
 
 
  	useEffect(() => {
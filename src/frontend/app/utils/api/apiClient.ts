@@ -5,6 +5,7 @@ import { backendUrl, wsUrl } from '~/config';
 declare module 'axios' {
     export interface AxiosInstance {
         createSocket(chatRoomId: number): Promise<WebSocket>;
+        createNotificationSocket(): Promise<WebSocket>;
     }
 }
 
@@ -29,4 +30,12 @@ apiClient.createSocket = async function createAuthSocket(chatRoomId: number) {
     return socket;
 }
 
+// Socket that receives the notifications of the user from all their chat rooms
+apiClient.createNotificationSocket = async function createNotificationSocket() {
+    const token = await getValidAccessToken();
+    const socket = new WebSocket(`${wsUrl}/notifications/?token=${token}`);
+
+    return socket;
+}
+
 export default apiClient;
\ No newline at end of file